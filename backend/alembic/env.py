@@ -22,7 +22,7 @@ if config.config_file_name is not None:
 # Import all models and Base
 from src.config.database import Base
 from src.models.user import User
-from src.models.market import MarketData, OHLCV
+from src.models.market import Instrument, MarketData, OHLCV
 from src.models.prediction import Prediction
 from src.models.watchlist import Watchlist, Alert, Position
 
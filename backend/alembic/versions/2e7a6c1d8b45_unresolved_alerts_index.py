@@ -0,0 +1,44 @@
+"""Add a partial index for armed alerts without an instrument
+
+Alerts only carry a symbol, so one saved before its instrument was
+registered keeps instrument_id NULL. record_store.armed_alerts matches those
+on symbol, through this index, alongside idx_alerts_armed.
+
+Built CONCURRENTLY on PostgreSQL so writes are not blocked.
+
+Revision ID: 2e7a6c1d8b45
+Revises: 9d3f5b7c2e14
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2e7a6c1d8b45'
+down_revision: Union[str, None] = '9d3f5b7c2e14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _is_postgres() -> bool:
+    return op.get_context().dialect.name == 'postgresql'
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_alerts_unresolved', 'alerts', ['symbol', 'id'],
+            postgresql_where=sa.text('instrument_id IS NULL AND is_active AND NOT is_triggered'),
+            sqlite_where=sa.text('instrument_id IS NULL AND is_active = 1 AND is_triggered = 0'),
+            postgresql_concurrently=_is_postgres(),
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_alerts_unresolved', table_name='alerts', postgresql_concurrently=_is_postgres())
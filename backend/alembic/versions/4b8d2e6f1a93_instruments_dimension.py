@@ -0,0 +1,219 @@
+"""Add instruments dimension and integer instrument_id keys on fact tables
+
+Backfills instruments from the distinct (symbol, market) pairs already stored,
+sets instrument_id on ohlcv_data, market_data, predictions, watchlists,
+alerts and positions, and moves the candle and tick lookup indexes from the
+(symbol, market, ...) strings to instrument_id. The symbol and market columns
+stay in place so existing readers keep working while they move over.
+
+On TimescaleDB, compression is switched off for the backfill and re-enabled
+segmented by instrument_id.
+
+Revision ID: 4b8d2e6f1a93
+Revises: 7c1e4a9d2f36
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op, context
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b8d2e6f1a93'
+down_revision: Union[str, None] = '7c1e4a9d2f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+FACT_TABLES = ('ohlcv_data', 'market_data', 'predictions', 'watchlists', 'alerts', 'positions')
+
+# Tables whose market column is the markettype enum; the others store free text
+ENUM_MARKET_TABLES = ('ohlcv_data', 'market_data')
+TEXT_MARKET_TABLES = ('predictions', 'watchlists', 'positions')
+
+# table -> compression settings (TimescaleDB)
+COMPRESSED = {
+    'ohlcv_data': {'after': '30 days', 'old': 'symbol, market, timeframe', 'new': 'instrument_id, timeframe'},
+    'market_data': {'after': '7 days', 'old': 'symbol, market', 'new': 'instrument_id'},
+}
+
+# name -> (table, columns, unique) before and after
+OLD_INDEXES = {
+    'idx_ohlcv_lookup': ('ohlcv_data', ['symbol', 'market', 'timeframe', 'timestamp'], True),
+    'idx_symbol_market_timestamp': ('market_data', ['symbol', 'market', 'timestamp'], False),
+}
+NEW_INDEXES = {
+    'idx_ohlcv_instrument_lookup': ('ohlcv_data', ['instrument_id', 'timeframe', 'timestamp'], True),
+    'idx_market_data_instrument_timestamp': ('market_data', ['instrument_id', 'timestamp'], False),
+    'ix_predictions_instrument_id': ('predictions', ['instrument_id'], False),
+    'ix_alerts_instrument_id': ('alerts', ['instrument_id'], False),
+}
+
+EXCHANGE_SQL = """
+CASE
+    WHEN {market} = 'CRYPTO' THEN 'BINANCE'
+    WHEN {symbol} LIKE '%.NS' THEN 'NSE'
+    WHEN {symbol} LIKE '%.BO' THEN 'BSE'
+END
+"""
+
+# Free-text market values ('crypto', 'stocks', ...) -> markettype label
+TEXT_MARKET_SQL = """
+CASE lower({market})
+    WHEN 'crypto' THEN 'CRYPTO'
+    WHEN 'stock' THEN 'STOCK'
+    WHEN 'stocks' THEN 'STOCK'
+    WHEN 'forex' THEN 'FOREX'
+END
+"""
+
+
+def _is_postgres() -> bool:
+    return op.get_context().dialect.name == 'postgresql'
+
+
+def _hypertables() -> list:
+    if not _is_postgres() or context.is_offline_mode():
+        return []
+    bind = op.get_bind()
+    if not bind.execute(sa.text("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'")).scalar():
+        return []
+    return [
+        table for table in COMPRESSED
+        if bind.execute(sa.text(
+            "SELECT 1 FROM timescaledb_information.hypertables WHERE hypertable_name = :table"
+        ), {'table': table}).scalar()
+    ]
+
+
+def _pause_compression(tables: list) -> None:
+    """Decompress so columns can be backfilled and indexes rebuilt"""
+    for table in tables:
+        op.execute(f"SELECT remove_compression_policy('{table}', if_exists => true)")
+        op.execute(f"SELECT decompress_chunk(c, true) FROM show_chunks('{table}') c")
+        op.execute(f"ALTER TABLE {table} SET (timescaledb.compress = false)")
+
+
+def _resume_compression(tables: list, segment_by: str) -> None:
+    for table in tables:
+        settings = COMPRESSED[table]
+        op.execute(
+            f"ALTER TABLE {table} SET (timescaledb.compress, "
+            f"timescaledb.compress_segmentby = '{settings[segment_by]}', "
+            f"timescaledb.compress_orderby = 'timestamp DESC')"
+        )
+        op.execute(f"SELECT add_compression_policy('{table}', INTERVAL '{settings['after']}')")
+
+
+def _backfill_instruments() -> None:
+    market_label = "upper(CAST(market AS text))" if _is_postgres() else "market"
+    sources = [
+        f"SELECT DISTINCT symbol, {market_label} AS market FROM {table}" for table in ENUM_MARKET_TABLES
+    ] + [
+        f"SELECT DISTINCT symbol, {TEXT_MARKET_SQL.format(market='market')} AS market FROM {table}"
+        for table in TEXT_MARKET_TABLES
+    ]
+    market_value = "CAST(src.market AS markettype)" if _is_postgres() else "src.market"
+    op.execute(
+        "INSERT INTO instruments (symbol, market, exchange, is_active) "
+        f"SELECT DISTINCT src.symbol, {market_value}, "
+        f"{EXCHANGE_SQL.format(market='src.market', symbol='src.symbol')}, true "
+        f"FROM ({' UNION '.join(sources)}) AS src "
+        "WHERE src.market IS NOT NULL "
+        "ON CONFLICT (symbol, market) DO NOTHING"
+    )
+
+
+def _backfill_ids() -> None:
+    for table in FACT_TABLES:
+        if table == 'alerts':
+            # Alerts only carry a symbol; match it when it names one instrument
+            match = (
+                "instruments.symbol = alerts.symbol AND "
+                "(SELECT count(*) FROM instruments AS i WHERE i.symbol = alerts.symbol) = 1"
+            )
+        elif table in ENUM_MARKET_TABLES:
+            match = f"instruments.symbol = {table}.symbol AND instruments.market = {table}.market"
+        else:
+            market = TEXT_MARKET_SQL.format(market=f"{table}.market")
+            if _is_postgres():
+                market = f"CAST({market} AS markettype)"
+            match = f"instruments.symbol = {table}.symbol AND instruments.market = {market}"
+
+        if _is_postgres():
+            op.execute(
+                f"UPDATE {table} SET instrument_id = instruments.id FROM instruments "
+                f"WHERE {match} AND {table}.instrument_id IS NULL"
+            )
+        else:
+            op.execute(
+                f"UPDATE {table} SET instrument_id = "
+                f"(SELECT instruments.id FROM instruments WHERE {match}) "
+                f"WHERE instrument_id IS NULL"
+            )
+
+
+def _create_indexes(indexes: dict) -> None:
+    for name, (table, columns, unique) in indexes.items():
+        op.create_index(name, table, columns, unique=unique)
+
+
+def _drop_indexes(indexes: dict) -> None:
+    for name, (table, _, _) in indexes.items():
+        op.drop_index(name, table_name=table)
+
+
+def upgrade() -> None:
+    market_type = (
+        postgresql.ENUM('FOREX', 'CRYPTO', 'STOCK', name='markettype', create_type=False)
+        if _is_postgres() else sa.Enum('FOREX', 'CRYPTO', 'STOCK', name='markettype')
+    )
+    op.create_table('instruments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('symbol', sa.String(), nullable=False),
+    sa.Column('market', market_type, nullable=False),
+    sa.Column('exchange', sa.String(), nullable=True),
+    sa.Column('currency', sa.String(), nullable=True),
+    sa.Column('tick_size', sa.Float(), nullable=True),
+    sa.Column('lot_size', sa.Float(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_instruments_symbol_market', 'instruments', ['symbol', 'market'], unique=True)
+
+    hypertables = _hypertables()
+    _pause_compression(hypertables)
+
+    for table in FACT_TABLES:
+        op.add_column(table, sa.Column('instrument_id', sa.Integer(), nullable=True))
+        if _is_postgres():
+            op.create_foreign_key(f'fk_{table}_instrument_id', table, 'instruments', ['instrument_id'], ['id'])
+
+    _backfill_instruments()
+    _backfill_ids()
+
+    _create_indexes(NEW_INDEXES)
+    _drop_indexes(OLD_INDEXES)
+    _resume_compression(hypertables, 'new')
+
+
+def downgrade() -> None:
+    hypertables = _hypertables()
+    _pause_compression(hypertables)
+
+    _create_indexes(OLD_INDEXES)
+    _drop_indexes(NEW_INDEXES)
+
+    for table in FACT_TABLES:
+        if _is_postgres():
+            op.drop_constraint(f'fk_{table}_instrument_id', table, type_='foreignkey')
+        op.drop_column(table, 'instrument_id')
+
+    _resume_compression(hypertables, 'old')
+
+    op.drop_index('idx_instruments_symbol_market', table_name='instruments')
+    op.drop_table('instruments')
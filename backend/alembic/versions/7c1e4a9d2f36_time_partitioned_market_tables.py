@@ -0,0 +1,255 @@
+"""Time-partition ohlcv_data and market_data, add 1h/1d rollups
+
+Uses TimescaleDB hypertables, continuous aggregates and compression when the
+extension is available, and native range partitioning with rollup tables
+otherwise (refreshed by src/utils/timeseries.py). Set TIMESERIES_BACKEND to
+timescaledb or native to skip detection (needed for offline --sql runs).
+Does nothing on SQLite.
+
+Revision ID: 7c1e4a9d2f36
+Revises: bbca2c4557a5
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+import os
+
+from alembic import op, context
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e4a9d2f36'
+down_revision: Union[str, None] = 'bbca2c4557a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# table -> (time partition interval, compress after, secondary indexes)
+TABLES = {
+    'ohlcv_data': {
+        'chunk': '7 days',
+        'compress_after': '30 days',
+        'segment_by': 'symbol, market, timeframe',
+        'indexes': [
+            ('idx_ohlcv_lookup', 'symbol, market, timeframe, timestamp', True),
+            ('ix_ohlcv_data_id', 'id', False),
+            ('ix_ohlcv_data_symbol', 'symbol', False),
+            ('ix_ohlcv_data_timestamp', 'timestamp', False),
+        ],
+    },
+    'market_data': {
+        'chunk': '1 day',
+        'compress_after': '7 days',
+        'segment_by': 'symbol, market',
+        'indexes': [
+            ('idx_symbol_market_timestamp', 'symbol, market, timestamp', False),
+            ('ix_market_data_id', 'id', False),
+            ('ix_market_data_symbol', 'symbol', False),
+            ('ix_market_data_timestamp', 'timestamp', False),
+        ],
+    },
+}
+
+# Months of empty partitions created ahead of now (native layout)
+PARTITIONS_AHEAD = "3 months"
+
+ENSURE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION buddy_ensure_partitions(parent text, from_ts timestamptz, to_ts timestamptz)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    month_start timestamp := date_trunc('month', from_ts AT TIME ZONE 'UTC');
+    partition_name text;
+    created integer := 0;
+BEGIN
+    WHILE (month_start AT TIME ZONE 'UTC') < to_ts LOOP
+        partition_name := format('%s_%s', parent, to_char(month_start, '"y"YYYY"m"MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            BEGIN
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, parent,
+                    month_start AT TIME ZONE 'UTC',
+                    (month_start + INTERVAL '1 month') AT TIME ZONE 'UTC'
+                );
+                created := created + 1;
+            EXCEPTION WHEN check_violation THEN
+                -- Rows for this month already landed in the default partition
+                RAISE WARNING 'Skipping partition %: default partition holds rows in range', partition_name;
+            END;
+        END IF;
+        month_start := month_start + INTERVAL '1 month';
+    END LOOP;
+    RETURN created;
+END;
+$$
+"""
+
+
+def _backend() -> str:
+    """'timescaledb' or 'native'"""
+    choice = os.getenv("TIMESERIES_BACKEND", "auto").lower()
+    if choice in ('timescaledb', 'native'):
+        return choice
+    if context.is_offline_mode():
+        return 'native'
+
+    bind = op.get_bind()
+    preloaded = bind.execute(sa.text("SELECT current_setting('shared_preload_libraries')")).scalar() or ''
+    available = bind.execute(sa.text(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'timescaledb'"
+    )).scalar()
+    return 'timescaledb' if available and 'timescaledb' in preloaded else 'native'
+
+
+def _is_hypertable(table: str) -> bool:
+    bind = op.get_bind()
+    installed = bind.execute(sa.text("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'")).scalar()
+    if not installed:
+        return False
+    return bool(bind.execute(sa.text(
+        "SELECT 1 FROM timescaledb_information.hypertables WHERE hypertable_name = :table"
+    ), {'table': table}).scalar())
+
+
+def _rebuild(table: str, partitioned: bool) -> None:
+    """
+    Recreate a table (plain or range-partitioned on timestamp) and copy rows over
+
+    The old table's indexes and primary key are dropped first so the new table
+    can reuse their names; its id sequence is handed to the new table.
+    """
+    spec = TABLES[table]
+    old = f"{table}_old"
+
+    op.execute(f"ALTER TABLE {table} DROP CONSTRAINT {table}_pkey")
+    for name, _, _ in spec['indexes']:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute(f"ALTER TABLE {table} RENAME TO {old}")
+
+    suffix = " PARTITION BY RANGE (timestamp)" if partitioned else ""
+    op.execute(f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS){suffix}")
+    # Unique keys on a partitioned table must include the partition column
+    op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({'id, timestamp' if partitioned else 'id'})")
+    for name, columns, unique in spec['indexes']:
+        op.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({columns})")
+
+    if partitioned:
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+        op.execute(
+            f"SELECT buddy_ensure_partitions('{table}', "
+            f"COALESCE((SELECT min(timestamp) FROM {old}), now()), now() + INTERVAL '{PARTITIONS_AHEAD}')"
+        )
+
+    op.execute(f"INSERT INTO {table} SELECT * FROM {old}")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+    op.execute(f"DROP TABLE {old}")
+
+
+def _upgrade_timescaledb() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS timescaledb")
+
+    for table, spec in TABLES.items():
+        # Hypertable unique keys must include the time column
+        op.execute(f"ALTER TABLE {table} DROP CONSTRAINT {table}_pkey")
+        op.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, timestamp)")
+        op.execute(
+            f"SELECT create_hypertable('{table}', 'timestamp', "
+            f"chunk_time_interval => INTERVAL '{spec['chunk']}', "
+            f"migrate_data => true, create_default_indexes => false)"
+        )
+        op.execute(
+            f"ALTER TABLE {table} SET (timescaledb.compress, "
+            f"timescaledb.compress_segmentby = '{spec['segment_by']}', "
+            f"timescaledb.compress_orderby = 'timestamp DESC')"
+        )
+        op.execute(f"SELECT add_compression_policy('{table}', INTERVAL '{spec['compress_after']}')")
+
+    # Continuous aggregates cannot be created inside a transaction
+    with op.get_context().autocommit_block():
+        op.execute("""
+            CREATE MATERIALIZED VIEW ohlcv_1h WITH (timescaledb.continuous) AS
+            SELECT symbol, market, time_bucket(INTERVAL '1 hour', timestamp) AS bucket,
+                   first(open, timestamp) AS open, max(high) AS high, min(low) AS low,
+                   last(close, timestamp) AS close, sum(volume) AS volume
+            FROM ohlcv_data
+            WHERE timeframe = '1m'
+            GROUP BY symbol, market, bucket
+            WITH NO DATA
+        """)
+        op.execute("""
+            CREATE MATERIALIZED VIEW ohlcv_1d WITH (timescaledb.continuous) AS
+            SELECT symbol, market, time_bucket(INTERVAL '1 day', bucket) AS bucket,
+                   first(open, bucket) AS open, max(high) AS high, min(low) AS low,
+                   last(close, bucket) AS close, sum(volume) AS volume
+            FROM ohlcv_1h
+            GROUP BY symbol, market, time_bucket(INTERVAL '1 day', bucket)
+            WITH NO DATA
+        """)
+        op.execute(
+            "SELECT add_continuous_aggregate_policy('ohlcv_1h', start_offset => INTERVAL '3 days', "
+            "end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '15 minutes')"
+        )
+        op.execute(
+            "SELECT add_continuous_aggregate_policy('ohlcv_1d', start_offset => INTERVAL '7 days', "
+            "end_offset => INTERVAL '1 day', schedule_interval => INTERVAL '1 hour')"
+        )
+        # Backfill existing history once
+        op.execute("CALL refresh_continuous_aggregate('ohlcv_1h', NULL, NULL)")
+        op.execute("CALL refresh_continuous_aggregate('ohlcv_1d', NULL, NULL)")
+
+
+def _upgrade_native() -> None:
+    op.execute(ENSURE_PARTITIONS_FUNCTION)
+    for table in TABLES:
+        _rebuild(table, partitioned=True)
+
+    # Rollups are plain tables upserted by src/utils/timeseries.refresh_rollups
+    for name in ('ohlcv_1h', 'ohlcv_1d'):
+        op.create_table(
+            name,
+            sa.Column('symbol', sa.String(), nullable=False),
+            sa.Column('market', postgresql.ENUM('FOREX', 'CRYPTO', 'STOCK', name='markettype', create_type=False), nullable=False),
+            sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('open', sa.Float(), nullable=False),
+            sa.Column('high', sa.Float(), nullable=False),
+            sa.Column('low', sa.Float(), nullable=False),
+            sa.Column('close', sa.Float(), nullable=False),
+            sa.Column('volume', sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint('symbol', 'market', 'bucket')
+        )
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name != 'postgresql':
+        return
+
+    if _backend() == 'timescaledb':
+        _upgrade_timescaledb()
+    else:
+        _upgrade_native()
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != 'postgresql':
+        return
+
+    if not context.is_offline_mode() and _is_hypertable('ohlcv_data'):
+        with op.get_context().autocommit_block():
+            op.execute("DROP MATERIALIZED VIEW IF EXISTS ohlcv_1d")
+            op.execute("DROP MATERIALIZED VIEW IF EXISTS ohlcv_1h")
+        # Constraints can't be altered while compression is enabled
+        for table in TABLES:
+            op.execute(f"SELECT remove_compression_policy('{table}', if_exists => true)")
+            op.execute(f"SELECT decompress_chunk(c, true) FROM show_chunks('{table}') c")
+            op.execute(f"ALTER TABLE {table} SET (timescaledb.compress = false)")
+    else:
+        op.execute("DROP TABLE IF EXISTS ohlcv_1d")
+        op.execute("DROP TABLE IF EXISTS ohlcv_1h")
+
+    # Copy back into plain heap tables (compressed chunks decompress on read)
+    for table in TABLES:
+        _rebuild(table, partitioned=False)
+
+    op.execute("DROP FUNCTION IF EXISTS buddy_ensure_partitions(text, timestamptz, timestamptz)")
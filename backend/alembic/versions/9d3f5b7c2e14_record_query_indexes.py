@@ -0,0 +1,80 @@
+"""Add keyset indexes for predictions, alerts and positions queries
+
+Composite indexes for prediction history and latest-per-model lookups, and
+partial indexes for unevaluated predictions, armed alerts and open
+positions (used by src/services/record_store.py). ix_predictions_instrument_id
+is replaced by idx_predictions_instrument_created, which has it as a prefix.
+
+Indexes are built CONCURRENTLY on PostgreSQL so writes are not blocked.
+
+Revision ID: 9d3f5b7c2e14
+Revises: 4b8d2e6f1a93
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3f5b7c2e14'
+down_revision: Union[str, None] = '4b8d2e6f1a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# name -> (table, columns, PostgreSQL predicate, SQLite predicate)
+INDEXES = {
+    'idx_predictions_instrument_created': (
+        'predictions', ['instrument_id', 'created_at', 'id'], None, None,
+    ),
+    'idx_predictions_instrument_model_created': (
+        'predictions', ['instrument_id', 'model', 'created_at', 'id'], None, None,
+    ),
+    'idx_predictions_pending': (
+        'predictions', ['prediction_for', 'id'], 'evaluated_at IS NULL', 'evaluated_at IS NULL',
+    ),
+    'idx_alerts_armed': (
+        'alerts', ['instrument_id', 'id'], 'is_active AND NOT is_triggered', 'is_active = 1 AND is_triggered = 0',
+    ),
+    'idx_positions_user_open': (
+        'positions', ['user_id', 'opened_at', 'id'], 'is_open', 'is_open = 1',
+    ),
+}
+
+
+def _is_postgres() -> bool:
+    return op.get_context().dialect.name == 'postgresql'
+
+
+def _create(name: str) -> None:
+    table, columns, pg_where, sqlite_where = INDEXES[name]
+    op.create_index(
+        name, table, columns,
+        postgresql_where=sa.text(pg_where) if pg_where else None,
+        sqlite_where=sa.text(sqlite_where) if sqlite_where else None,
+        postgresql_concurrently=_is_postgres(),
+    )
+
+
+def _drop(name: str) -> None:
+    op.drop_index(name, table_name=INDEXES[name][0], postgresql_concurrently=_is_postgres())
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            _create(name)
+        op.drop_index('ix_predictions_instrument_id', table_name='predictions',
+                      postgresql_concurrently=_is_postgres())
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_predictions_instrument_id', 'predictions', ['instrument_id'],
+                        postgresql_concurrently=_is_postgres())
+        for name in INDEXES:
+            _drop(name)
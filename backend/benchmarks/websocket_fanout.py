@@ -0,0 +1,70 @@
+"""
+Socket.IO fan-out load test
+Connects many clients to a running API, subscribes them to the same symbols
+and measures the delay between the server stamping an update and clients receiving it
+
+Usage:
+    python benchmarks/websocket_fanout.py --clients 500 --duration 30
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+import socketio
+
+BASE_URL = "http://localhost:8000"
+
+
+def print_section(title):
+    print(f"\n{'='*60}")
+    print(f" {title}")
+    print(f"{'='*60}\n")
+
+
+async def run_client(url, symbols, throttle, latencies, stop_at):
+    client = socketio.AsyncClient(reconnection=False)
+
+    @client.on('price_update')
+    async def on_price(data):
+        latencies.append(time.time() * 1000 - data['serverTs'])
+
+    await client.connect(url, transports=['websocket'])
+    for symbol in symbols:
+        await client.emit('subscribe', {'type': 'price', 'symbol': symbol, 'throttle': throttle})
+
+    await asyncio.sleep(max(stop_at - time.time(), 0))
+    await client.disconnect()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Socket.IO fan-out load test")
+    parser.add_argument('--url', default=BASE_URL)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--symbols', default='BTCUSDT,ETHUSDT,BNBUSDT')
+    parser.add_argument('--throttle', type=int, default=0, help="Per-client throttle in ms")
+    args = parser.parse_args()
+
+    symbols = args.symbols.split(',')
+    latencies = []
+    stop_at = time.time() + args.duration
+
+    print_section(f"Fan-out: {args.clients} clients x {len(symbols)} symbols for {args.duration:.0f}s")
+
+    results = await asyncio.gather(
+        *[run_client(args.url, symbols, args.throttle, latencies, stop_at) for _ in range(args.clients)],
+        return_exceptions=True
+    )
+    failures = [r for r in results if isinstance(r, Exception)]
+
+    print(f"Connected clients: {args.clients - len(failures)} (failed: {len(failures)})")
+    print(f"Updates received:  {len(latencies)}")
+    if latencies:
+        print(f"Latency p50:       {np.percentile(latencies, 50):.1f} ms")
+        print(f"Latency p99:       {np.percentile(latencies, 99):.1f} ms")
+        print(f"Latency max:       {max(latencies):.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,22 +2,35 @@
 Main FastAPI application
 AI-Powered Market Prediction Platform
 """
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 # Import database dependencies
-from src.config.database import get_db, engine
+from src.config.database import engine
+from src.config.async_database import get_async_db, async_engine
 from src.models import Base
 
 # Import routers
-from src.api.routes import market
+from src.api.routes import market, export
+from src.services.overview_service import overview_service
+from src.services.stocks_service import stocks_service
+from src.utils.write_behind import write_behind
+from src.api.realtime import sio, realtime_hub
+from src.utils.metrics import HTTP_REQUEST_DURATION
+from src.utils.tracing import ServerTimingMiddleware
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+import socketio
+
+# Slowest symbols reported by /health
+HEALTH_SLOW_SYMBOLS = 10
 
 # Create tables (in production, use alembic migrations)
 # Base.metadata.create_all(bind=engine)
@@ -38,8 +51,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Observe request latency labelled by route template (not raw path)"""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.labels(
+            request.method,
+            getattr(route, "path", "unmatched"),
+            str(status)
+        ).observe(time.perf_counter() - started)
+
+# Outermost: Server-Timing header and on-demand profiles (see src/utils/tracing.py)
+app.add_middleware(ServerTimingMiddleware)
+
 # Include routers
 app.include_router(market.router)
+app.include_router(export.router)
+
+# Socket.IO gateway (frontend connects on the default /socket.io path)
+app.mount("/socket.io", socketio.ASGIApp(sio, socketio_path=""))
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """Start background refreshers, the write-behind flusher and realtime feeds"""
+    overview_service.start()
+    write_behind.start()
+    realtime_hub.start()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    """Stop background tasks and flush pending writes"""
+    overview_service.stop()
+    write_behind.stop()
+    await realtime_hub.stop()
+    await async_engine.dispose()
 
 @app.get("/")
 async def root():
@@ -49,15 +101,31 @@ async def root():
         "status": "active"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def _stock_stats() -> dict:
+    """Stock provider health and the symbols slowest to fetch"""
+    latencies = stocks_service.get_latency_stats()
+    return {
+        "providers": stocks_service.get_provider_stats(),
+        "slowestSymbols": dict(list(latencies.items())[:HEALTH_SLOW_SYMBOLS])
+    }
+
 @app.get("/health")
-async def health_check(db: Session = Depends(get_db)):
+async def health_check(db: AsyncSession = Depends(get_async_db)):
     """Health check endpoint with database connection test"""
     try:
         # Test database connection
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         return {
             "status": "healthy",
-            "database": "connected"
+            "database": "connected",
+            "writeBehind": write_behind.get_stats(),
+            "realtime": realtime_hub.get_stats(),
+            "stocks": _stock_stats()
         }
     except Exception as e:
         return {
@@ -68,7 +136,7 @@ async def health_check(db: Session = Depends(get_db)):
 
 # Legacy placeholder for prediction - will be moved to prediction router
 @app.post("/api/prediction/predict")
-async def create_prediction(db: Session = Depends(get_db)):
+async def create_prediction():
     return {
         "success": True,
         "data": {
@@ -0,0 +1,235 @@
+"""
+Real-time Socket.IO Gateway
+Pushes price updates to subscribed clients, one upstream feed per market
+"""
+from typing import Optional, Dict, Any, Set, List
+from collections import deque
+import asyncio
+import os
+import time
+import logging
+
+import numpy as np
+import socketio
+
+from src.services.binance_service import binance_service
+from src.services.stocks_service import stocks_service
+from src.services.overview_service import overview_service, overview_market
+from src.utils.price_board import board_reader
+
+logger = logging.getLogger(__name__)
+
+CRYPTO_QUOTE_ASSETS = ('USDT', 'BUSD', 'USDC', 'BTC', 'ETH', 'BNB')
+
+# Allowed per-client update intervals in ms (the subscribe event rejects others)
+THROTTLE_TIERS = (0, 1000, 5000)
+
+
+def infer_market(symbol: str) -> str:
+    """Guess the market of a bare symbol sent by the frontend"""
+    return 'crypto' if symbol.upper().endswith(CRYPTO_QUOTE_ASSETS) else 'stock'
+
+
+def room_name(symbol: str, tier: int) -> str:
+    """Socket.IO room for a symbol at a throttle tier"""
+    return f"price:{symbol}:{tier}"
+
+
+class PriceFeedHub:
+    """
+    Fans upstream price updates out to Socket.IO rooms
+
+    A single poller per market fetches every subscribed symbol in one bulk
+    call. Each update is encoded once per room; rooms are split by throttle
+    tier, so slow clients get coalesced updates (latest value only) at their
+    tier's cadence while tier-0 clients get every change immediately.
+    """
+
+    def __init__(self, sio: socketio.AsyncServer):
+        """
+        Initialize price feed hub
+
+        Args:
+            sio: Socket.IO server to emit on
+        """
+        self.sio = sio
+        self.poll_intervals = {
+            'crypto': float(os.getenv("REALTIME_CRYPTO_POLL", 2.0)),
+            'stock': float(os.getenv("REALTIME_STOCK_POLL", 5.0)),
+        }
+        self.subscriptions: Dict[str, Set[str]] = {}  # sid -> rooms
+        self.room_counts: Dict[str, int] = {}
+        self.latest: Dict[str, Dict[str, Any]] = {}  # symbol -> payload
+        self.versions: Dict[str, int] = {}  # symbol -> update counter
+        self.sent_versions: Dict[str, int] = {}  # room -> last version sent
+        self.fanout_latencies: deque = deque(maxlen=1000)
+        self._tasks: List[asyncio.Task] = []
+
+    def active_symbols(self, market: str) -> List[str]:
+        """Symbols of a market with at least one subscriber"""
+        symbols = set()
+        for room, count in self.room_counts.items():
+            if count > 0:
+                symbol = room.split(':')[1]
+                if infer_market(symbol) == market:
+                    symbols.add(symbol)
+        return sorted(symbols)
+
+    async def subscribe(self, sid: str, symbol: str, throttle_ms: int = 0) -> str:
+        tier = next((t for t in THROTTLE_TIERS if t >= throttle_ms), THROTTLE_TIERS[-1])
+        room = room_name(symbol, tier)
+        rooms = self.subscriptions.setdefault(sid, set())
+        if room not in rooms:
+            rooms.add(room)
+            self.room_counts[room] = self.room_counts.get(room, 0) + 1
+            await self.sio.enter_room(sid, room)
+
+        # New subscribers get the current value straight away
+        if symbol in self.latest:
+            await self.sio.emit('price_update', self.latest[symbol], to=sid)
+        return room
+
+    async def unsubscribe(self, sid: str, symbol: str) -> None:
+        for room in [r for r in self.subscriptions.get(sid, set()) if r.split(':')[1] == symbol]:
+            self.subscriptions[sid].discard(room)
+            self.room_counts[room] -= 1
+            await self.sio.leave_room(sid, room)
+
+    def disconnect(self, sid: str) -> None:
+        for room in self.subscriptions.pop(sid, set()):
+            self.room_counts[room] -= 1
+
+    async def publish(self, price_data: Dict[str, Any], received_at: float) -> bool:
+        """
+        Record an upstream price and push it to tier-0 rooms
+
+        Args:
+            price_data: Price dictionary from a market service
+            received_at: monotonic time the upstream response arrived
+
+        Returns:
+            Whether the price differed from the last one published
+        """
+        symbol = price_data['symbol']
+        previous = self.latest.get(symbol)
+        if previous is not None and previous['price'] == price_data['price'] and previous['volume'] == price_data.get('volume'):
+            return False  # Nothing changed, nothing to push
+
+        self.latest[symbol] = {
+            'symbol': symbol,
+            'price': price_data['price'],
+            'change': price_data.get('change_24h', 0),
+            'changePercent': price_data.get('change_percent_24h', 0),
+            'volume': price_data.get('volume', 0),
+            'serverTs': int(time.time() * 1000),
+        }
+        self.versions[symbol] = self.versions.get(symbol, 0) + 1
+        await self._flush_room(room_name(symbol, 0), symbol, received_at)
+        return previous is None or previous['price'] != price_data['price']
+
+    async def _flush_room(self, room: str, symbol: str, received_at: Optional[float] = None) -> None:
+        if self.room_counts.get(room, 0) <= 0:
+            return
+        version = self.versions.get(symbol, 0)
+        if self.sent_versions.get(room) == version:
+            return
+        self.sent_versions[room] = version
+        await self.sio.emit('price_update', self.latest[symbol], room=room)
+        if received_at is not None:
+            self.fanout_latencies.append((time.monotonic() - received_at) * 1000)
+
+    async def _poll_market(self, market: str) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            symbols = self.active_symbols(market)
+            if symbols:
+                try:
+                    # Board reads are plain memory reads; only missing symbols go upstream
+                    results, to_fetch = board_reader.get_quotes(symbols, market)
+                    if to_fetch and market == 'crypto':
+                        results.update(await loop.run_in_executor(None, binance_service.get_prices, to_fetch))
+                    elif to_fetch:
+                        results.update((await loop.run_in_executor(None, stocks_service.get_prices, to_fetch))['results'])
+                    received_at = time.monotonic()
+                    changed = set()
+                    for symbol, price_data in results.items():
+                        if await self.publish(price_data, received_at):
+                            changed.add(overview_market(symbol, market))
+                    # Only overviews whose prices moved are rebuilt early
+                    for overview in changed:
+                        overview_service.notify_price_change(overview)
+                except Exception as e:
+                    logger.warning(f"Realtime {market} feed failed: {e}")
+            await asyncio.sleep(self.poll_intervals[market])
+
+    async def _flush_tier(self, tier: int) -> None:
+        while True:
+            await asyncio.sleep(tier / 1000)
+            for symbol in list(self.latest):
+                await self._flush_room(room_name(symbol, tier), symbol)
+
+    def start(self) -> None:
+        """Start market pollers and throttled-tier flushers"""
+        if self._tasks or os.getenv("REALTIME_ENABLED", "True").lower() != "true":
+            return
+        self._tasks = [asyncio.create_task(self._poll_market(m)) for m in self.poll_intervals]
+        self._tasks += [asyncio.create_task(self._flush_tier(t)) for t in THROTTLE_TIERS if t > 0]
+        logger.info("Realtime price feeds started")
+
+    async def stop(self) -> None:
+        """Cancel feed tasks"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get subscriber counts and fan-out latency
+
+        Returns:
+            Statistics dictionary
+        """
+        latencies = list(self.fanout_latencies)
+        return {
+            'clients': len(self.subscriptions),
+            'rooms': {room: count for room, count in self.room_counts.items() if count > 0},
+            'fanout_p50_ms': float(np.percentile(latencies, 50)) if latencies else None,
+            'fanout_p99_ms': float(np.percentile(latencies, 99)) if latencies else None,
+        }
+
+
+cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:5173").split(",")
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins=cors_origins)
+realtime_hub = PriceFeedHub(sio)
+
+
+@sio.event
+async def connect(sid, environ, auth=None):
+    logger.debug(f"Realtime client connected: {sid}")
+
+
+@sio.event
+async def disconnect(sid):
+    realtime_hub.disconnect(sid)
+
+
+@sio.event
+async def subscribe(sid, data):
+    """Handle {type: 'price', symbol, throttle?} subscriptions"""
+    if not isinstance(data, dict) or data.get('type') != 'price' or not data.get('symbol'):
+        await sio.emit('error', {'message': 'Only price subscriptions are supported'}, to=sid)
+        return
+    throttle = data.get('throttle', 0)
+    if isinstance(throttle, bool) or throttle not in THROTTLE_TIERS:
+        await sio.emit('error', {
+            'message': f"throttle must be one of {', '.join(str(t) for t in THROTTLE_TIERS)} (ms)"
+        }, to=sid)
+        return
+    await realtime_hub.subscribe(sid, data['symbol'], int(throttle))
+
+
+@sio.event
+async def unsubscribe(sid, data):
+    if isinstance(data, dict) and data.get('symbol'):
+        await realtime_hub.unsubscribe(sid, data['symbol'])
@@ -0,0 +1,75 @@
+"""
+Bulk export API routes
+"""
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import datetime, timezone
+import logging
+
+from src.config.database import engine
+from src.utils.bulk_export import DATASETS, MEDIA_TYPES, is_available, stream_export
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/export", tags=["export"])
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Naive query times are taken as UTC"""
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+
+@router.get("/{dataset}")
+async def export_dataset(
+    dataset: str,
+    format: str = Query("ndjson", description="Encoding (csv, ndjson, parquet)"),
+    symbol: Optional[str] = Query(None, description="Only this symbol"),
+    market: Optional[str] = Query(None, description="Market type; required with symbol for candles"),
+    timeframe: Optional[str] = Query(None, description="Only this timeframe"),
+    start: Optional[datetime] = Query(None, description="Inclusive start (ISO 8601, UTC if naive)"),
+    end: Optional[datetime] = Query(None, description="Exclusive end (ISO 8601, UTC if naive)")
+):
+    """
+    Stream ohlcv_data ('candles') or predictions rows as a file download
+
+    The response is sent with chunked transfer encoding while rows are read
+    through a server-side cursor, so exports of any size use constant memory.
+
+    Args:
+        dataset: candles or predictions
+        format: Output encoding
+        symbol: Symbol filter
+        market: Market filter
+        timeframe: Timeframe filter
+        start: Time range start
+        end: Time range end
+    """
+    if dataset not in DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset: {dataset}")
+    fmt = format.lower()
+    if not is_available(fmt):
+        raise HTTPException(status_code=406, detail=f"Unsupported or unavailable format: {format}")
+
+    try:
+        # Resolving the instrument touches the database, so build the stream off the event loop
+        chunks = await run_in_threadpool(
+            stream_export, engine, dataset, fmt,
+            symbol=symbol, market=market, timeframe=timeframe,
+            start=_as_utc(start), end=_as_utc(end)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error starting {dataset} export: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    filename = '_'.join(part for part in (dataset, market, symbol, timeframe) if part).lower()
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}.{fmt}"'}
+    )
@@ -2,28 +2,57 @@
 Market Data API Routes
 Endpoints for fetching real-time and historical market data
 """
-from fastapi import APIRouter, HTTPException, Depends, Query
-from sqlalchemy.orm import Session
-from typing import Optional, List
-from datetime import datetime, timedelta
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime, timedelta, timezone
+import asyncio
 import logging
+import os
 
-from src.config.database import get_db
+from src.config.async_database import get_lazy_db, LazyAsyncSession
 from src.services.binance_service import binance_service
 from src.services.stocks_service import stocks_service
 from src.services.indicators_service import indicators_service
-from src.models.market import MarketData, OHLCV, MarketType
+from src.services.overview_service import overview_service
+from src.services.candle_store import candle_store_service, TIMEFRAME_DELTAS
+from src.models.market import MarketType
+from src.utils.write_behind import write_behind
+from src.utils.http_cache import candle_etag, columns_etag, conditional_response, conditional_json_response
+from src.utils.candle_encoding import negotiate_format, encode_candles, columns_after, MEDIA_TYPES
+from src.utils.tracing import span
+from src.utils.price_board import board_reader
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/market", tags=["market"])
 
+MAX_BATCH_SYMBOLS = 200
+# Cache-Control max-age for candle windows with no forming candle
+CLOSED_CANDLE_MAX_AGE = int(os.getenv("CLOSED_CANDLE_MAX_AGE", 3600))
+
+
+class QuoteRequestItem(BaseModel):
+    """A single (market, symbol) pair in a batch quote request"""
+    market: str
+    symbol: str
+
+
+class BatchQuoteRequest(BaseModel):
+    """Batch quote request body"""
+    items: List[QuoteRequestItem] = Field(..., min_length=1, max_length=MAX_BATCH_SYMBOLS)
+
+
+class SymbolListRequest(BaseModel):
+    """Batch quote request body for a single market"""
+    symbols: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_SYMBOLS)
+
 
 @router.get("/price/{market}/{symbol}")
 async def get_current_price(
     market: str,
-    symbol: str,
-    db: Session = Depends(get_db)
+    symbol: str
 ):
     """
     Get current price for a symbol
@@ -35,36 +64,30 @@ async def get_current_price(
     try:
         market_lower = market.lower()
         
-        if market_lower == 'crypto':
-            price_data = binance_service.get_current_price(symbol)
-        elif market_lower in ['stock', 'stocks']:
-            price_data = stocks_service.get_current_price(symbol)
-        elif market_lower == 'forex':
-            # Forex not implemented yet
-            raise HTTPException(status_code=501, detail="Forex data not yet implemented")
-        else:
-            raise HTTPException(status_code=400, detail=f"Invalid market type: {market}")
+        with span('fetch'):
+            # Quotes published by the price ingest process need no upstream call
+            if market_lower == 'crypto':
+                board_quote = board_reader.get_quote(symbol, 'crypto')
+            elif market_lower in ['stock', 'stocks']:
+                board_quote = board_reader.get_quote(symbol, 'stock')
+            else:
+                board_quote = None
+            
+            if board_quote is not None:
+                price_data = board_quote
+            elif market_lower == 'crypto':
+                price_data = binance_service.get_current_price(symbol)
+            elif market_lower in ['stock', 'stocks']:
+                price_data = stocks_service.get_current_price(symbol)
+            elif market_lower == 'forex':
+                # Forex not implemented yet
+                raise HTTPException(status_code=501, detail="Forex data not yet implemented")
+            else:
+                raise HTTPException(status_code=400, detail=f"Invalid market type: {market}")
         
-        # Optionally save to database
-        try:
-            market_type = MarketType.CRYPTO if market_lower == 'crypto' else MarketType.STOCK
-            db_market_data = MarketData(
-                symbol=symbol,
-                market=market_type,
-                price=price_data['price'],
-                open_price=price_data.get('open_price'),
-                high=price_data.get('high'),
-                low=price_data.get('low'),
-                close=price_data.get('close'),
-                volume=price_data.get('volume'),
-                change_24h=price_data.get('change_24h'),
-                change_percent_24h=price_data.get('change_percent_24h')
-            )
-            db.add(db_market_data)
-            db.commit()
-        except Exception as e:
-            logger.warning(f"Failed to save market data to DB: {e}")
-            db.rollback()
+        # Persist asynchronously; the flusher batches the insert
+        market_type = MarketType.CRYPTO if market_lower == 'crypto' else MarketType.STOCK
+        write_behind.enqueue_tick(symbol, market_type, price_data)
         
         return {
             "success": True,
@@ -78,90 +101,337 @@ async def get_current_price(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _fetch_batch_quotes(items: List[QuoteRequestItem]) -> List[Dict[str, Any]]:
+    """
+    Fetch quotes for mixed-market pairs, one bulk call per provider
+    
+    Crypto and stock groups run concurrently; failures are reported per
+    symbol instead of failing the batch.
+    """
+    crypto_symbols = sorted({i.symbol for i in items if i.market.lower() == 'crypto'})
+    stock_symbols = sorted({i.symbol for i in items if i.market.lower() in ['stock', 'stocks']})
+    
+    async def _crypto() -> Dict[str, Any]:
+        board_hits, to_fetch = board_reader.get_quotes(crypto_symbols, 'crypto')
+        if not to_fetch:
+            return {'results': board_hits, 'errors': {}}
+        try:
+            results = await run_in_threadpool(binance_service.get_prices, to_fetch)
+        except Exception as e:
+            return {'results': board_hits, 'errors': {s: str(e) for s in to_fetch}}
+        errors = {s: f"Unknown symbol: {s}" for s in to_fetch if s not in results}
+        return {'results': {**board_hits, **results}, 'errors': errors}
+    
+    async def _stocks() -> Dict[str, Any]:
+        board_hits, to_fetch = board_reader.get_quotes(stock_symbols, 'stock')
+        if not to_fetch:
+            return {'results': board_hits, 'errors': {}}
+        try:
+            batch = await run_in_threadpool(stocks_service.get_prices, to_fetch)
+        except Exception as e:
+            return {'results': board_hits, 'errors': {s: str(e) for s in to_fetch}}
+        return {'results': {**board_hits, **batch['results']}, 'errors': batch['errors']}
+    
+    crypto, stocks = await asyncio.gather(_crypto(), _stocks())
+    
+    response = []
+    for item in items:
+        market_lower = item.market.lower()
+        if market_lower == 'crypto':
+            batch = crypto
+        elif market_lower in ['stock', 'stocks']:
+            batch = stocks
+        elif market_lower == 'forex':
+            response.append({'market': item.market, 'symbol': item.symbol, 'success': False,
+                             'error': "Forex data not yet implemented"})
+            continue
+        else:
+            response.append({'market': item.market, 'symbol': item.symbol, 'success': False,
+                             'error': f"Invalid market type: {item.market}"})
+            continue
+        
+        if item.symbol in batch['results']:
+            response.append({'market': item.market, 'symbol': item.symbol, 'success': True,
+                             'data': batch['results'][item.symbol]})
+        else:
+            response.append({'market': item.market, 'symbol': item.symbol, 'success': False,
+                             'error': batch['errors'].get(item.symbol, "No data returned")})
+    
+    return response
+
+
+def _save_batch_quotes(quotes: List[Dict[str, Any]]) -> None:
+    """Queue successful batch quotes for write-behind persistence"""
+    for quote in quotes:
+        if quote['success']:
+            market_type = MarketType.CRYPTO if quote['market'].lower() == 'crypto' else MarketType.STOCK
+            write_behind.enqueue_tick(quote['symbol'], market_type, quote['data'])
+
+
+@router.post("/prices")
+async def get_batch_prices(request: BatchQuoteRequest):
+    """
+    Get current prices for many (market, symbol) pairs in one request
+    
+    Args:
+        request: Pairs to quote (up to MAX_BATCH_SYMBOLS)
+    """
+    try:
+        with span('fetch'):
+            quotes = await _fetch_batch_quotes(request.items)
+        _save_batch_quotes(quotes)
+        
+        return {
+            "success": True,
+            "data": quotes
+        }
+        
+    except Exception as e:
+        logger.error(f"Error fetching batch prices: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/prices/{market}")
+async def get_market_batch_prices(
+    market: str,
+    request: SymbolListRequest
+):
+    """
+    Get current prices for many symbols of one market
+    
+    Args:
+        market: Market type (crypto, stock)
+        request: Symbols to quote
+    """
+    try:
+        items = [QuoteRequestItem(market=market, symbol=symbol) for symbol in request.symbols]
+        with span('fetch'):
+            quotes = await _fetch_batch_quotes(items)
+        _save_batch_quotes(quotes)
+        
+        return {
+            "success": True,
+            "data": quotes
+        }
+        
+    except Exception as e:
+        logger.error(f"Error fetching batch prices for {market}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _market_type(market_lower: str) -> Optional[MarketType]:
+    """MarketType for a lowercased market path segment, or None"""
+    if market_lower == 'crypto':
+        return MarketType.CRYPTO
+    if market_lower in ['stock', 'stocks']:
+        return MarketType.STOCK
+    return None
+
+
+def _epoch_ms(value: datetime) -> int:
+    """Candle timestamp as epoch milliseconds"""
+    return int(value.timestamp() * 1000)
+
+
+def _encode(fmt: str, data: Any, extra: Optional[Dict[str, Any]] = None) -> bytes:
+    """encode_candles timed as the 'encode' span"""
+    with span('encode'):
+        return encode_candles(fmt, data, extra)
+
+
+def _candle_data(result: Dict[str, Any]) -> Any:
+    """Columns from a columnar candle_store result, otherwise the candle dictionaries"""
+    return result['columns'] if 'columns' in result else result['candles']
+
+
+def _validators(kind: str, data: Any, *params: Any) -> Tuple[str, Optional[datetime]]:
+    """ETag and Last-Modified (newest candle open) for candle columns or dictionaries"""
+    if isinstance(data, dict):
+        timestamps = data['timestamp']
+        last = datetime.fromtimestamp(timestamps[-1] / 1000, tz=timezone.utc) if timestamps else None
+        return columns_etag(kind, data, *params), last
+    return candle_etag(kind, data, *params), (data[-1]['timestamp'] if data else None)
+
+
+def _latest_max_age(timeframe: str, forming: Optional[Dict[str, Any]], last_open: Optional[datetime]) -> int:
+    """
+    max-age for a latest-candles window
+
+    Without a forming candle the window only changes once a new candle
+    opens, which can't happen before the next open on the timeframe grid.
+    """
+    if forming is not None or last_open is None:
+        return 0
+    step = TIMEFRAME_DELTAS[timeframe]
+    now = datetime.now(timezone.utc)
+    next_open = last_open + step * ((now - last_open) // step + 1)
+    return min(int((next_open - now).total_seconds()), CLOSED_CANDLE_MAX_AGE)
+
+
+def _range_max_age(timeframe: str, end: datetime) -> int:
+    """max-age for a range page: cacheable once every candle opening before ``end`` has closed"""
+    end = end if end.tzinfo else end.replace(tzinfo=timezone.utc)
+    closed = end + TIMEFRAME_DELTAS[timeframe] <= datetime.now(timezone.utc)
+    return CLOSED_CANDLE_MAX_AGE if closed else 0
+
+
 @router.get("/history/{market}/{symbol}")
 async def get_historical_data(
+    request: Request,
     market: str,
     symbol: str,
     timeframe: str = Query("1h", description="Timeframe (1m, 5m, 15m, 1h, 4h, 1d)"),
     limit: int = Query(100, ge=1, le=1000, description="Number of candles"),
-    db: Session = Depends(get_db)
+    since: Optional[int] = Query(None, description="Only return candles after this epoch-ms timestamp"),
+    format: Optional[str] = Query(None, description="Encoding (json, columnar, msgpack, arrow); overrides Accept"),
+    db: LazyAsyncSession = Depends(get_lazy_db)
 ):
     """
     Get historical OHLCV data
     
+    Responses carry an ETag derived from the candle values, so polling clients
+    can send If-None-Match and get a 304, or pass since to receive only the
+    candles they don't have yet.
+    
     Args:
         market: Market type
         symbol: Trading symbol
         timeframe: Candle timeframe
         limit: Number of candles to fetch
+        since: Delta mode cutoff (epoch milliseconds)
+        format: Response encoding; columnar, msgpack and arrow send one array per field
     """
     try:
+        fmt = negotiate_format(request, format)
+        if fmt is None:
+            raise HTTPException(status_code=406, detail=f"Unsupported or unavailable format: {format}")
+        
         market_lower = market.lower()
+        market_type = _market_type(market_lower)
+        if market_type is None:
+            raise HTTPException(status_code=400, detail=f"Invalid market type: {market}")
+        if timeframe not in TIMEFRAME_DELTAS:
+            raise HTTPException(status_code=400, detail=f"Invalid timeframe: {timeframe}")
         
-        if market_lower == 'crypto':
-            ohlcv_data = binance_service.get_historical_klines(
-                symbol=symbol,
-                interval=timeframe,
-                limit=limit
-            )
-        elif market_lower in ['stock', 'stocks']:
-            # Map timeframe to yfinance format
-            interval_map = {
-                '1m': '1m', '5m': '5m', '15m': '15m', '30m': '30m',
-                '1h': '1h', '4h': '4h', '1d': '1d', '1w': '1wk'
-            }
-            yf_interval = interval_map.get(timeframe, '1d')
-            
-            ohlcv_data = stocks_service.get_historical_data(
-                symbol=symbol,
-                interval=yf_interval,
-                period='1mo' if limit <= 30 else '3mo'
+        # Closed candles from memory/ohlcv_data; upstream only for gaps and the latest bar.
+        # Only row JSON needs a dictionary per candle; other formats get columns.
+        with span('fetch'):
+            latest = await candle_store_service.get_latest(
+                db, symbol, market_type, timeframe, limit, columnar=fmt != 'json'
             )
-            ohlcv_data = ohlcv_data[:limit]  # Limit results
-        else:
+        ohlcv_data = _candle_data(latest)
+        
+        if since is not None:
+            if 'columns' in latest:
+                ohlcv_data = columns_after(ohlcv_data, since)
+            else:
+                ohlcv_data = [c for c in ohlcv_data if _epoch_ms(c['timestamp']) > since]
+        
+        etag, last_modified = _validators('history', ohlcv_data, market_lower, symbol, timeframe, limit, since, fmt)
+        
+        return conditional_response(
+            request,
+            etag,
+            last_modified,
+            lambda: _encode(fmt, ohlcv_data),
+            media_type=MEDIA_TYPES[fmt],
+            max_age=_latest_max_age(timeframe, latest['forming'], last_modified),
+            vary='Accept'
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching historical data for {symbol}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/history/{market}/{symbol}/range")
+async def get_historical_range(
+    request: Request,
+    market: str,
+    symbol: str,
+    start: datetime = Query(..., description="Range start (ISO 8601, UTC unless an offset is given)"),
+    end: Optional[datetime] = Query(None, description="Range end (ISO 8601, UTC unless an offset is given), defaults to now"),
+    timeframe: str = Query("1h", description="Timeframe (1m, 5m, 15m, 30m, 1h, 4h, 1d, 1w)"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page"),
+    page_size: int = Query(500, ge=1, le=1000, description="Candles per page"),
+    format: Optional[str] = Query(None, description="Encoding (json, columnar, msgpack, arrow); overrides Accept"),
+    db: LazyAsyncSession = Depends(get_lazy_db)
+):
+    """
+    Get a page of historical OHLCV data for a time range
+    
+    Pages are read from ohlcv_data with keyset pagination; only ranges
+    missing from the database are fetched upstream. Follow nextCursor
+    (also sent as the X-Next-Cursor header) until it is null. Ranges that
+    ended at least a candle ago are cacheable for CLOSED_CANDLE_MAX_AGE.
+    
+    Args:
+        market: Market type
+        symbol: Trading symbol
+        start: Range start
+        end: Range end
+        timeframe: Candle timeframe
+        cursor: Continuation cursor
+        page_size: Candles per page
+        format: Response encoding
+    """
+    try:
+        fmt = negotiate_format(request, format)
+        if fmt is None:
+            raise HTTPException(status_code=406, detail=f"Unsupported or unavailable format: {format}")
+        
+        market_lower = market.lower()
+        market_type = _market_type(market_lower)
+        if market_type is None:
             raise HTTPException(status_code=400, detail=f"Invalid market type: {market}")
         
-        # Optionally save to database
+        if timeframe not in TIMEFRAME_DELTAS:
+            raise HTTPException(status_code=400, detail=f"Invalid timeframe: {timeframe}")
+        
+        window_end = end or datetime.now(timezone.utc)
         try:
-            market_type = MarketType.CRYPTO if market_lower == 'crypto' else MarketType.STOCK
-            
-            for candle in ohlcv_data[-10:]:  # Save last 10 candles to avoid overwhelming DB
-                db_ohlcv = OHLCV(
-                    symbol=symbol,
-                    market=market_type,
-                    timeframe=timeframe,
-                    timestamp=candle['timestamp'],
-                    open=candle['open'],
-                    high=candle['high'],
-                    low=candle['low'],
-                    close=candle['close'],
-                    volume=candle['volume']
-                )
-                db.merge(db_ohlcv)  # Use merge to avoid duplicates
-            
-            db.commit()
-        except Exception as e:
-            logger.warning(f"Failed to save OHLCV data to DB: {e}")
-            db.rollback()
+            page = await candle_store_service.get_page(
+                db, symbol, market_type, timeframe, start, window_end,
+                cursor, page_size, columnar=fmt != 'json'
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        return {
-            "success": True,
-            "data": ohlcv_data
-        }
+        data = _candle_data(page)
+        next_cursor = page['nextCursor']
+        etag, last_modified = _validators(
+            'range', data, market_lower, symbol, timeframe, start, end, cursor, page_size, next_cursor, fmt
+        )
+        
+        response = conditional_response(
+            request,
+            etag,
+            last_modified,
+            lambda: _encode(fmt, data, {'nextCursor': next_cursor}),
+            media_type=MEDIA_TYPES[fmt],
+            max_age=_range_max_age(timeframe, window_end),
+            vary='Accept'
+        )
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error fetching historical data for {symbol}: {e}")
+        logger.error(f"Error fetching historical range for {symbol}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/indicators/{market}/{symbol}")
 async def get_technical_indicators(
+    request: Request,
     market: str,
     symbol: str,
     timeframe: str = Query("1h", description="Timeframe for indicators"),
-    db: Session = Depends(get_db)
+    db: LazyAsyncSession = Depends(get_lazy_db)
 ):
     """
     Get technical indicators for a symbol
@@ -174,26 +444,17 @@ async def get_technical_indicators(
     try:
         # First, get historical data
         market_lower = market.lower()
+        market_type = _market_type(market_lower)
+        if market_type is None:
+            raise HTTPException(status_code=400, detail=f"Invalid market type: {market}")
+        if timeframe not in TIMEFRAME_DELTAS:
+            raise HTTPException(status_code=400, detail=f"Invalid timeframe: {timeframe}")
         
-        if market_lower == 'crypto':
-            ohlcv_data = binance_service.get_historical_klines(
-                symbol=symbol,
-                interval=timeframe,
-                limit=500  # Need enough data for indicators
-            )
-        elif market_lower in ['stock', 'stocks']:
-            interval_map = {
-                '1h': '1h', '4h': '4h', '1d': '1d', '1w': '1wk'
-            }
-            yf_interval = interval_map.get(timeframe, '1d')
-            
-            ohlcv_data = stocks_service.get_historical_data(
-                symbol=symbol,
-                interval=yf_interval,
-                period='1y'  # Get more data for accurate indicators
+        with span('fetch'):
+            latest = await candle_store_service.get_latest(
+                db, symbol, market_type, timeframe, limit=500  # Need enough data for indicators
             )
-        else:
-            raise HTTPException(status_code=400, detail=f"Invalid market type: {market}")
+        ohlcv_data = latest['candles']
         
         if not ohlcv_data or len(ohlcv_data) < 50:
             raise HTTPException(
@@ -201,16 +462,24 @@ async def get_technical_indicators(
                 detail="Insufficient data for indicator calculation"
             )
         
-        # Calculate indicators
-        indicators = indicators_service.calculate_all_indicators(ohlcv_data, symbol)
+        def _build() -> Dict[str, Any]:
+            # Calculate indicators
+            with span('indicators'):
+                indicators = indicators_service.calculate_all_indicators(ohlcv_data, symbol)
+            
+            # Add trend signal
+            with span('trend_signal'):
+                indicators['trendSignal'] = indicators_service.get_trend_signal(indicators)
+            
+            return {
+                "success": True,
+                "data": indicators
+            }
         
-        # Add trend signal
-        indicators['trendSignal'] = indicators_service.get_trend_signal(indicators)
+        # Indicators are only recomputed when the candle series changes
+        etag = candle_etag('indicators', ohlcv_data, market_lower, symbol, timeframe)
         
-        return {
-            "success": True,
-            "data": indicators
-        }
+        return conditional_json_response(request, etag, ohlcv_data[-1]['timestamp'], _build)
         
     except HTTPException:
         raise
@@ -222,31 +491,36 @@ async def get_technical_indicators(
 @router.get("/overview/{market}")
 async def get_market_overview(
     market: str,
-    db: Session = Depends(get_db)
+    region: str = Query("indian", description="Stock region (indian, us)")
 ):
     """
     Get market overview with top movers and statistics
     
+    Served from the latest background-refreshed snapshot; the response
+    includes the snapshot's generation time as generatedAt.
+    
     Args:
         market: Market type (crypto, stock)
+        region: Stock region, ignored for crypto
     """
     try:
         market_lower = market.lower()
         
         if market_lower == 'crypto':
-            overview = binance_service.get_market_overview()
+            snapshot_key = 'crypto'
         elif market_lower in ['stock', 'stocks']:
-            # Default to Indian market
-            overview = stocks_service.get_market_overview(market='indian')
+            if region.lower() not in ['indian', 'us']:
+                raise HTTPException(status_code=400, detail=f"Invalid stock region: {region}")
+            snapshot_key = region.lower()
         elif market_lower == 'forex':
             raise HTTPException(status_code=501, detail="Forex overview not yet implemented")
         else:
             raise HTTPException(status_code=400, detail=f"Invalid market type: {market}")
         
-        return {
-            "success": True,
-            "data": overview
-        }
+        with span('snapshot'):
+            snapshot = await overview_service.get_snapshot_async(snapshot_key)
+        
+        return Response(content=snapshot.body, media_type="application/json")
         
     except HTTPException:
         raise
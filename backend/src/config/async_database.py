@@ -0,0 +1,118 @@
+"""
+Async database configuration and session management
+Used by FastAPI routes; scripts and Alembic keep the sync stack in database.py
+"""
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from typing import Any, AsyncGenerator, AsyncIterator, Optional, Union
+from contextlib import asynccontextmanager
+import os
+import time
+
+from src.config.database import DATABASE_URL
+from src.utils.metrics import DB_CONNECTION_HOLD, TimedAsyncQueuePool, pool_collector
+
+
+def to_async_url(url: str) -> str:
+    """Swap a sync driver URL for its async equivalent (asyncpg / aiosqlite)"""
+    if url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url[len("postgresql+psycopg2://"):]
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+engine_options = {
+    "pool_pre_ping": True,  # Verify connections before using
+    "echo": os.getenv("DEBUG", "False").lower() == "true",  # Log SQL queries in debug mode
+}
+if not ASYNC_DATABASE_URL.startswith("sqlite"):
+    engine_options["poolclass"] = TimedAsyncQueuePool  # Checkout wait metrics
+    engine_options["pool_size"] = int(os.getenv("DATABASE_POOL_SIZE", 5))
+    engine_options["max_overflow"] = int(os.getenv("DATABASE_MAX_OVERFLOW", 10))
+
+# Create async SQLAlchemy engine
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options)
+
+pool_collector.register('async', async_engine)
+
+# Create AsyncSessionLocal class
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async database session dependency for FastAPI
+    Usage: db: AsyncSession = Depends(get_async_db)
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+class LazyAsyncSession:
+    """
+    Request-scoped stand-in for an AsyncSession that holds no connection
+    between uses
+
+    Each ``execute()`` (or ``session()`` block) checks a connection out of the
+    pool, runs, and ends its transaction straight away, so a handler that
+    awaits an upstream call after its query is not holding a pool slot in
+    the meantime. A request that never touches the database never checks
+    one out.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker = AsyncSessionLocal, engine_label: str = 'async'):
+        """
+        Initialize lazy session
+
+        Args:
+            session_factory: Sessionmaker for the units of work
+            engine_label: Engine label on the connection hold metric
+        """
+        self.session_factory = session_factory
+        self.engine_label = engine_label
+        self.checkouts = 0
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """
+        One unit of work: commits on success, rolls back on error, and
+        returns the connection when the block exits
+        """
+        started = time.perf_counter()
+        self.checkouts += 1
+        try:
+            async with self.session_factory() as db:
+                try:
+                    yield db
+                    await db.commit()
+                except BaseException:
+                    await db.rollback()
+                    raise
+        finally:
+            DB_CONNECTION_HOLD.labels(self.engine_label).observe(time.perf_counter() - started)
+
+    async def execute(self, statement: Any, params: Optional[Any] = None, **kwargs: Any):
+        """Run one statement in its own unit of work; the returned result is fully buffered"""
+        async with self.session() as db:
+            result = await db.execute(statement, params, **kwargs)
+            if isinstance(result, CursorResult) and not result.returns_rows:
+                return result
+            # Rows are read into memory before the connection goes back
+            return result.freeze()()
+
+
+# Sessions accepted by query helpers shared between both dependencies
+AsyncDB = Union[AsyncSession, LazyAsyncSession]
+
+
+async def get_lazy_db() -> AsyncGenerator[LazyAsyncSession, None]:
+    """
+    Lazy database session dependency for FastAPI
+    Usage: db: LazyAsyncSession = Depends(get_lazy_db)
+    """
+    yield LazyAsyncSession()
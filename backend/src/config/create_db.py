@@ -9,7 +9,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from src.config.database import engine, Base
-from src.models import User, MarketData, OHLCV, Prediction, Watchlist, Alert, Position
+from src.models import User, Instrument, MarketData, OHLCV, Prediction, Watchlist, Alert, Position
 
 def create_tables():
     """Create all database tables"""
@@ -3,7 +3,7 @@ Database models package
 """
 from src.config.database import Base, get_db, engine
 from src.models.user import User, UserRole
-from src.models.market import MarketData, OHLCV, MarketType
+from src.models.market import Instrument, MarketData, OHLCV, MarketType
 from src.models.prediction import Prediction, PredictionDirection, ModelType
 from src.models.watchlist import Watchlist, Alert, Position, AlertType, AlertCondition
 
@@ -13,6 +13,7 @@ __all__ = [
     "engine",
     "User",
     "UserRole",
+    "Instrument",
     "MarketData",
     "OHLCV",
     "MarketType",
@@ -1,7 +1,7 @@
 """
 Market data models
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, Index
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Enum, Index, ForeignKey
 from sqlalchemy.sql import func
 from src.config.database import Base
 import enum
@@ -14,6 +14,34 @@ class MarketType(enum.Enum):
     STOCK = "stock"
 
 
+class Instrument(Base):
+    """Dimension table of tradable symbols; fact tables reference it by id"""
+    __tablename__ = "instruments"
+
+    id = Column(Integer, primary_key=True)
+    
+    # Identifiers
+    symbol = Column(String, nullable=False)
+    market = Column(Enum(MarketType), nullable=False)
+    exchange = Column(String, nullable=True)  # BINANCE, NSE, BSE, NASDAQ, ...
+    
+    # Trading metadata
+    currency = Column(String, nullable=True)
+    tick_size = Column(Float, nullable=True)
+    lot_size = Column(Float, nullable=True)
+    is_active = Column(Boolean, default=True, nullable=False)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    __table_args__ = (
+        Index('idx_instruments_symbol_market', 'symbol', 'market', unique=True),
+    )
+
+    def __repr__(self):
+        return f"<Instrument {self.id} {self.market.value}:{self.symbol}>"
+
+
 class MarketData(Base):
     """Model for storing market price data"""
     __tablename__ = "market_data"
@@ -21,6 +49,7 @@ class MarketData(Base):
     id = Column(Integer, primary_key=True, index=True)
     
     # Identifiers
+    instrument_id = Column(Integer, ForeignKey("instruments.id"), nullable=True)
     symbol = Column(String, index=True, nullable=False)
     market = Column(Enum(MarketType), nullable=False)
     
@@ -41,7 +70,7 @@ class MarketData(Base):
     
     # Create composite index for efficient queries
     __table_args__ = (
-        Index('idx_symbol_market_timestamp', 'symbol', 'market', 'timestamp'),
+        Index('idx_market_data_instrument_timestamp', 'instrument_id', 'timestamp'),
     )
 
     def __repr__(self):
@@ -55,6 +84,7 @@ class OHLCV(Base):
     id = Column(Integer, primary_key=True, index=True)
     
     # Identifiers
+    instrument_id = Column(Integer, ForeignKey("instruments.id"), nullable=True)
     symbol = Column(String, index=True, nullable=False)
     market = Column(Enum(MarketType), nullable=False)
     timeframe = Column(String, nullable=False)  # 1m, 5m, 15m, 1h, 4h, 1d, etc.
@@ -69,7 +99,7 @@ class OHLCV(Base):
     
     # Create composite index
     __table_args__ = (
-        Index('idx_ohlcv_lookup', 'symbol', 'market', 'timeframe', 'timestamp', unique=True),
+        Index('idx_ohlcv_instrument_lookup', 'instrument_id', 'timeframe', 'timestamp', unique=True),
     )
 
     def __repr__(self):
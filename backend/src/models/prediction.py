@@ -1,7 +1,7 @@
 """
 Prediction models
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey, JSON, Index, text
 from sqlalchemy.sql import func
 from src.config.database import Base
 import enum
@@ -35,6 +35,7 @@ class Prediction(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     
     # Prediction details
+    instrument_id = Column(Integer, ForeignKey("instruments.id"), nullable=True)
     symbol = Column(String, index=True, nullable=False)
     market = Column(String, nullable=False)
     model = Column(Enum(ModelType), nullable=False)
@@ -67,5 +68,16 @@ class Prediction(Base):
     prediction_for = Column(DateTime(timezone=True), nullable=False)  # When this prediction is for
     evaluated_at = Column(DateTime(timezone=True), nullable=True)  # When we checked accuracy
 
+    # Keyset access paths used by src/services/record_store.py
+    __table_args__ = (
+        Index('idx_predictions_instrument_created', 'instrument_id', 'created_at', 'id'),
+        Index('idx_predictions_instrument_model_created', 'instrument_id', 'model', 'created_at', 'id'),
+        Index(
+            'idx_predictions_pending', 'prediction_for', 'id',
+            postgresql_where=text('evaluated_at IS NULL'),
+            sqlite_where=text('evaluated_at IS NULL')
+        ),
+    )
+
     def __repr__(self):
         return f"<Prediction {self.symbol} {self.direction} @ {self.confidence:.2f}>"
@@ -1,7 +1,7 @@
 """
 Watchlist and alert models
 """
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Enum, Index, text
 from sqlalchemy.sql import func
 from src.config.database import Base
 import enum
@@ -29,6 +29,7 @@ class Watchlist(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     
     # Symbol details
+    instrument_id = Column(Integer, ForeignKey("instruments.id"), nullable=True)
     symbol = Column(String, nullable=False)
     market = Column(String, nullable=False)
     
@@ -50,6 +51,7 @@ class Alert(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     
     # Alert details
+    instrument_id = Column(Integer, ForeignKey("instruments.id"), nullable=True, index=True)
     symbol = Column(String, nullable=False, index=True)
     alert_type = Column(Enum(AlertType), nullable=False)
     condition = Column(Enum(AlertCondition), nullable=False)
@@ -66,6 +68,21 @@ class Alert(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     triggered_at = Column(DateTime(timezone=True), nullable=True)
 
+    # Armed alerts only; SQLite stores booleans as integers
+    __table_args__ = (
+        Index(
+            'idx_alerts_armed', 'instrument_id', 'id',
+            postgresql_where=text('is_active AND NOT is_triggered'),
+            sqlite_where=text('is_active = 1 AND is_triggered = 0')
+        ),
+        # Armed alerts saved before their instrument was registered
+        Index(
+            'idx_alerts_unresolved', 'symbol', 'id',
+            postgresql_where=text('instrument_id IS NULL AND is_active AND NOT is_triggered'),
+            sqlite_where=text('instrument_id IS NULL AND is_active = 1 AND is_triggered = 0')
+        ),
+    )
+
     def __repr__(self):
         return f"<Alert {self.symbol} {self.condition.value} {self.target_value}>"
 
@@ -78,6 +95,7 @@ class Position(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     
     # Position details
+    instrument_id = Column(Integer, ForeignKey("instruments.id"), nullable=True)
     symbol = Column(String, nullable=False)
     market = Column(String, nullable=False)
     side = Column(String, nullable=False)  # long or short
@@ -101,5 +119,14 @@ class Position(Base):
     opened_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     closed_at = Column(DateTime(timezone=True), nullable=True)
 
+    # Open positions only
+    __table_args__ = (
+        Index(
+            'idx_positions_user_open', 'user_id', 'opened_at', 'id',
+            postgresql_where=text('is_open'),
+            sqlite_where=text('is_open = 1')
+        ),
+    )
+
     def __repr__(self):
         return f"<Position {self.symbol} {self.side} @ {self.entry_price}>"
@@ -4,9 +4,11 @@ Services package
 from src.services.binance_service import binance_service
 from src.services.stocks_service import stocks_service
 from src.services.indicators_service import indicators_service
+from src.services.overview_service import overview_service
 
 __all__ = [
     'binance_service',
     'stocks_service', 
-    'indicators_service'
+    'indicators_service',
+    'overview_service'
 ]
@@ -5,13 +5,19 @@ Fetches real-time and historical crypto market data
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 import asyncio
+import json
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
 import pandas as pd
 import logging
 
+from src.utils.metrics import observe_upstream
+
 logger = logging.getLogger(__name__)
 
+# Binance error code for an unknown trading pair
+INVALID_SYMBOL = -1121
+
 
 class BinanceService:
     """Service for interacting with Binance API"""
@@ -23,6 +29,10 @@ class BinanceService:
         'MATICUSDT', 'LTCUSDT', 'AVAXUSDT', 'LINKUSDT'
     ]
     
+    # Multi-symbol ticker requests cost the minimum weight up to 20 symbols;
+    # leaving the symbols out returns every pair at the highest weight
+    SYMBOLS_PER_REQUEST = 20
+    
     def __init__(self, api_key: Optional[str] = None, api_secret: Optional[str] = None):
         """
         Initialize Binance client
@@ -31,6 +41,7 @@ class BinanceService:
         self.client = Client(api_key, api_secret)
         self.cache: Dict[str, Any] = {}
         self.cache_ttl = 60  # Cache for 60 seconds
+        self.invalid_symbols: set = set()
         
     def get_current_price(self, symbol: str) -> Dict[str, Any]:
         """
@@ -43,7 +54,8 @@ class BinanceService:
             Dictionary with price data
         """
         try:
-            ticker = self.client.get_ticker(symbol=symbol)
+            with observe_upstream('binance', 'get_ticker', symbol):
+                ticker = self.client.get_ticker(symbol=symbol)
             
             return {
                 'symbol': symbol,
@@ -74,34 +86,95 @@ class BinanceService:
             List of price dictionaries
         """
         try:
-            all_tickers = self.client.get_ticker()
-            
-            # Filter for popular symbols
-            popular_tickers = [
-                t for t in all_tickers 
-                if t['symbol'] in self.POPULAR_SYMBOLS
-            ]
-            
-            results = []
-            for ticker in popular_tickers:
-                results.append({
-                    'symbol': ticker['symbol'],
-                    'price': float(ticker['lastPrice']),
-                    'open_price': float(ticker['openPrice']),
-                    'high': float(ticker['highPrice']),
-                    'low': float(ticker['lowPrice']),
-                    'close': float(ticker['lastPrice']),
-                    'volume': float(ticker['volume']),
-                    'change_24h': float(ticker['priceChange']),
-                    'change_percent_24h': float(ticker['priceChangePercent']),
-                    'timestamp': int(ticker['closeTime'])
-                })
-            
-            return results
+            return list(self.get_prices(self.POPULAR_SYMBOLS).values())
         except Exception as e:
             logger.error(f"Error fetching all prices: {e}")
             raise
     
+    def get_prices(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get current prices for many symbols with a single ticker call
+        
+        Args:
+            symbols: Trading pairs
+            
+        Returns:
+            Dictionary of symbol -> price data (unknown symbols are omitted)
+        """
+        results = {}
+        for ticker in self._fetch_tickers(self.client.get_ticker, 'get_ticker_batch', symbols):
+            results[ticker['symbol']] = {
+                'symbol': ticker['symbol'],
+                'price': float(ticker['lastPrice']),
+                'open_price': float(ticker['openPrice']),
+                'high': float(ticker['highPrice']),
+                'low': float(ticker['lowPrice']),
+                'close': float(ticker['lastPrice']),
+                'volume': float(ticker['volume']),
+                'change_24h': float(ticker['priceChange']),
+                'change_percent_24h': float(ticker['priceChangePercent']),
+                'timestamp': int(ticker['closeTime'])
+            }
+        
+        return results
+    
+    def get_book_tickers(self, symbols: List[str]) -> Dict[str, Dict[str, float]]:
+        """
+        Get best bid/ask for many symbols with a single book ticker call
+        
+        Args:
+            symbols: Trading pairs
+            
+        Returns:
+            Dictionary of symbol -> bid, bid_qty, ask, ask_qty
+        """
+        return {
+            book['symbol']: {
+                'bid': float(book['bidPrice']),
+                'bid_qty': float(book['bidQty']),
+                'ask': float(book['askPrice']),
+                'ask_qty': float(book['askQty'])
+            }
+            for book in self._fetch_tickers(self.client.get_orderbook_ticker, 'get_orderbook_batch', symbols)
+        }
+    
+    def _fetch_tickers(self, fetch, method: str, symbols: List[str]) -> List[Dict[str, Any]]:
+        """
+        Call a ticker endpoint for just the given symbols, in batches
+        
+        One unknown pair fails a whole batch, so a failed batch is retried
+        symbol by symbol and unknown pairs are skipped from then on.
+        
+        Args:
+            fetch: Client method taking symbol= or symbols=
+            method: Name recorded in upstream metrics
+            symbols: Trading pairs
+            
+        Returns:
+            Ticker rows for the known symbols
+        """
+        wanted = sorted(set(symbols) - self.invalid_symbols)
+        rows: List[Dict[str, Any]] = []
+        for start in range(0, len(wanted), self.SYMBOLS_PER_REQUEST):
+            batch = wanted[start:start + self.SYMBOLS_PER_REQUEST]
+            try:
+                with observe_upstream('binance', method):
+                    rows.extend(fetch(symbols=json.dumps(batch, separators=(',', ':'))))
+                continue
+            except BinanceAPIException as e:
+                if e.code != INVALID_SYMBOL:
+                    raise
+            for symbol in batch:
+                try:
+                    with observe_upstream('binance', method, symbol):
+                        rows.append(fetch(symbol=symbol))
+                except BinanceAPIException as e:
+                    if e.code != INVALID_SYMBOL:
+                        raise
+                    logger.warning(f"Skipping unknown Binance symbol {symbol}")
+                    self.invalid_symbols.add(symbol)
+        return rows
+    
     def get_historical_klines(
         self,
         symbol: str,
@@ -150,7 +223,8 @@ class BinanceService:
             if end_time:
                 params['endTime'] = int(end_time.timestamp() * 1000)
             
-            klines = self.client.get_klines(**params)
+            with observe_upstream('binance', 'get_klines', symbol):
+                klines = self.client.get_klines(**params)
             
             # Parse klines data
             ohlcv_data = []
@@ -184,7 +258,8 @@ class BinanceService:
             Order book with bids and asks
         """
         try:
-            depth = self.client.get_order_book(symbol=symbol, limit=limit)
+            with observe_upstream('binance', 'get_order_book', symbol):
+                depth = self.client.get_order_book(symbol=symbol, limit=limit)
             
             return {
                 'symbol': symbol,
@@ -245,7 +320,8 @@ class BinanceService:
             Symbol information
         """
         try:
-            info = self.client.get_symbol_info(symbol)
+            with observe_upstream('binance', 'get_symbol_info', symbol):
+                info = self.client.get_symbol_info(symbol)
             
             return {
                 'symbol': info['symbol'],
@@ -0,0 +1,657 @@
+"""
+Candle Store Service
+Range queries over ohlcv_data with keyset pagination and upstream gap filling,
+and read-through "latest N candles" served from memory and the database
+"""
+from typing import Iterator, List, Optional, Dict, Any, Tuple
+from collections import OrderedDict
+from datetime import datetime, time as dt_time, timedelta, timezone
+from zoneinfo import ZoneInfo
+import asyncio
+import base64
+import json
+import logging
+import math
+import os
+import threading
+
+from sqlalchemy import select
+
+from src.config.async_database import AsyncDB
+from src.models.market import OHLCV, MarketType
+from src.services.binance_service import binance_service
+from src.services.stocks_service import stocks_service
+from src.services.stock_providers import PERIOD_DELTAS
+from src.services.instrument_registry import instrument_registry, guess_exchange
+from src.utils.write_behind import write_behind
+from src.utils.candle_encoding import to_columns
+from src.utils.metrics import record_cache
+from src.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+OHLCV_VALUES = ('open', 'high', 'low', 'close', 'volume')
+
+# (timestamp, open, high, low, close, volume): how candles are queried and cached
+CandleRow = Tuple[datetime, float, float, float, float, float]
+
+TIMEFRAME_DELTAS = {
+    '1m': timedelta(minutes=1),
+    '5m': timedelta(minutes=5),
+    '15m': timedelta(minutes=15),
+    '30m': timedelta(minutes=30),
+    '1h': timedelta(hours=1),
+    '4h': timedelta(hours=4),
+    '1d': timedelta(days=1),
+    '1w': timedelta(weeks=1),
+}
+
+# Regular sessions by exchange (local open, close); the gap between two
+# stored stock candles is only missing data if a session overlaps it
+STOCK_SESSIONS = {
+    'NSE': (ZoneInfo('Asia/Kolkata'), dt_time(9, 15), dt_time(15, 30)),
+    'BSE': (ZoneInfo('Asia/Kolkata'), dt_time(9, 15), dt_time(15, 30)),
+    'US': (ZoneInfo('America/New_York'), dt_time(9, 30), dt_time(16, 0)),
+}
+
+# Calendar slack (weekends plus a holiday) when sizing stock downloads
+STOCK_CALENDAR_SLACK = timedelta(days=4)
+
+# Gaps that upstream confirmed empty (holidays, halts), remembered per process
+EMPTY_GAP_ENTRIES = 4096
+
+YF_INTERVALS = {
+    '1m': '1m', '5m': '5m', '15m': '15m', '30m': '30m',
+    '1h': '1h', '4h': '4h', '1d': '1d', '1w': '1wk'
+}
+
+# Regular stock session length, used to size cold history downloads
+STOCK_SESSION = timedelta(hours=6, minutes=30)
+
+CANDLE_CACHE_KEYS = int(os.getenv("CANDLE_CACHE_KEYS", 512))
+CANDLE_CACHE_DEPTH = int(os.getenv("CANDLE_CACHE_DEPTH", 1000))
+
+
+def to_utc(value: datetime) -> datetime:
+    """Normalize query times to aware UTC; naive values are taken as UTC"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def provider_utc(value: datetime) -> datetime:
+    """Normalize provider candle times to aware UTC; Binance klines carry naive local times"""
+    return value.astimezone(timezone.utc)
+
+
+def encode_cursor(timestamp: datetime) -> str:
+    """Opaque cursor pointing just after a candle"""
+    payload = json.dumps({'t': int(to_utc(timestamp).timestamp() * 1000)})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> datetime:
+    """Inverse of encode_cursor"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromtimestamp(payload['t'] / 1000, tz=timezone.utc)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def split_forming(
+    candles: List[Dict[str, Any]],
+    timeframe: str,
+    now: datetime
+) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Separate closed candles from the one still forming
+
+    Returns:
+        Tuple of (closed candles, forming candle or None)
+    """
+    step = TIMEFRAME_DELTAS[timeframe]
+    closed = [c for c in candles if c['timestamp'] + step <= now]
+    forming = [c for c in candles if c['timestamp'] + step > now]
+    return closed, (forming[-1] if forming else None)
+
+
+def candle_row(candle: Dict[str, Any]) -> CandleRow:
+    """Row form of an OHLCV dictionary"""
+    return (candle['timestamp'], candle['open'], candle['high'], candle['low'], candle['close'], candle['volume'])
+
+
+def row_candle(row: CandleRow) -> Dict[str, Any]:
+    """OHLCV dictionary (the row JSON shape) for a row"""
+    return {'timestamp': row[0], 'open': row[1], 'high': row[2], 'low': row[3], 'close': row[4], 'volume': row[5]}
+
+
+def rows_payload(rows: List[CandleRow], columnar: bool) -> Dict[str, Any]:
+    """{'columns': ...} straight from the rows, or {'candles': ...} as dictionaries"""
+    if columnar:
+        return {'columns': to_columns(rows)}
+    return {'candles': [row_candle(row) for row in rows]}
+
+
+class ClosedCandleCache:
+    """
+    LRU of the most recent closed candles per (symbol, market, timeframe)
+
+    Closed candles don't change, so an entry is only extended at the tail
+    (or patched where a gap was filled) and trimmed to ``depth`` candles.
+    """
+
+    def __init__(self, max_keys: int = CANDLE_CACHE_KEYS, depth: int = CANDLE_CACHE_DEPTH):
+        self.max_keys = max_keys
+        self.depth = depth
+        self._entries: "OrderedDict[tuple, Dict[datetime, CandleRow]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> List[CandleRow]:
+        """Cached closed candle rows, oldest first"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return []
+            self._entries.move_to_end(key)
+            return list(entry.values())
+
+    def merge(self, key: tuple, rows: List[CandleRow]) -> None:
+        """Add closed candle rows; newer values win on equal timestamps"""
+        if not rows:
+            return
+        with self._lock:
+            entry = dict(self._entries.get(key, {}))
+            for row in rows:
+                entry[row[0]] = row
+            ordered = sorted(entry)[-self.depth:]
+            self._entries[key] = {ts: entry[ts] for ts in ordered}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+
+
+class CandleStoreService:
+    """Serves candle ranges from ohlcv_data, fetching only missing ranges upstream"""
+
+    def __init__(self):
+        """Initialize candle store"""
+        self.closed_cache = ClosedCandleCache()
+        self._empty_gaps: "OrderedDict[tuple, bool]" = OrderedDict()
+        self._empty_lock = threading.Lock()
+
+    async def query_range(
+        self,
+        db: AsyncDB,
+        symbol: str,
+        market: MarketType,
+        timeframe: str,
+        after: datetime,
+        end: datetime,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Keyset query on idx_ohlcv_instrument_lookup: timestamp > after AND timestamp < end
+
+        Args:
+            db: Async database session (or LazyAsyncSession)
+            symbol: Trading symbol
+            market: Market type enum
+            timeframe: Candle timeframe
+            after: Exclusive lower bound
+            end: Exclusive upper bound
+            limit: Maximum rows
+
+        Returns:
+            Candle rows, oldest first
+        """
+        instrument_id = await instrument_registry.get_id_async(symbol, market)
+        if instrument_id is None:
+            return []
+
+        stmt = (
+            select(OHLCV.timestamp, OHLCV.open, OHLCV.high, OHLCV.low, OHLCV.close, OHLCV.volume)
+            .where(
+                OHLCV.instrument_id == instrument_id,
+                OHLCV.timeframe == timeframe,
+                OHLCV.timestamp > after,
+                OHLCV.timestamp < end,
+            )
+            .order_by(OHLCV.timestamp)
+            .limit(limit)
+        )
+        return [self._to_row(row) for row in await db.execute(stmt)]
+
+    async def query_latest(
+        self,
+        db: AsyncDB,
+        symbol: str,
+        market: MarketType,
+        timeframe: str,
+        before: datetime,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Newest ``limit`` candles opened at or before ``before``
+
+        Returns:
+            Candle rows, oldest first
+        """
+        instrument_id = await instrument_registry.get_id_async(symbol, market)
+        if instrument_id is None:
+            return []
+
+        stmt = (
+            select(OHLCV.timestamp, OHLCV.open, OHLCV.high, OHLCV.low, OHLCV.close, OHLCV.volume)
+            .where(
+                OHLCV.instrument_id == instrument_id,
+                OHLCV.timeframe == timeframe,
+                OHLCV.timestamp <= before,
+            )
+            .order_by(OHLCV.timestamp.desc())
+            .limit(limit)
+        )
+        rows = [self._to_row(row) for row in await db.execute(stmt)]
+        rows.reverse()
+        return rows
+
+    @staticmethod
+    def _to_row(row) -> CandleRow:
+        """Query row with its timestamp as aware UTC (SQLite returns naive UTC)"""
+        timestamp = row[0]
+        timestamp = timestamp.astimezone(timezone.utc) if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+        return (timestamp, row[1], row[2], row[3], row[4], row[5])
+
+    def find_gaps(
+        self,
+        timestamps: List[datetime],
+        start: datetime,
+        end: datetime,
+        timeframe: str,
+        market: MarketType,
+        symbol: Optional[str] = None
+    ) -> List[Tuple[datetime, datetime]]:
+        """
+        Missing (start, end) ranges in a sorted list of candle timestamps
+
+        A window with no stored candles is always missing. Between stored
+        crypto candles anything longer than one step is a gap; between stock
+        candles a gap is only missing data if a regular session of the
+        symbol's exchange overlaps it, so overnight and weekend closures are
+        skipped on every timeframe.
+
+        Args:
+            timestamps: Stored candle open times, oldest first
+            start: Window start (exclusive)
+            end: Window end (exclusive)
+            timeframe: Candle timeframe
+            market: Market type enum
+            symbol: Trading symbol (picks the stock exchange's sessions)
+
+        Returns:
+            List of missing ranges
+        """
+        if not timestamps:
+            return [(start, end)] if end > start else []
+
+        step = TIMEFRAME_DELTAS[timeframe]
+        session = self._session(symbol, market)
+
+        def missing(previous: datetime, following: datetime) -> bool:
+            # The next candle is due one step after ``previous``
+            if session is None:
+                return following - previous > step
+            return self._in_session(previous + step, following, session)
+
+        gaps = []
+        previous = start
+        for ts in timestamps:
+            if missing(previous, ts):
+                gaps.append((previous, ts))
+            previous = ts
+        if missing(previous, end):
+            gaps.append((previous, end))
+        return gaps
+
+    @staticmethod
+    def _session(symbol: Optional[str], market: MarketType) -> Optional[Tuple[ZoneInfo, dt_time, dt_time]]:
+        """Regular session of the symbol's exchange (None for crypto)"""
+        if market == MarketType.CRYPTO:
+            return None
+        return STOCK_SESSIONS.get(guess_exchange(symbol or '', market), STOCK_SESSIONS['US'])
+
+    @staticmethod
+    def _sessions(
+        first: datetime,
+        last: datetime,
+        session: Tuple[ZoneInfo, dt_time, dt_time]
+    ) -> Iterator[Tuple[datetime, datetime]]:
+        """Parts of [first, last) inside regular sessions, one per trading day"""
+        zone, open_time, close_time = session
+        day = first.astimezone(zone).date()
+        while day <= last.astimezone(zone).date():
+            if day.weekday() < 5:
+                session_open = max(first, datetime.combine(day, open_time, tzinfo=zone))
+                session_close = min(last, datetime.combine(day, close_time, tzinfo=zone))
+                if session_open < session_close:
+                    yield session_open, session_close
+            day += timedelta(days=1)
+
+    def _in_session(self, first: datetime, last: datetime, session: Tuple[ZoneInfo, dt_time, dt_time]) -> bool:
+        """Whether any regular session time falls in [first, last)"""
+        if last <= first:
+            return False
+        if last - first > timedelta(days=7):
+            return True
+        return next(self._sessions(first, last, session), None) is not None
+
+    def _bars_due(
+        self,
+        first: datetime,
+        last: datetime,
+        timeframe: str,
+        market: MarketType,
+        symbol: Optional[str] = None
+    ) -> float:
+        """
+        Approximate number of candles opening in [first, last)
+
+        Stock candles are only counted inside the exchange's regular
+        sessions, so a night or weekend adds nothing.
+        """
+        step = TIMEFRAME_DELTAS[timeframe]
+        session = self._session(symbol, market)
+        if last <= first:
+            return 0
+        if session is None:
+            return (last - first) / step
+        if step >= timedelta(days=1):
+            days = sum(1 for _ in self._sessions(first, last, session))
+            # Weekly bars cover five sessions
+            return days * (timedelta(days=1) if step == timedelta(days=1) else timedelta(days=7) / 5) / step
+        return sum(math.ceil((close - open_) / step) for open_, close in self._sessions(first, last, session))
+
+    def _unfilled(self, key: tuple, gaps: List[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+        """Gaps not already confirmed empty upstream"""
+        with self._empty_lock:
+            return [gap for gap in gaps if (key, gap) not in self._empty_gaps]
+
+    def _mark_empty(
+        self,
+        key: tuple,
+        gap: Tuple[datetime, datetime],
+        fetched: List[Dict[str, Any]],
+        now: datetime
+    ) -> None:
+        """Remember a closed-off gap that upstream returned nothing for"""
+        step = TIMEFRAME_DELTAS[key[2]]
+        if fetched or gap[1] + step > now:
+            return
+        with self._empty_lock:
+            self._empty_gaps[(key, gap)] = True
+            while len(self._empty_gaps) > EMPTY_GAP_ENTRIES:
+                self._empty_gaps.popitem(last=False)
+
+    def fetch_upstream(
+        self,
+        symbol: str,
+        market: MarketType,
+        timeframe: str,
+        start: datetime,
+        end: datetime
+    ) -> List[Dict[str, Any]]:
+        """Fetch candles for [start, end) from the market's provider"""
+        if market == MarketType.CRYPTO:
+            span = int((end - start) / TIMEFRAME_DELTAS[timeframe]) + 1
+            candles = binance_service.get_historical_klines(
+                symbol=symbol,
+                interval=timeframe,
+                limit=min(span, 1000),
+                start_time=start,
+                end_time=end
+            )
+        else:
+            candles = stocks_service.get_historical_data(
+                symbol=symbol,
+                interval=YF_INTERVALS.get(timeframe, '1d'),
+                start_date=start,
+                end_date=end
+            )
+
+        return [
+            self._normalize(c)
+            for c in candles
+            if start < provider_utc(c['timestamp']) < end
+        ]
+
+    @staticmethod
+    def _normalize(candle: Dict[str, Any]) -> Dict[str, Any]:
+        """Provider candle reduced to the stored columns, with a UTC timestamp"""
+        return {'timestamp': provider_utc(candle['timestamp']), **{k: candle[k] for k in OHLCV_VALUES}}
+
+    def fetch_latest_upstream(
+        self,
+        symbol: str,
+        market: MarketType,
+        timeframe: str,
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """Newest ``limit`` candles (including the forming one) from the market's provider"""
+        if market == MarketType.CRYPTO:
+            candles = binance_service.get_historical_klines(symbol=symbol, interval=timeframe, limit=limit)
+        else:
+            step = TIMEFRAME_DELTAS[timeframe]
+            # Calendar time covering ``limit`` bars of regular sessions
+            if step >= timedelta(days=1):
+                needed = step * limit * 7 / 5
+            else:
+                needed = timedelta(days=limit / max(STOCK_SESSION / step, 1) * 7 / 5)
+            needed += STOCK_CALENDAR_SLACK
+            period = next((p for p, delta in PERIOD_DELTAS.items() if delta >= needed), 'max')
+            candles = stocks_service.get_historical_data(
+                symbol=symbol,
+                interval=YF_INTERVALS.get(timeframe, '1d'),
+                period=period
+            )
+        return [self._normalize(c) for c in candles][-limit:]
+
+    async def get_latest(
+        self,
+        db: AsyncDB,
+        symbol: str,
+        market: MarketType,
+        timeframe: str,
+        limit: int,
+        columnar: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Newest ``limit`` candles, read through memory and ohlcv_data
+
+        Closed candles come from the in-process cache, then the database.
+        Interior gaps are filled upstream (stock gaps only inside exchange
+        sessions, and gaps upstream had nothing for are not asked again),
+        and one tail call from the last stored candle (re-fetched in case it
+        was stored while forming) brings in newer closed candles and the
+        forming one. A stock tail with no session time since the last stored
+        candle is skipped. Only closed candles are cached and persisted.
+        When fewer than ``limit - 1`` closed candles are stored, or more than
+        ``limit`` candles are due after the last one, the whole window is
+        fetched upstream in one call.
+
+        Args:
+            db: Async database session (or LazyAsyncSession)
+            symbol: Trading symbol
+            market: Market type enum
+            timeframe: Candle timeframe
+            limit: Number of candles, including the forming one
+            columnar: Return columns (one array per field) instead of candles
+
+        Returns:
+            Dictionary with candles or columns (oldest first, forming candle
+            last), forming (or None), fetched (candles pulled upstream) and
+            upstreamCalls
+        """
+        if timeframe not in TIMEFRAME_DELTAS:
+            raise ValueError(f"Unsupported timeframe: {timeframe}")
+
+        step = TIMEFRAME_DELTAS[timeframe]
+        now = datetime.now(timezone.utc)
+        key = (symbol, market, timeframe)
+
+        # The forming candle fills the last slot
+        needed = max(limit - 1, 1)
+
+        closed = self.closed_cache.get(key)
+        record_cache('candles', len(closed) >= needed)
+        if len(closed) < needed:
+            with span('db_query'):
+                stored = await self.query_latest(db, symbol, market, timeframe, now - step, limit)
+            merged = {row[0]: row for row in stored}
+            merged.update((row[0], row) for row in closed)
+            closed = [merged[ts] for ts in sorted(merged)]
+        closed = closed[-limit:]
+
+        fetched: List[Dict[str, Any]] = []
+        calls = 0
+        if len(closed) < needed or (
+            now - closed[-1][0] > step * limit
+            and self._bars_due(closed[-1][0] + step, now, timeframe, market, symbol) > limit
+        ):
+            # Cold: one call for the whole window
+            calls += 1
+            fetched = await asyncio.to_thread(self.fetch_latest_upstream, symbol, market, timeframe, limit)
+        else:
+            gaps = self._unfilled(key, self.find_gaps(
+                [row[0] for row in closed], closed[0][0], closed[-1][0],
+                timeframe, market, symbol
+            ))
+            session = self._session(symbol, market)
+            if session is None or self._in_session(closed[-1][0] + step, now + step, session):
+                # The tail starts at the last stored candle so it is refreshed too
+                tail = (closed[-1][0] - timedelta(microseconds=1), now + step)
+                gaps.append(tail)
+            for gap in gaps:
+                calls += 1
+                try:
+                    gap_candles = await asyncio.to_thread(self.fetch_upstream, symbol, market, timeframe, *gap)
+                except Exception as e:
+                    logger.warning(f"Failed to fill {symbol} {timeframe} gap {gap[0]} - {gap[1]}: {e}")
+                    continue
+                fetched.extend(gap_candles)
+                self._mark_empty(key, gap, gap_candles, now)
+
+        fetched_closed, forming = split_forming(fetched, timeframe, now)
+        if fetched_closed:
+            write_behind.enqueue_candles(symbol, market, timeframe, fetched_closed)
+
+        merged = {row[0]: row for row in closed}
+        merged.update((c['timestamp'], candle_row(c)) for c in fetched_closed)
+        rows = [merged[ts] for ts in sorted(merged)]
+        self.closed_cache.merge(key, rows[-limit:])
+
+        if forming is not None:
+            rows = rows[-(limit - 1):] + [candle_row(forming)] if limit > 1 else [candle_row(forming)]
+        else:
+            rows = rows[-limit:]
+
+        return {
+            **rows_payload(rows, columnar),
+            'forming': forming,
+            'fetched': len(fetched),
+            'upstreamCalls': calls,
+        }
+
+    async def get_page(
+        self,
+        db: AsyncDB,
+        symbol: str,
+        market: MarketType,
+        timeframe: str,
+        start: datetime,
+        end: datetime,
+        cursor: Optional[str] = None,
+        page_size: int = 500,
+        columnar: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Get one page of a candle range
+
+        The page window is at most ``page_size`` candles wide, so a gap in
+        it is always fillable with a single upstream call.
+
+        Args:
+            db: Async database session (or LazyAsyncSession)
+            symbol: Trading symbol
+            market: Market type enum
+            timeframe: Candle timeframe
+            start: Range start (inclusive; naive times are UTC)
+            end: Range end (exclusive; naive times are UTC)
+            cursor: Cursor from the previous page
+            page_size: Candles per page
+            columnar: Return columns (one array per field) instead of candles
+
+        Returns:
+            Dictionary with candles or columns, nextCursor and fetched
+            (candles pulled upstream)
+        """
+        if timeframe not in TIMEFRAME_DELTAS:
+            raise ValueError(f"Unsupported timeframe: {timeframe}")
+
+        step = TIMEFRAME_DELTAS[timeframe]
+        start = to_utc(start)
+        end = min(to_utc(end), datetime.now(timezone.utc))
+
+        after = decode_cursor(cursor) if cursor else start - timedelta(microseconds=1)
+        window_end = min(end, after + step * page_size)
+
+        with span('db_query'):
+            stored = await self.query_range(db, symbol, market, timeframe, after, window_end, page_size)
+        key = (symbol, market, timeframe)
+        gaps = self._unfilled(key, self.find_gaps(
+            [row[0] for row in stored], after, window_end, timeframe, market, symbol
+        ))
+
+        fetched: List[Dict[str, Any]] = []
+        for gap_start, gap_end in gaps:
+            try:
+                filled = await asyncio.to_thread(
+                    self.fetch_upstream, symbol, market, timeframe, gap_start, gap_end
+                )
+            except Exception as e:
+                logger.warning(f"Failed to fill {symbol} {timeframe} gap {gap_start} - {gap_end}: {e}")
+                continue
+            self._mark_empty(key, (gap_start, gap_end), filled, datetime.now(timezone.utc))
+            fetched.extend(filled)
+
+        # A forming candle is returned but not persisted
+        fetched_closed, _ = split_forming(fetched, timeframe, datetime.now(timezone.utc))
+        if fetched_closed:
+            write_behind.enqueue_candles(symbol, market, timeframe, fetched_closed)
+
+        merged = {row[0]: row for row in stored}
+        for candle in fetched:
+            merged[candle['timestamp']] = candle_row(candle)
+        rows = [merged[ts] for ts in sorted(merged)][:page_size]
+
+        if rows:
+            next_after = rows[-1][0]
+            has_more = len(rows) == page_size or window_end < end
+        else:
+            # Empty window: continue from its end
+            next_after = window_end - timedelta(microseconds=1)
+            has_more = window_end < end
+
+        return {
+            **rows_payload(rows, columnar),
+            'nextCursor': encode_cursor(next_after) if has_more else None,
+            'fetched': len(fetched),
+        }
+
+
+# Singleton instance
+candle_store_service = CandleStoreService()
@@ -8,6 +8,9 @@ import numpy as np
 from pandas_ta import rsi, macd, bbands, ema, sma, stoch, atr, adx, vwap, obv
 import logging
 
+from src.utils.metrics import INDICATOR_DURATION
+from src.utils.tracing import span
+
 logger = logging.getLogger(__name__)
 
 
@@ -38,29 +41,35 @@ class TechnicalIndicatorsService:
                 raise ValueError("Insufficient data for indicator calculation (need at least 50 candles)")
             
             # Convert to DataFrame
-            df = pd.DataFrame(ohlcv_data)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.sort_values('timestamp')
-            
-            # Ensure numeric types
-            for col in ['open', 'high', 'low', 'close', 'volume']:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+            with span('dataframe'):
+                df = pd.DataFrame(ohlcv_data)
+                df['timestamp'] = pd.to_datetime(df['timestamp'])
+                df = df.sort_values('timestamp')
+                
+                # Ensure numeric types
+                for col in ['open', 'high', 'low', 'close', 'volume']:
+                    df[col] = pd.to_numeric(df[col], errors='coerce')
             
-            # Calculate indicators
+            # Calculate indicators, timing each one
             indicators = {
                 'symbol': symbol,
                 'timestamp': int(df['timestamp'].iloc[-1].timestamp() * 1000),
-                'rsi': self._calculate_rsi(df),
-                'macd': self._calculate_macd(df),
-                'bollingerBands': self._calculate_bollinger_bands(df),
-                'ema': self._calculate_ema(df),
-                'sma': self._calculate_sma(df),
-                'stochastic': self._calculate_stochastic(df),
-                'atr': self._calculate_atr(df),
-                'adx': self._calculate_adx(df),
-                'vwap': self._calculate_vwap(df),
-                'obv': self._calculate_obv(df)
             }
+            calculators = [
+                ('rsi', self._calculate_rsi),
+                ('macd', self._calculate_macd),
+                ('bollingerBands', self._calculate_bollinger_bands),
+                ('ema', self._calculate_ema),
+                ('sma', self._calculate_sma),
+                ('stochastic', self._calculate_stochastic),
+                ('atr', self._calculate_atr),
+                ('adx', self._calculate_adx),
+                ('vwap', self._calculate_vwap),
+                ('obv', self._calculate_obv),
+            ]
+            for name, calculate in calculators:
+                with INDICATOR_DURATION.labels(name).time(), span(f"indicator_{name}"):
+                    indicators[name] = calculate(df)
             
             return indicators
             
@@ -0,0 +1,200 @@
+"""
+Instrument Registry
+In-process symbol <-> id cache over the instruments table
+
+Predictions, watchlists, alerts and positions saved through the ORM get
+their instrument_id filled in on insert (see _fill_instrument_id).
+"""
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+import logging
+import threading
+
+from sqlalchemy import event, select, insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+from src.config.database import engine
+from src.models.market import Instrument, MarketType
+from src.models.prediction import Prediction
+from src.models.watchlist import Watchlist, Alert, Position
+
+logger = logging.getLogger(__name__)
+
+# Exchange suffixes used by yfinance symbols
+STOCK_EXCHANGE_SUFFIXES = {'.NS': 'NSE', '.BO': 'BSE'}
+
+
+def guess_exchange(symbol: str, market: MarketType) -> Optional[str]:
+    """Best-effort exchange for a new instrument"""
+    if market == MarketType.CRYPTO:
+        return 'BINANCE'
+    for suffix, exchange in STOCK_EXCHANGE_SUFFIXES.items():
+        if symbol.endswith(suffix):
+            return exchange
+    return None
+
+
+def to_market_type(market: Any) -> MarketType:
+    """MarketType from an enum, its name or its value ('crypto', 'CRYPTO', ...)"""
+    if isinstance(market, MarketType):
+        return market
+    value = str(market).lower()
+    if value == 'stocks':
+        value = 'stock'
+    return MarketType(value)
+
+
+class InstrumentRegistry:
+    """
+    Maps (symbol, market) to instruments.id and back
+
+    Ids never change once assigned, so hits are served from memory for the
+    life of the process. Misses query the table on the shared engine, and
+    new instruments are inserted in their own short transaction, so an id
+    never points at a row that a caller's rollback removed.
+    """
+
+    def __init__(self):
+        """Initialize instrument registry"""
+        self._ids: Dict[Tuple[str, MarketType], int] = {}
+        self._keys: Dict[int, Tuple[str, MarketType]] = {}
+        self._lock = threading.Lock()
+
+    def _remember(self, key: Tuple[str, MarketType], instrument_id: int) -> int:
+        with self._lock:
+            self._ids[key] = instrument_id
+            self._keys[instrument_id] = key
+        return instrument_id
+
+    def _insert_stmt(self, symbol: str, market: MarketType):
+        values = {'symbol': symbol, 'market': market, 'exchange': guess_exchange(symbol, market)}
+        dialect = engine.dialect.name
+        if dialect == 'postgresql':
+            return postgresql.insert(Instrument).values(**values).on_conflict_do_nothing(
+                index_elements=['symbol', 'market']
+            )
+        if dialect == 'sqlite':
+            return sqlite.insert(Instrument).values(**values).on_conflict_do_nothing(
+                index_elements=['symbol', 'market']
+            )
+        return insert(Instrument).values(**values)
+
+    def get_id(self, symbol: str, market: Any, create: bool = True) -> Optional[int]:
+        """
+        Instrument id for a symbol
+
+        Args:
+            symbol: Trading symbol
+            market: MarketType or market name
+            create: Register the instrument if it is unknown
+
+        Returns:
+            Instrument id, or None if unknown and create is False
+        """
+        key = (symbol, to_market_type(market))
+        instrument_id = self._ids.get(key)
+        if instrument_id is not None:
+            return instrument_id
+
+        lookup = select(Instrument.id).where(Instrument.symbol == key[0], Instrument.market == key[1])
+        with engine.begin() as conn:
+            instrument_id = conn.execute(lookup).scalar()
+            if instrument_id is None and create:
+                conn.execute(self._insert_stmt(*key))
+                instrument_id = conn.execute(lookup).scalar()
+                logger.info(f"Registered instrument {key[1].value}:{key[0]} as {instrument_id}")
+
+        if instrument_id is None:
+            return None
+        return self._remember(key, instrument_id)
+
+    async def get_id_async(self, symbol: str, market: Any, create: bool = False) -> Optional[int]:
+        """get_id for async handlers; only misses leave the event loop"""
+        instrument_id = self._ids.get((symbol, to_market_type(market)))
+        if instrument_id is not None:
+            return instrument_id
+        return await asyncio.to_thread(self.get_id, symbol, market, create)
+
+    def get_id_for_insert(self, connection, symbol: str, market: Any = None) -> Optional[int]:
+        """
+        Instrument id for a row about to be inserted on ``connection``
+
+        With a market, an unknown instrument is registered on the same
+        connection so it commits or rolls back together with the row, and it
+        is only cached once a later lookup sees it committed. Without one
+        (alerts only carry a symbol) the symbol must name exactly one
+        instrument, as in the 4b8d2e6f1a93 backfill.
+
+        Args:
+            connection: Connection of the flush doing the insert
+            symbol: Trading symbol
+            market: MarketType or market name, if the row has one
+
+        Returns:
+            Instrument id, or None if it can't be determined
+        """
+        if market is None:
+            ids = connection.execute(
+                select(Instrument.id).where(Instrument.symbol == symbol).limit(2)
+            ).scalars().all()
+            return ids[0] if len(ids) == 1 else None
+
+        try:
+            key = (symbol, to_market_type(market))
+        except ValueError:
+            return None
+        instrument_id = self._ids.get(key)
+        if instrument_id is not None:
+            return instrument_id
+
+        lookup = select(Instrument.id).where(Instrument.symbol == key[0], Instrument.market == key[1])
+        instrument_id = connection.execute(lookup).scalar()
+        if instrument_id is None:
+            connection.execute(self._insert_stmt(*key))
+            instrument_id = connection.execute(lookup).scalar()
+        return instrument_id
+
+    def get_key(self, instrument_id: int) -> Optional[Tuple[str, MarketType]]:
+        """(symbol, market) for an instrument id"""
+        key = self._keys.get(instrument_id)
+        if key is not None:
+            return key
+
+        with engine.connect() as conn:
+            row = conn.execute(
+                select(Instrument.symbol, Instrument.market).where(Instrument.id == instrument_id)
+            ).first()
+        if row is None:
+            return None
+        key = (row.symbol, row.market)
+        self._remember(key, instrument_id)
+        return key
+
+    def assign(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fill instrument_id on row dictionaries that have symbol and market"""
+        for row in rows:
+            if row.get('instrument_id') is None:
+                row['instrument_id'] = self.get_id(row['symbol'], row['market'])
+        return rows
+
+    def clear(self) -> None:
+        """Forget cached ids"""
+        with self._lock:
+            self._ids.clear()
+            self._keys.clear()
+
+
+# Singleton instance
+instrument_registry = InstrumentRegistry()
+
+
+def _fill_instrument_id(mapper, connection, target) -> None:
+    """before_insert hook: the record queries look rows up by instrument_id, never by symbol"""
+    if target.instrument_id is None and target.symbol:
+        target.instrument_id = instrument_registry.get_id_for_insert(
+            connection, target.symbol, getattr(target, 'market', None)
+        )
+
+
+for _model in (Prediction, Watchlist, Alert, Position):
+    event.listen(_model, 'before_insert', _fill_instrument_id)
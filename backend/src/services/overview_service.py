@@ -0,0 +1,186 @@
+"""
+Market Overview Snapshots
+Precomputes market overviews in the background and serves them as ready-made snapshots
+"""
+from typing import Optional, Dict, Any, Callable
+from datetime import datetime, timezone
+import asyncio
+import json
+import os
+import threading
+import time
+import logging
+
+from src.services.binance_service import binance_service
+from src.services.stocks_service import stocks_service
+from src.services.instrument_registry import STOCK_EXCHANGE_SUFFIXES
+from src.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+def overview_market(symbol: str, market: str) -> str:
+    """Overview ('crypto', 'indian' or 'us') a symbol's price feeds into"""
+    if market == 'crypto':
+        return 'crypto'
+    return 'indian' if symbol.upper().endswith(tuple(STOCK_EXCHANGE_SUFFIXES)) else 'us'
+
+
+class OverviewSnapshot:
+    """Immutable, pre-serialized overview for one market"""
+
+    __slots__ = ('market', 'data', 'generated_at', 'body')
+
+    def __init__(self, market: str, data: Dict[str, Any]):
+        self.market = market
+        self.data = data
+        self.generated_at = datetime.now(timezone.utc)
+        self.body = json.dumps({
+            'success': True,
+            'data': data,
+            'generatedAt': self.generated_at.isoformat()
+        }, default=str).encode('utf-8')
+
+
+class OverviewService:
+    """
+    Background refresher for market overviews
+
+    Each market is recomputed on its own schedule, or earlier when a price
+    change is signalled, and the result replaces the previous snapshot with
+    a single reference swap. Readers never wait on upstream APIs.
+    """
+
+    def __init__(self):
+        """Initialize overview service"""
+        self.builders: Dict[str, Callable[[], Dict[str, Any]]] = {
+            'crypto': binance_service.get_market_overview,
+            'indian': lambda: stocks_service.get_market_overview(market='indian'),
+            'us': lambda: stocks_service.get_market_overview(market='us'),
+        }
+        self.intervals: Dict[str, float] = {
+            'crypto': float(os.getenv("OVERVIEW_REFRESH_CRYPTO", 15)),
+            'indian': float(os.getenv("OVERVIEW_REFRESH_STOCKS", 60)),
+            'us': float(os.getenv("OVERVIEW_REFRESH_STOCKS", 60)),
+        }
+        self.min_interval = float(os.getenv("OVERVIEW_MIN_REFRESH", 2))
+        self.snapshots: Dict[str, OverviewSnapshot] = {}
+        self._dirty: Dict[str, threading.Event] = {m: threading.Event() for m in self.builders}
+        self._stop = threading.Event()
+        self._threads: Dict[str, threading.Thread] = {}
+        self._build_locks: Dict[str, threading.Lock] = {m: threading.Lock() for m in self.builders}
+        # Completed builds per market, so callers queued behind a build reuse its outcome
+        self._builds: Dict[str, int] = {m: 0 for m in self.builders}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def refresh(self, market: str) -> Optional[OverviewSnapshot]:
+        """
+        Recompute and publish the overview for a market
+
+        Args:
+            market: 'crypto', 'indian' or 'us'
+
+        Returns:
+            The new snapshot, or None if the build failed
+        """
+        with self._build_locks[market]:
+            return self._build(market)
+
+    def _build(self, market: str) -> Optional[OverviewSnapshot]:
+        # Caller holds the market's build lock
+        try:
+            snapshot = OverviewSnapshot(market, self.builders[market]())
+        except Exception as e:
+            logger.error(f"Failed to refresh {market} overview: {e}")
+            return None
+        finally:
+            self._builds[market] += 1
+        self.snapshots[market] = snapshot
+        return snapshot
+
+    def get_snapshot(self, market: str) -> OverviewSnapshot:
+        """
+        Get the latest snapshot, building it once on a cold start
+
+        Concurrent cold callers share one build: whoever gets the build
+        lock first runs it, and the others take its result (or its
+        failure) instead of starting their own.
+
+        Args:
+            market: 'crypto', 'indian' or 'us'
+
+        Returns:
+            Latest overview snapshot
+        """
+        snapshot = self.snapshots.get(market)
+        record_cache('overview_snapshot', snapshot is not None)
+        if snapshot is not None:
+            return snapshot
+
+        builds = self._builds[market]
+        with self._build_locks[market]:
+            snapshot = self.snapshots.get(market)
+            if snapshot is None and self._builds[market] == builds:
+                snapshot = self._build(market)
+        if snapshot is None:
+            raise RuntimeError(f"No {market} overview available")
+        return snapshot
+
+    async def get_snapshot_async(self, market: str) -> OverviewSnapshot:
+        """
+        get_snapshot for async handlers
+
+        A cold build runs on a worker thread, and requests arriving while it
+        runs await the same future rather than queueing builds of their own.
+        """
+        snapshot = self.snapshots.get(market)
+        if snapshot is not None:
+            record_cache('overview_snapshot', True)
+            return snapshot
+
+        loop = asyncio.get_running_loop()
+        future = self._inflight.get(market)
+        if future is None or future.done() or future.get_loop() is not loop:
+            future = self._inflight[market] = asyncio.ensure_future(asyncio.to_thread(self.get_snapshot, market))
+        return await asyncio.shield(future)
+
+    def notify_price_change(self, market: str) -> None:
+        """Ask the refresher to rebuild a market's overview early"""
+        if market in self._dirty:
+            self._dirty[market].set()
+
+    def _run(self, market: str) -> None:
+        while not self._stop.is_set():
+            started = time.monotonic()
+            # Cleared before the build, so a change signalled during it triggers another
+            self._dirty[market].clear()
+            self.refresh(market)
+
+            # Sleep until the schedule is due or a price change arrives,
+            # but never rebuild more often than min_interval
+            self._dirty[market].wait(timeout=max(self.intervals[market] - (time.monotonic() - started), 0))
+            self._stop.wait(timeout=max(self.min_interval - (time.monotonic() - started), 0))
+
+    def start(self) -> None:
+        """Start one refresher thread per market"""
+        if os.getenv("OVERVIEW_REFRESHER_ENABLED", "True").lower() != "true":
+            return
+
+        self._stop.clear()
+        for market in self.builders:
+            if market in self._threads and self._threads[market].is_alive():
+                continue
+            thread = threading.Thread(target=self._run, args=(market,), name=f"overview-{market}", daemon=True)
+            thread.start()
+            self._threads[market] = thread
+        logger.info("Overview refresher started")
+
+    def stop(self) -> None:
+        """Stop refresher threads"""
+        self._stop.set()
+        for event in self._dirty.values():
+            event.set()
+
+
+# Singleton instance
+overview_service = OverviewService()
@@ -0,0 +1,257 @@
+"""
+Record Store Service
+Indexed, keyset-paginated reads of predictions, alerts and positions
+
+Each query walks one of the composite or partial indexes declared on the
+models (see the 9d3f5b7c2e14 migration), so its cost grows with the page
+size rather than the table size. Pages are ordered on (column, id) and
+cursors carry both values, which keeps pagination stable when timestamps
+tie.
+"""
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime, timezone
+import base64
+import json
+import logging
+
+from sqlalchemy import select, tuple_, union_all
+
+from src.config.async_database import AsyncDB
+from src.models.prediction import Prediction, ModelType
+from src.models.watchlist import Alert, Position
+from src.services.instrument_registry import instrument_registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_keyset(value: Any, row_id: int) -> str:
+    """Opaque cursor for the (value, id) of the last row on a page"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps({'v': value, 'id': row_id})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_keyset(cursor: str, timestamp: bool = True) -> Tuple[Any, int]:
+    """Inverse of encode_keyset"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        value = datetime.fromisoformat(payload['v']) if timestamp else payload['v']
+        return value, int(payload['id'])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _page(rows: List[Any], limit: int, key: str) -> Dict[str, Any]:
+    """Trim the look-ahead row and build the next cursor"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    last = rows[-1] if rows else None
+    return {
+        'items': rows,
+        'nextCursor': encode_keyset(getattr(last, key), last.id) if has_more else None,
+    }
+
+
+def _page_size(limit: int) -> int:
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+
+class RecordStoreService:
+    """Query helpers for predictions, alerts and positions"""
+
+    async def latest_prediction(
+        self,
+        db: AsyncDB,
+        symbol: str,
+        market: Any,
+        model: ModelType
+    ) -> Optional[Prediction]:
+        """
+        Newest prediction for a symbol from one model
+
+        One descending probe of idx_predictions_instrument_model_created.
+
+        Args:
+            db: Async database session (or LazyAsyncSession)
+            symbol: Trading symbol
+            market: MarketType or market name
+            model: Prediction model
+
+        Returns:
+            Prediction, or None
+        """
+        instrument_id = await instrument_registry.get_id_async(symbol, market)
+        if instrument_id is None:
+            return None
+
+        stmt = (
+            select(Prediction)
+            .where(Prediction.instrument_id == instrument_id, Prediction.model == model)
+            .order_by(Prediction.created_at.desc(), Prediction.id.desc())
+            .limit(1)
+        )
+        return (await db.execute(stmt)).scalars().first()
+
+    async def latest_predictions(
+        self,
+        db: AsyncDB,
+        symbol: str,
+        market: Any
+    ) -> Dict[str, Prediction]:
+        """
+        Newest prediction for a symbol from each model
+
+        One index probe per model instead of a GROUP BY over the
+        symbol's whole history (ModelType is a short, fixed list).
+
+        Returns:
+            Dictionary of model name to Prediction (models without one are omitted)
+        """
+        latest = {}
+        for model in ModelType:
+            prediction = await self.latest_prediction(db, symbol, market, model)
+            if prediction is not None:
+                latest[model.value] = prediction
+        return latest
+
+    async def prediction_history(
+        self,
+        db: AsyncDB,
+        symbol: str,
+        market: Any,
+        model: Optional[ModelType] = None,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE
+    ) -> Dict[str, Any]:
+        """
+        Predictions for a symbol, newest first
+
+        Args:
+            db: Async database session (or LazyAsyncSession)
+            symbol: Trading symbol
+            market: MarketType or market name
+            model: Only this model
+            cursor: nextCursor from the previous page
+            limit: Page size
+
+        Returns:
+            Dictionary with items and nextCursor (None on the last page)
+        """
+        limit = _page_size(limit)
+        instrument_id = await instrument_registry.get_id_async(symbol, market)
+        if instrument_id is None:
+            return {'items': [], 'nextCursor': None}
+
+        stmt = select(Prediction).where(Prediction.instrument_id == instrument_id)
+        if model is not None:
+            stmt = stmt.where(Prediction.model == model)
+        if cursor:
+            stmt = stmt.where(tuple_(Prediction.created_at, Prediction.id) < decode_keyset(cursor))
+        stmt = stmt.order_by(Prediction.created_at.desc(), Prediction.id.desc()).limit(limit + 1)
+
+        rows = (await db.execute(stmt)).scalars().all()
+        return _page(rows, limit, 'created_at')
+
+    async def predictions_due(
+        self,
+        db: AsyncDB,
+        now: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = MAX_PAGE_SIZE
+    ) -> Dict[str, Any]:
+        """
+        Unevaluated predictions whose horizon has passed, oldest first
+
+        Walks the partial idx_predictions_pending index, which only holds
+        rows with evaluated_at IS NULL.
+
+        Returns:
+            Dictionary with items and nextCursor
+        """
+        limit = _page_size(limit)
+        stmt = select(Prediction).where(
+            Prediction.evaluated_at.is_(None),
+            Prediction.prediction_for <= (now or datetime.now(timezone.utc)),
+        )
+        if cursor:
+            stmt = stmt.where(tuple_(Prediction.prediction_for, Prediction.id) > decode_keyset(cursor))
+        stmt = stmt.order_by(Prediction.prediction_for, Prediction.id).limit(limit + 1)
+
+        rows = (await db.execute(stmt)).scalars().all()
+        return _page(rows, limit, 'prediction_for')
+
+    async def armed_alerts(
+        self,
+        db: AsyncDB,
+        symbol: str,
+        market: Any,
+        cursor: Optional[str] = None,
+        limit: int = MAX_PAGE_SIZE
+    ) -> Dict[str, Any]:
+        """
+        Active, untriggered alerts for a symbol, in id order
+
+        Uses the partial idx_alerts_armed index, so triggered and disabled
+        alerts cost nothing however many accumulate. Alerts are given an
+        instrument_id on insert, but one saved before its instrument was
+        registered keeps a NULL id; those are matched on symbol through the
+        partial idx_alerts_unresolved index.
+
+        Returns:
+            Dictionary with items and nextCursor
+        """
+        limit = _page_size(limit)
+        instrument_id = await instrument_registry.get_id_async(symbol, market)
+
+        # Same predicate as the indexes so the planner can match them
+        armed = [Alert.is_active, ~Alert.is_triggered]
+        if cursor:
+            _, after_id = decode_keyset(cursor, timestamp=False)
+            armed.append(Alert.id > after_id)
+
+        def branch(*match):
+            # One ordered, limited walk per index; an OR would scan all armed alerts
+            return select(Alert.id).where(*match, *armed).order_by(Alert.id).limit(limit + 1).subquery()
+
+        branches = [branch(Alert.instrument_id.is_(None), Alert.symbol == symbol)]
+        if instrument_id is not None:
+            branches.append(branch(Alert.instrument_id == instrument_id))
+        ids = union_all(*(select(b.c.id) for b in branches))
+        stmt = select(Alert).where(Alert.id.in_(ids)).order_by(Alert.id).limit(limit + 1)
+
+        rows = (await db.execute(stmt)).scalars().all()
+        return _page(rows, limit, 'id')
+
+    async def open_positions(
+        self,
+        db: AsyncDB,
+        user_id: int,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE
+    ) -> Dict[str, Any]:
+        """
+        A user's open positions, oldest first
+
+        Uses the partial idx_positions_user_open index.
+
+        Returns:
+            Dictionary with items and nextCursor
+        """
+        limit = _page_size(limit)
+        stmt = select(Position).where(Position.user_id == user_id, Position.is_open)
+        if cursor:
+            stmt = stmt.where(tuple_(Position.opened_at, Position.id) > decode_keyset(cursor))
+        stmt = stmt.order_by(Position.opened_at, Position.id).limit(limit + 1)
+
+        rows = (await db.execute(stmt)).scalars().all()
+        return _page(rows, limit, 'opened_at')
+
+
+# Singleton instance
+record_store_service = RecordStoreService()
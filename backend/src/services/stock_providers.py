@@ -0,0 +1,568 @@
+"""
+Stock Market Data Providers
+Pluggable upstream sources for stock quotes and history, with a latency-aware router
+"""
+from typing import List, Optional, Dict, Any, Callable
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+import threading
+import time
+import os
+import yfinance as yf
+import pandas as pd
+import numpy as np
+import logging
+
+from src.utils.metrics import observe_upstream
+
+logger = logging.getLogger(__name__)
+
+# Try to import nsepy for Indian stocks
+try:
+    from nsepy import get_history
+    from nsepy.live import get_quote
+    NSEPY_AVAILABLE = True
+except ImportError:
+    NSEPY_AVAILABLE = False
+    logger.warning("NSEpy not available. Indian stock live data will be limited.")
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# yfinance period strings as time spans, for providers that need explicit dates
+PERIOD_DELTAS = {
+    '1d': timedelta(days=1),
+    '5d': timedelta(days=5),
+    '1mo': timedelta(days=31),
+    '3mo': timedelta(days=92),
+    '6mo': timedelta(days=183),
+    '1y': timedelta(days=366),
+    '2y': timedelta(days=731),
+    '5y': timedelta(days=1827),
+}
+
+
+def build_quote(symbol: str, history: pd.DataFrame, info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build a price dictionary from the last two daily bars
+
+    Args:
+        symbol: Stock ticker
+        history: Daily OHLCV frame (yfinance column names)
+        info: Optional company info for fundamentals
+
+    Returns:
+        Dictionary with price data
+    """
+    if history.empty:
+        raise ValueError(f"No data available for {symbol}")
+
+    info = info or {}
+    latest = history.iloc[-1]
+    previous = history.iloc[-2] if len(history) > 1 else latest
+
+    current_price = latest['Close']
+
+    # Calculate 24h change
+    change_24h = current_price - previous['Close']
+    change_percent_24h = (change_24h / previous['Close']) * 100 if previous['Close'] > 0 else 0
+
+    return {
+        'symbol': symbol,
+        'price': float(current_price),
+        'open_price': float(latest['Open']),
+        'high': float(latest['High']),
+        'low': float(latest['Low']),
+        'close': float(current_price),
+        'volume': float(latest['Volume']),
+        'change_24h': float(change_24h),
+        'change_percent_24h': float(change_percent_24h),
+        'market_cap': info.get('marketCap', 0),
+        'pe_ratio': info.get('trailingPE'),
+        'eps': info.get('trailingEps'),
+        'timestamp': int(datetime.now().timestamp() * 1000)
+    }
+
+
+class StockDataProvider(ABC):
+    """Base class for stock data sources"""
+
+    name = 'base'
+
+    def supports(self, symbol: str, interval: str = '1d') -> bool:
+        """Whether this provider can serve the symbol at the given interval"""
+        return True
+
+    @abstractmethod
+    def get_quote(self, symbol: str) -> Dict[str, Any]:
+        """
+        Get current price data
+
+        Args:
+            symbol: Stock ticker
+
+        Returns:
+            Dictionary with price data
+        """
+
+    def get_quotes(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get current price data for many symbols
+
+        Providers with a bulk endpoint override this; the default calls
+        get_quote per symbol and leaves failed symbols out.
+
+        Args:
+            symbols: Stock tickers
+
+        Returns:
+            Dictionary of symbol -> price data
+        """
+        results = {}
+        for symbol in symbols:
+            try:
+                results[symbol] = self.get_quote(symbol)
+            except Exception as e:
+                logger.warning(f"{self.name} quote failed for {symbol}: {e}")
+        return results
+
+    @abstractmethod
+    def get_history(
+        self,
+        symbol: str,
+        interval: str = '1d',
+        period: Optional[str] = '1mo',
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        """
+        Get OHLCV history
+
+        Args:
+            symbol: Stock ticker
+            interval: yfinance interval
+            period: yfinance period (ignored when start is given)
+            start: Start datetime (optional)
+            end: End datetime (optional)
+
+        Returns:
+            DataFrame indexed by timestamp with yfinance column names
+        """
+
+
+class YFinanceProvider(StockDataProvider):
+    """Yahoo Finance via yfinance"""
+
+    name = 'yfinance'
+
+    def get_quote(self, symbol: str) -> Dict[str, Any]:
+        ticker = yf.Ticker(symbol)
+        with observe_upstream('yfinance', 'ticker.info', symbol):
+            info = ticker.info
+        with observe_upstream('yfinance', 'ticker.history', symbol):
+            history = ticker.history(period='5d')
+        return build_quote(symbol, history, info)
+
+    def get_quotes(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        # One batched download instead of an info + history round trip per symbol
+        with observe_upstream('yfinance', 'download'):
+            df = yf.download(
+                tickers=symbols,
+                period='5d',
+                interval='1d',
+                group_by='ticker',
+                auto_adjust=True,
+                threads=True,
+                progress=False
+            )
+
+        results = {}
+        for symbol in symbols:
+            try:
+                if isinstance(df.columns, pd.MultiIndex):
+                    frame = df[symbol]
+                else:
+                    frame = df
+                frame = frame.dropna(how='all')
+                results[symbol] = build_quote(symbol, frame)
+            except Exception as e:
+                logger.warning(f"yfinance batch quote failed for {symbol}: {e}")
+        return results
+
+    def get_history(self, symbol, interval='1d', period='1mo', start=None, end=None) -> pd.DataFrame:
+        ticker = yf.Ticker(symbol)
+        with observe_upstream('yfinance', 'ticker.history', symbol):
+            if start is not None:
+                return ticker.history(start=start, end=end, interval=interval)
+            return ticker.history(period=period, interval=interval)
+
+
+class NSEpyProvider(StockDataProvider):
+    """NSE India via nsepy (daily bars for .NS equities only)"""
+
+    name = 'nsepy'
+
+    def supports(self, symbol: str, interval: str = '1d') -> bool:
+        return NSEPY_AVAILABLE and symbol.endswith('.NS') and interval == '1d'
+
+    @staticmethod
+    def _nse_symbol(symbol: str) -> str:
+        return symbol[:-len('.NS')]
+
+    def get_quote(self, symbol: str) -> Dict[str, Any]:
+        with observe_upstream('nsepy', 'get_quote', symbol):
+            quote = get_quote(self._nse_symbol(symbol))
+        data = quote['data'][0] if 'data' in quote else quote
+
+        def _num(key: str) -> float:
+            return float(str(data.get(key, 0)).replace(',', '') or 0)
+
+        price = _num('lastPrice')
+        previous_close = _num('previousClose')
+        change_24h = price - previous_close
+
+        return {
+            'symbol': symbol,
+            'price': price,
+            'open_price': _num('open'),
+            'high': _num('dayHigh'),
+            'low': _num('dayLow'),
+            'close': price,
+            'volume': _num('totalTradedVolume'),
+            'change_24h': change_24h,
+            'change_percent_24h': (change_24h / previous_close) * 100 if previous_close > 0 else 0,
+            'market_cap': 0,
+            'pe_ratio': None,
+            'eps': None,
+            'timestamp': int(datetime.now().timestamp() * 1000)
+        }
+
+    def get_history(self, symbol, interval='1d', period='1mo', start=None, end=None) -> pd.DataFrame:
+        end = end or datetime.now()
+        if start is None:
+            start = end - PERIOD_DELTAS.get(period, PERIOD_DELTAS['1mo'])
+
+        with observe_upstream('nsepy', 'get_history', symbol):
+            df = get_history(symbol=self._nse_symbol(symbol), start=start.date(), end=end.date())
+        if df.empty:
+            return df
+
+        df = df[OHLCV_COLUMNS].copy()
+        df.index = pd.DatetimeIndex(pd.to_datetime(df.index)).tz_localize('Asia/Kolkata')
+        return df
+
+
+class LocalFileProvider(StockDataProvider):
+    """
+    Serves history from local CSV/Parquet files
+
+    Files are named ``{symbol}_{interval}.parquet`` (or ``.csv`` with a
+    timestamp index column) and use yfinance column names. Intended for
+    tests and offline development.
+    """
+
+    name = 'local'
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or os.getenv("LOCAL_PROVIDER_DIR", "."))
+
+    def _find(self, symbol: str, interval: str) -> Optional[Path]:
+        for suffix in ('.parquet', '.csv'):
+            path = self.root / f"{symbol}_{interval}{suffix}"
+            if path.exists():
+                return path
+        return None
+
+    def supports(self, symbol: str, interval: str = '1d') -> bool:
+        return self._find(symbol, interval) is not None
+
+    def _load(self, symbol: str, interval: str) -> pd.DataFrame:
+        path = self._find(symbol, interval)
+        if path is None:
+            raise ValueError(f"No local data for {symbol} {interval}")
+        if path.suffix == '.parquet':
+            return pd.read_parquet(path)
+        df = pd.read_csv(path, index_col=0)
+        df.index = pd.to_datetime(df.index, utc=True)
+        return df
+
+    def get_quote(self, symbol: str) -> Dict[str, Any]:
+        return build_quote(symbol, self._load(symbol, '1d'))
+
+    def get_history(self, symbol, interval='1d', period='1mo', start=None, end=None) -> pd.DataFrame:
+        df = self._load(symbol, interval).sort_index()
+        if start is None and period in PERIOD_DELTAS:
+            start = df.index[-1] - PERIOD_DELTAS[period]
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df.index < pd.Timestamp(end)]
+        return df
+
+
+class ProviderRouter:
+    """
+    Routes calls to the healthiest, fastest provider
+
+    Providers are ranked by recent latency, with a heavy penalty for recent
+    errors, and calls fall back down the ranking on failure. Until every
+    candidate has been called, the configured order is used. Errors only
+    count for ``error_decay`` seconds, so a provider that was demoted gets
+    called again once its errors age out. In hedged mode
+    a second provider is started when the first one has not answered within
+    its own latency percentile, and whichever succeeds first wins.
+    """
+
+    def __init__(
+        self,
+        providers: List[StockDataProvider],
+        hedge: bool = False,
+        hedge_percentile: float = 95.0,
+        window: int = 100,
+        error_decay: float = 300.0
+    ):
+        """
+        Initialize provider router
+
+        Args:
+            providers: Providers in default preference order
+            hedge: Whether to fire a backup request for slow calls
+            hedge_percentile: Latency percentile after which to hedge
+            window: Number of recent calls kept per provider
+            error_decay: Seconds an outcome counts towards the error rate
+        """
+        self.providers = providers
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.error_decay = error_decay
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, deque]] = {
+            p.name: {'latencies': deque(maxlen=window), 'outcomes': deque(maxlen=window)}
+            for p in providers
+        }
+        self._pool = ThreadPoolExecutor(max_workers=max(4, 2 * len(providers)), thread_name_prefix='provider-hedge')
+
+    def _record(self, provider: StockDataProvider, latency: Optional[float], ok: bool) -> None:
+        with self._lock:
+            stats = self._stats[provider.name]
+            stats['outcomes'].append((time.monotonic(), ok))
+            if ok and latency is not None:
+                stats['latencies'].append(latency)
+
+    def _tried(self, provider: StockDataProvider) -> bool:
+        with self._lock:
+            return bool(self._stats[provider.name]['outcomes'])
+
+    def _error_rate(self, outcomes) -> float:
+        """Share of failures among outcomes younger than error_decay"""
+        cutoff = time.monotonic() - self.error_decay
+        recent = [ok for at, ok in outcomes if at >= cutoff]
+        return 1 - sum(recent) / len(recent) if recent else 0.0
+
+    def _score(self, provider: StockDataProvider) -> float:
+        """Lower is better: median latency inflated by the recent error rate"""
+        with self._lock:
+            stats = self._stats[provider.name]
+            latency = float(np.median(stats['latencies'])) if stats['latencies'] else 10.0
+            error_rate = self._error_rate(stats['outcomes'])
+        return latency * (1 + 10 * error_rate)
+
+    def _hedge_delay(self, provider: StockDataProvider) -> Optional[float]:
+        with self._lock:
+            latencies = list(self._stats[provider.name]['latencies'])
+        if len(latencies) < 10:
+            return None
+        return float(np.percentile(latencies, self.hedge_percentile))
+
+    def rank(self, symbol: str, interval: str = '1d') -> List[StockDataProvider]:
+        """Providers able to serve the symbol, best first"""
+        candidates = [p for p in self.providers if p.supports(symbol, interval)]
+        if not all(self._tried(p) for p in candidates):
+            # No basis for comparison yet: keep the configured order
+            return candidates
+        return sorted(candidates, key=self._score)
+
+    def _timed(
+        self,
+        provider: StockDataProvider,
+        fn: Callable[[StockDataProvider], Any],
+        record_latency: bool = True
+    ) -> Any:
+        """
+        Run a provider call and record its outcome
+
+        Bulk calls pass record_latency=False: a whole batch's latency would
+        skew the single-call median and the hedge percentile.
+        """
+        started = time.monotonic()
+        try:
+            result = fn(provider)
+        except Exception:
+            self._record(provider, None, False)
+            raise
+        self._record(provider, time.monotonic() - started if record_latency else None, True)
+        return result
+
+    def call(self, symbol: str, fn: Callable[[StockDataProvider], Any], interval: str = '1d') -> Any:
+        """
+        Run ``fn(provider)`` against the best provider for a symbol
+
+        Args:
+            symbol: Stock ticker
+            fn: Function taking a provider and performing the call
+            interval: Interval the call needs (some providers are daily-only)
+
+        Returns:
+            Result of the first successful provider
+        """
+        candidates = self.rank(symbol, interval)
+        if not candidates:
+            raise ValueError(f"No data provider available for {symbol}")
+
+        if self.hedge and len(candidates) > 1:
+            return self._call_hedged(symbol, candidates, fn)
+        return self._call_chain(symbol, candidates, fn)
+
+    def _call_chain(
+        self,
+        symbol: str,
+        candidates: List[StockDataProvider],
+        fn: Callable[[StockDataProvider], Any],
+        last_error: Optional[Exception] = None
+    ) -> Any:
+        """Try providers one after another until one succeeds"""
+        for provider in candidates:
+            try:
+                return self._timed(provider, fn)
+            except Exception as e:
+                logger.warning(f"Provider {provider.name} failed for {symbol}: {e}")
+                last_error = e
+        raise last_error
+
+    def _call_hedged(
+        self,
+        symbol: str,
+        candidates: List[StockDataProvider],
+        fn: Callable[[StockDataProvider], Any]
+    ) -> Any:
+        """Race the two best providers, then fall back through the rest of the chain"""
+        primary, backup = candidates[0], candidates[1]
+        futures = {self._pool.submit(self._timed, primary, fn): primary}
+
+        delay = self._hedge_delay(primary)
+        done, _ = wait(futures, timeout=delay)
+        if not done or next(iter(done)).exception() is not None:
+            futures[self._pool.submit(self._timed, backup, fn)] = backup
+
+        last_error: Optional[Exception] = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                last_error = future.exception()
+                logger.warning(f"Provider {futures[future].name} failed for {symbol}: {last_error}")
+        return self._call_chain(symbol, candidates[2:], fn, last_error)
+
+    def get_quote(self, symbol: str) -> Dict[str, Any]:
+        """Get current price data from the best provider"""
+        return self.call(symbol, lambda p: p.get_quote(symbol))
+
+    def get_quotes(self, symbols: List[str]) -> Dict[str, Any]:
+        """
+        Get price data for many symbols using each provider's bulk path
+
+        Symbols are grouped by their best provider and each group is fetched
+        in one call. Symbols a group misses are retried one by one through
+        the normal fallback chain.
+
+        Args:
+            symbols: Stock tickers
+
+        Returns:
+            Dictionary with 'results' (symbol -> price data) and 'errors' (symbol -> message)
+        """
+        groups: Dict[str, List[str]] = {}
+        providers: Dict[str, StockDataProvider] = {}
+        errors: Dict[str, str] = {}
+
+        for symbol in symbols:
+            candidates = self.rank(symbol)
+            if not candidates:
+                errors[symbol] = f"No data provider available for {symbol}"
+                continue
+            groups.setdefault(candidates[0].name, []).append(symbol)
+            providers[candidates[0].name] = candidates[0]
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for name, group in groups.items():
+            try:
+                results.update(self._timed(providers[name], lambda p: p.get_quotes(group), record_latency=False))
+            except Exception as e:
+                logger.warning(f"Provider {name} bulk quote failed: {e}")
+
+        for symbol in symbols:
+            if symbol in results or symbol in errors:
+                continue
+            try:
+                results[symbol] = self.get_quote(symbol)
+            except Exception as e:
+                errors[symbol] = str(e)
+
+        return {'results': results, 'errors': errors}
+
+    def get_history(
+        self,
+        symbol: str,
+        interval: str = '1d',
+        period: Optional[str] = '1mo',
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        """Get OHLCV history from the best provider"""
+        return self.call(
+            symbol,
+            lambda p: p.get_history(symbol, interval=interval, period=period, start=start, end=end),
+            interval=interval
+        )
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get per-provider latency and error statistics
+
+        Returns:
+            Dictionary of provider name -> statistics
+        """
+        result = {}
+        for provider in self.providers:
+            with self._lock:
+                latencies = list(self._stats[provider.name]['latencies'])
+                outcomes = list(self._stats[provider.name]['outcomes'])
+            result[provider.name] = {
+                'calls': len(outcomes),
+                'error_rate': self._error_rate(outcomes),
+                'p50_ms': float(np.percentile(latencies, 50)) * 1000 if latencies else None,
+                'p95_ms': float(np.percentile(latencies, 95)) * 1000 if latencies else None,
+            }
+        return result
+
+
+def create_provider_router() -> ProviderRouter:
+    """Build the router from STOCK_PROVIDERS and hedge settings in the environment"""
+    available = {
+        'yfinance': YFinanceProvider,
+        'nsepy': NSEpyProvider,
+        'local': LocalFileProvider,
+    }
+    names = [n.strip() for n in os.getenv("STOCK_PROVIDERS", "yfinance,nsepy").split(",") if n.strip()]
+    providers = [available[n]() for n in names if n in available]
+
+    return ProviderRouter(
+        providers,
+        hedge=os.getenv("STOCK_PROVIDER_HEDGE", "False").lower() == "true",
+        hedge_percentile=float(os.getenv("STOCK_PROVIDER_HEDGE_PERCENTILE", 95)),
+        error_decay=float(os.getenv("STOCK_PROVIDER_ERROR_DECAY", 300))
+    )
@@ -7,17 +7,15 @@ from datetime import datetime, timedelta
 import yfinance as yf
 import pandas as pd
 import logging
+import os
+import time
 
-logger = logging.getLogger(__name__)
+from src.services.stock_providers import create_provider_router, PERIOD_DELTAS
+from src.utils.fanout import FanOutExecutor
+from src.utils.history_store import history_store
+from src.utils.metrics import observe_upstream, record_cache
 
-# Try to import nsepy for Indian stocks
-try:
-    from nsepy import get_history
-    from nsepy.live import get_quote
-    NSEPY_AVAILABLE = True
-except ImportError:
-    NSEPY_AVAILABLE = False
-    logger.warning("NSEpy not available. Indian stock live data will be limited.")
+logger = logging.getLogger(__name__)
 
 
 class StocksService:
@@ -42,10 +40,20 @@ class StocksService:
         '^BSESN'  # SENSEX
     ]
     
+    # yfinance periods the local history store can serve
+    PERIOD_DELTAS = PERIOD_DELTAS
+    
     def __init__(self):
         """Initialize stocks service"""
         self.cache: Dict[str, Any] = {}
         self.cache_ttl = 300  # 5 minutes cache for stocks (less frequent updates)
+        self.router = create_provider_router()
+        self.fanout = FanOutExecutor(
+            max_workers=int(os.getenv("STOCKS_FANOUT_WORKERS", 8)),
+            symbol_timeout=float(os.getenv("STOCKS_SYMBOL_TIMEOUT", 4.0)),
+            overall_timeout=float(os.getenv("STOCKS_OVERVIEW_TIMEOUT", 6.0)),
+            name='stocks-fanout'
+        )
     
     def get_current_price(self, symbol: str) -> Dict[str, Any]:
         """
@@ -58,43 +66,7 @@ class StocksService:
             Dictionary with price data
         """
         try:
-            ticker = yf.Ticker(symbol)
-            
-            # Get current data
-            info = ticker.info
-            history = ticker.history(period='5d')
-            
-            if history.empty:
-                raise ValueError(f"No data available for {symbol}")
-            
-            latest = history.iloc[-1]
-            previous = history.iloc[-2] if len(history) > 1 else latest
-            
-            current_price = latest['Close']
-            open_price = latest['Open']
-            high = latest['High']
-            low = latest['Low']
-            volume = latest['Volume']
-            
-            # Calculate 24h change
-            change_24h = current_price - previous['Close']
-            change_percent_24h = (change_24h / previous['Close']) * 100 if previous['Close'] > 0 else 0
-            
-            return {
-                'symbol': symbol,
-                'price': float(current_price),
-                'open_price': float(open_price),
-                'high': float(high),
-                'low': float(low),
-                'close': float(current_price),
-                'volume': float(volume),
-                'change_24h': float(change_24h),
-                'change_percent_24h': float(change_percent_24h),
-                'market_cap': info.get('marketCap', 0),
-                'pe_ratio': info.get('trailingPE'),
-                'eps': info.get('trailingEps'),
-                'timestamp': int(datetime.now().timestamp() * 1000)
-            }
+            return self.router.get_quote(symbol)
         except Exception as e:
             logger.error(f"Error fetching price for {symbol}: {e}")
             raise
@@ -107,20 +79,97 @@ class StocksService:
             market: 'indian' or 'us'
             
         Returns:
-            List of price dictionaries
+            List of price dictionaries (fresh quotes only)
         """
-        symbols = self.INDIAN_STOCKS if market == 'indian' else self.US_STOCKS
-        results = []
+        return self.get_prices_with_status(market, include_stale=False)['prices']
+    
+    def get_prices_with_status(
+        self,
+        market: str = 'indian',
+        symbols: Optional[List[str]] = None,
+        include_stale: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Fetch prices concurrently, bounded by per-symbol and overall deadlines
+        
+        Symbols that miss their deadline or fail are served from the last
+        known quote (flagged as stale) when one is cached, otherwise reported
+        as missing.
+        
+        Args:
+            market: 'indian' or 'us'
+            symbols: Explicit symbols (defaults to the market's popular list)
+            include_stale: Whether to fill failed symbols from the cache
+            
+        Returns:
+            Dictionary with prices, stale and missing symbols and per-symbol latency
+        """
+        if symbols is None:
+            symbols = self.INDIAN_STOCKS if market == 'indian' else self.US_STOCKS
+        
+        batch = self.fanout.run(self.get_current_price, symbols)
+        
+        prices = []
+        stale = []
+        missing = []
+        now = time.time()
         
         for symbol in symbols:
-            try:
-                price_data = self.get_current_price(symbol)
-                results.append(price_data)
-            except Exception as e:
-                logger.warning(f"Failed to fetch {symbol}: {e}")
+            if symbol in batch['results']:
+                price_data = batch['results'][symbol]
+                self.cache[f"price:{symbol}"] = {'data': price_data, 'fetched_at': now}
+                prices.append(price_data)
                 continue
+            
+            if symbol in batch['errors']:
+                logger.warning(f"Failed to fetch {symbol}: {batch['errors'][symbol]}")
+            
+            cached = self.cache.get(f"price:{symbol}")
+            usable = include_stale and cached and now - cached['fetched_at'] <= self.cache_ttl
+            record_cache('stock_price_stale', bool(usable))
+            if usable:
+                prices.append({**cached['data'], 'stale': True})
+                stale.append(symbol)
+            else:
+                missing.append(symbol)
         
-        return results
+        return {
+            'prices': prices,
+            'stale': stale,
+            'missing': missing,
+            'latencies': {s: round(ms, 1) for s, ms in batch['latencies'].items()},
+            'elapsed_ms': round(batch['elapsed_ms'], 1)
+        }
+    
+    def get_prices(self, symbols: List[str]) -> Dict[str, Any]:
+        """
+        Get current prices for many symbols through the providers' bulk paths
+        
+        Args:
+            symbols: Stock tickers
+            
+        Returns:
+            Dictionary with 'results' (symbol -> price data) and 'errors' (symbol -> message)
+        """
+        return self.router.get_quotes(symbols)
+    
+    def get_provider_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get per-provider latency and error statistics
+        
+        Returns:
+            Dictionary of provider name -> statistics
+        """
+        return self.router.get_stats()
+    
+    def get_latency_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get rolling per-symbol fetch latency, slowest symbols first
+        
+        Returns:
+            Dictionary of symbol -> latency statistics
+        """
+        return self.fanout.get_latency_stats()
     
     def get_historical_data(
         self,
@@ -144,16 +193,17 @@ class StocksService:
             List of OHLCV dictionaries
         """
         try:
-            ticker = yf.Ticker(symbol)
-            
             if start_date and end_date:
-                df = ticker.history(
+                df = self.router.get_history(
+                    symbol,
+                    interval=interval,
                     start=start_date,
-                    end=end_date,
-                    interval=interval
+                    end=end_date
                 )
+            elif history_store.enabled and period in self.PERIOD_DELTAS:
+                df = self._get_history_incremental(symbol, interval, period)
             else:
-                df = ticker.history(period=period, interval=interval)
+                df = self.router.get_history(symbol, interval=interval, period=period)
             
             if df.empty:
                 return []
@@ -174,6 +224,79 @@ class StocksService:
             logger.error(f"Error fetching historical data for {symbol}: {e}")
             raise
     
+    def _get_history_incremental(self, symbol: str, interval: str, period: str) -> pd.DataFrame:
+        """
+        Serve history from the local store, fetching only what is missing
+        
+        The stored tail is re-fetched with a one-bar overlap. If the
+        overlapping closes no longer match, or a split/dividend shows up in
+        the new rows, upstream has re-adjusted the series and the whole
+        period is downloaded again.
+        
+        Args:
+            symbol: Stock ticker
+            interval: yfinance interval
+            period: yfinance period (must be in PERIOD_DELTAS)
+            
+        Returns:
+            DataFrame covering the requested period
+        """
+        with history_store.lock(symbol, interval):
+            stored = history_store.load(symbol, interval)
+            record_cache('history_store', stored is not None and len(stored) >= 2)
+            
+            if stored is None or stored.empty or len(stored) < 2:
+                df = self.router.get_history(symbol, interval=interval, period=period)
+                if not df.empty:
+                    history_store.save(symbol, interval, df)
+                return df
+            
+            requested_start = pd.Timestamp.now(tz=stored.index.tz) - self.PERIOD_DELTAS[period]
+            
+            # Head gap: the store doesn't reach back far enough
+            if stored.index[0] > requested_start + self.PERIOD_DELTAS['5d']:
+                df = self.router.get_history(symbol, interval=interval, period=period)
+                if not df.empty:
+                    df = history_store.append(symbol, interval, stored, df)
+                return df[df.index >= requested_start]
+            
+            tail = self.router.get_history(symbol, interval=interval, start=stored.index[-2].to_pydatetime())
+            
+            if not tail.empty and self._is_readjusted(stored, tail):
+                logger.info(f"Adjustment detected for {symbol} {interval}, refreshing stored history")
+                refresh_period = self._covering_period(pd.Timestamp.now(tz=stored.index.tz) - stored.index[0])
+                df = self.router.get_history(symbol, interval=interval, period=refresh_period)
+                if not df.empty:
+                    history_store.save(symbol, interval, df)
+                return df[df.index >= requested_start]
+            
+            merged = history_store.append(symbol, interval, stored, tail) if not tail.empty else stored
+            return merged[merged.index >= requested_start]
+    
+    @staticmethod
+    def _is_readjusted(stored: pd.DataFrame, tail: pd.DataFrame) -> bool:
+        """Check whether upstream has back-adjusted prices since the last fetch"""
+        last_stored = stored.index[-1]
+        
+        for column in ('Dividends', 'Stock Splits'):
+            if column in tail.columns and (tail.loc[tail.index >= last_stored, column].fillna(0) != 0).any():
+                return True
+        
+        # Closed bars that exist in both frames must still agree
+        overlap = stored.index[:-1].intersection(tail.index)
+        if len(overlap) == 0:
+            return False
+        
+        diff = (stored.loc[overlap, 'Close'] - tail.loc[overlap, 'Close']).abs()
+        return bool((diff > stored.loc[overlap, 'Close'].abs() * 1e-6).any())
+    
+    def _covering_period(self, span: timedelta) -> str:
+        """Smallest yfinance period covering the given span"""
+        for period, delta in self.PERIOD_DELTAS.items():
+            if delta >= span:
+                return period
+        return 'max'
+    
     def get_index_data(self, index: str = '^NSEI') -> Dict[str, Any]:
         """
         Get Indian index data (NIFTY 50, SENSEX)
@@ -201,7 +324,8 @@ class StocksService:
             Market overview statistics
         """
         try:
-            all_prices = self.get_all_prices(market)
+            batch = self.get_prices_with_status(market)
+            all_prices = batch['prices']
             
             if not all_prices:
                 return {
@@ -209,7 +333,11 @@ class StocksService:
                     'avgChange': 0,
                     'topGainers': [],
                     'topLosers': [],
-                    'mostActive': []
+                    'mostActive': [],
+                    'market': market,
+                    'stale': batch['stale'],
+                    'missing': batch['missing'],
+                    'latencies': batch['latencies']
                 }
             
             # Calculate statistics
@@ -226,7 +354,10 @@ class StocksService:
                 'topGainers': sorted_by_change[:5],
                 'topLosers': sorted_by_change[-5:],
                 'mostActive': sorted_by_volume[:5],
-                'market': market
+                'market': market,
+                'stale': batch['stale'],
+                'missing': batch['missing'],
+                'latencies': batch['latencies']
             }
         except Exception as e:
             logger.error(f"Error getting market overview: {e}")
@@ -244,7 +375,8 @@ class StocksService:
         """
         try:
             ticker = yf.Ticker(symbol)
-            info = ticker.info
+            with observe_upstream('yfinance', 'ticker.info', symbol):
+                info = ticker.info
             
             return {
                 'symbol': symbol,
@@ -285,7 +417,8 @@ class StocksService:
         for symbol in matches[:limit]:
             try:
                 ticker = yf.Ticker(symbol)
-                info = ticker.info
+                with observe_upstream('yfinance', 'ticker.info', symbol):
+                    info = ticker.info
                 results.append({
                     'symbol': symbol,
                     'name': info.get('longName', info.get('shortName', symbol))
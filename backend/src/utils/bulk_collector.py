@@ -0,0 +1,503 @@
+"""
+Parallel Bulk Collector
+Backfills historical candles into ohlcv_data for many symbols and
+timeframes at once
+
+The work is split into chunks of at most ``chunk_candles`` candles per
+(symbol, market, timeframe) and run on a thread, process or asyncio worker
+pool. Each worker has its own database session, so a failed chunk is
+rolled back without affecting the others. Upstream requests from all
+workers share one rate budget per provider, so throughput grows with the
+worker count until that budget is the limit.
+
+The job plan and every finished chunk are recorded in a JSON state file.
+Running again with --resume skips chunks already done and retries the
+failed ones.
+
+Usage:
+    python -m src.utils.bulk_collector --market crypto --timeframes 1h,4h,1d --days 365 --workers 8
+    python -m src.utils.bulk_collector --resume
+"""
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+from src.config.database import SessionLocal, engine
+from src.models.market import MarketType
+from src.services.binance_service import binance_service
+from src.services.stocks_service import stocks_service
+from src.services.candle_store import candle_store_service, split_forming, TIMEFRAME_DELTAS
+from src.utils.candle_writer import candle_rows, write_candles
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_FILE = Path(__file__).resolve().parents[3] / "data" / "raw" / "bulk_collect.json"
+
+POOLS = ('thread', 'process', 'async')
+WORKERS = int(os.getenv("BULK_COLLECT_WORKERS", 8))
+CHUNK_CANDLES = int(os.getenv("BULK_COLLECT_CHUNK_CANDLES", 5000))
+PROGRESS_INTERVAL = float(os.getenv("BULK_COLLECT_PROGRESS_INTERVAL", 10.0))
+
+# Requests per second per provider, shared by all workers
+PROVIDER_RATES = {
+    'binance': float(os.getenv("BULK_COLLECT_BINANCE_RPS", 10.0)),
+    'yfinance': float(os.getenv("BULK_COLLECT_YFINANCE_RPS", 1.0)),
+}
+
+# Largest klines page
+BINANCE_PAGE = 1000
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class RateLimiter:
+    """Thread-safe token bucket"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a request may be sent"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                time.sleep((1 - self._tokens) / self.rate)
+
+
+# Per-process worker state: rate limiters and one session per worker thread
+_limiters: Dict[str, RateLimiter] = {}
+_local = threading.local()
+_sessions: List[Any] = []
+_sessions_lock = threading.Lock()
+
+
+def _init_limiters(rates: Dict[str, float], share: int = 1) -> None:
+    """Set up this process's limiters, each allowed ``1 / share`` of the provider rate"""
+    _limiters.clear()
+    for provider, rate in rates.items():
+        _limiters[provider] = RateLimiter(rate / share, burst=max(int(rate / share), 1))
+
+
+def _init_process(rates: Dict[str, float], share: int) -> None:
+    # Connections inherited from the parent must not be reused in the child
+    engine.dispose(close=False)
+    _init_limiters(rates, share)
+
+
+def _worker_session():
+    """The calling thread's own session"""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = SessionLocal()
+        with _sessions_lock:
+            _sessions.append(session)
+    return session
+
+
+def _close_sessions() -> None:
+    with _sessions_lock:
+        for session in _sessions:
+            session.close()
+        _sessions.clear()
+
+
+def _floor(value: datetime, step: timedelta) -> datetime:
+    return EPOCH + (value - EPOCH) // step * step
+
+
+def task_key(task: Dict[str, Any]) -> str:
+    return f"{task['symbol']}|{task['market']}|{task['timeframe']}|{task['start']}"
+
+
+def plan_tasks(
+    symbols: List[str],
+    market: MarketType,
+    timeframes: List[str],
+    start: datetime,
+    end: datetime,
+    chunk_candles: int = CHUNK_CANDLES
+) -> List[Dict[str, Any]]:
+    """
+    Chunks covering [start, end) for every symbol and timeframe
+
+    Crypto ranges are split every ``chunk_candles`` candles; stock ranges
+    are one chunk each, as the provider returns them in one download.
+
+    Returns:
+        Task dictionaries (ISO timestamps, so they fit in the state file)
+    """
+    tasks = []
+    for timeframe in timeframes:
+        if timeframe not in TIMEFRAME_DELTAS:
+            raise ValueError(f"Unsupported timeframe: {timeframe}")
+        step = TIMEFRAME_DELTAS[timeframe]
+        first, last = _floor(start, step), _floor(end, step)
+        span = step * chunk_candles if market == MarketType.CRYPTO else last - first
+        for symbol in symbols:
+            chunk_start = first
+            while chunk_start < last:
+                chunk_end = min(chunk_start + span, last)
+                tasks.append({
+                    'symbol': symbol,
+                    'market': market.value,
+                    'timeframe': timeframe,
+                    'start': chunk_start.isoformat(),
+                    'end': chunk_end.isoformat(),
+                })
+                chunk_start = chunk_end
+    return tasks
+
+
+def collect_chunk(task: Dict[str, Any], on_conflict: str = 'update', method: str = 'auto') -> Dict[str, Any]:
+    """
+    Fetch and store one chunk on the calling worker's session
+
+    Crypto chunks are paged through in klines-sized requests, each page
+    committed as it arrives. Candles still forming are skipped.
+
+    Args:
+        task: Chunk from plan_tasks()
+        on_conflict: 'update' or 'nothing' (see write_candles)
+        method: 'insert', 'copy' or 'auto'
+
+    Returns:
+        Dictionary with key, candles, requests, seconds and error (None on success)
+    """
+    started = time.monotonic()
+    market = MarketType(task['market'])
+    timeframe = task['timeframe']
+    step = TIMEFRAME_DELTAS[timeframe]
+    end = datetime.fromisoformat(task['end'])
+    limiter = _limiters.get('binance' if market == MarketType.CRYPTO else 'yfinance')
+    db = _worker_session()
+
+    # fetch_upstream's start bound is exclusive
+    cursor = datetime.fromisoformat(task['start']) - timedelta(microseconds=1)
+    candles = requests = 0
+    try:
+        while cursor < end:
+            if limiter:
+                limiter.acquire()
+            requests += 1
+            fetched = candle_store_service.fetch_upstream(task['symbol'], market, timeframe, cursor, end)
+            closed, _ = split_forming(fetched, timeframe, datetime.now(timezone.utc))
+            if closed:
+                rows = candle_rows(task['symbol'], market, timeframe, closed)
+                candles += write_candles(db, rows, on_conflict=on_conflict, method=method)
+                db.commit()
+            if market != MarketType.CRYPTO or len(fetched) < BINANCE_PAGE - 1:
+                break
+            cursor = fetched[-1]['timestamp']
+            if cursor + step >= end:
+                break
+    except Exception as e:
+        db.rollback()
+        return {
+            'key': task_key(task), 'candles': candles, 'requests': requests,
+            'seconds': time.monotonic() - started, 'error': str(e),
+        }
+    return {
+        'key': task_key(task), 'candles': candles, 'requests': requests,
+        'seconds': time.monotonic() - started, 'error': None,
+    }
+
+
+class JobState:
+    """Plan and per-chunk results, saved as JSON after every chunk"""
+
+    def __init__(self, path: Optional[Path]):
+        self.path = Path(path) if path else None
+        self.data: Dict[str, Any] = {'tasks': [], 'results': {}}
+        self._lock = threading.Lock()
+
+    def load(self) -> bool:
+        if self.path is None or not self.path.exists():
+            return False
+        self.data = json.loads(self.path.read_text())
+        return True
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_suffix('.tmp')
+        temp.write_text(json.dumps(self.data))
+        os.replace(temp, self.path)
+
+    def done(self, key: str) -> bool:
+        result = self.data['results'].get(key)
+        return bool(result) and result['error'] is None
+
+    def record(self, result: Dict[str, Any]) -> None:
+        with self._lock:
+            previous = self.data['results'].get(result['key'])
+            attempts = (previous or {}).get('attempts', 0) + 1
+            self.data['results'][result['key']] = {**result, 'attempts': attempts}
+            self.save()
+
+
+class Progress:
+    """Live counters with a periodic log line"""
+
+    def __init__(self, tasks: List[Dict[str, Any]], state: JobState, interval: float,
+                 callback: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.interval = interval
+        self.callback = callback
+        self.started = time.monotonic()
+        self._logged = self.started
+        self.total = len(tasks)
+        self.remaining_by_symbol: Dict[Tuple[str, str], int] = {}
+        for task in tasks:
+            if not state.done(task_key(task)):
+                symbol = (task['symbol'], task['market'])
+                self.remaining_by_symbol[symbol] = self.remaining_by_symbol.get(symbol, 0) + 1
+        self.symbols = len({(t['symbol'], t['market']) for t in tasks})
+        self.skipped = self.total - sum(self.remaining_by_symbol.values())
+        self.done = 0
+        self.failed = 0
+        self.candles = 0
+        self.requests = 0
+
+    def update(self, task: Dict[str, Any], result: Dict[str, Any]) -> None:
+        self.candles += result['candles']
+        self.requests += result['requests']
+        if result['error'] is None:
+            self.done += 1
+            symbol = (task['symbol'], task['market'])
+            self.remaining_by_symbol[symbol] -= 1
+        else:
+            self.failed += 1
+        if self.interval > 0 and time.monotonic() - self._logged >= self.interval:
+            self._logged = time.monotonic()
+            self.report()
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started
+        finished = self.done + self.failed
+        pending = self.total - self.skipped - finished
+        return {
+            'symbols_done': sum(1 for n in self.remaining_by_symbol.values() if n == 0)
+            + self.symbols - len(self.remaining_by_symbol),
+            'symbols': self.symbols,
+            'chunks_done': self.skipped + self.done,
+            'chunks_failed': self.failed,
+            'chunks': self.total,
+            'candles': self.candles,
+            'requests': self.requests,
+            'elapsed_seconds': round(elapsed, 1),
+            'candles_per_second': round(self.candles / elapsed, 1) if elapsed else 0.0,
+            'requests_per_second': round(self.requests / elapsed, 2) if elapsed else 0.0,
+            'eta_seconds': round(elapsed / finished * pending, 1) if finished else None,
+        }
+
+    def report(self) -> None:
+        snap = self.snapshot()
+        eta = f"{snap['eta_seconds']:.0f}s" if snap['eta_seconds'] is not None else "?"
+        logger.info(
+            f"{snap['symbols_done']}/{snap['symbols']} symbols, "
+            f"{snap['chunks_done']}/{snap['chunks']} chunks ({snap['chunks_failed']} failed), "
+            f"{snap['candles']:,} candles, {snap['candles_per_second']:,.0f} candles/s, ETA {eta}"
+        )
+        if self.callback:
+            self.callback(snap)
+
+
+class BulkCollector:
+    """Runs a chunked backfill on a worker pool"""
+
+    def __init__(
+        self,
+        pool: str = 'thread',
+        workers: int = WORKERS,
+        state_file: Optional[Path] = None,
+        rates: Optional[Dict[str, float]] = None,
+        progress_interval: float = PROGRESS_INTERVAL,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        on_conflict: str = 'update',
+        method: str = 'auto'
+    ):
+        """
+        Args:
+            pool: 'thread', 'process' or 'async'
+            workers: Concurrent chunks (each with its own database session)
+            state_file: JSON job state; None keeps it in memory only
+            rates: Requests per second per provider (defaults to PROVIDER_RATES)
+            progress_interval: Seconds between progress log lines
+            on_progress: Called with each progress snapshot
+            on_conflict: 'update' or 'nothing'
+            method: 'insert', 'copy' or 'auto'
+        """
+        if pool not in POOLS:
+            raise ValueError(f"Unsupported pool: {pool}")
+        self.pool = pool
+        self.workers = max(workers, 1)
+        self.state = JobState(state_file)
+        self.rates = rates or PROVIDER_RATES
+        self.progress_interval = progress_interval
+        self.on_progress = on_progress
+        self.collect = functools.partial(collect_chunk, on_conflict=on_conflict, method=method)
+
+    def run(self, tasks: Optional[List[Dict[str, Any]]] = None, resume: bool = False) -> Dict[str, Any]:
+        """
+        Collect every chunk not already done
+
+        Args:
+            tasks: Chunks from plan_tasks(); omit with resume=True to reuse the saved plan
+            resume: Keep results from the state file and skip finished chunks
+
+        Returns:
+            Summary report
+        """
+        if resume and self.state.load():
+            tasks = tasks or self.state.data['tasks']
+        elif tasks is None:
+            raise ValueError("No tasks to run and no saved job to resume")
+        else:
+            self.state.data = {'created': datetime.now(timezone.utc).isoformat(), 'tasks': tasks, 'results': {}}
+        self.state.data['tasks'] = tasks
+        self.state.save()
+
+        pending = [t for t in tasks if not self.state.done(task_key(t))]
+        progress = Progress(tasks, self.state, self.progress_interval, self.on_progress)
+        logger.info(
+            f"Bulk collect: {len(pending)} of {len(tasks)} chunks to run on "
+            f"{self.workers} {self.pool} workers"
+        )
+
+        def finished(task: Dict[str, Any], result: Dict[str, Any]) -> None:
+            self.state.record(result)
+            progress.update(task, result)
+            if result['error']:
+                logger.warning(f"Chunk {result['key']} failed: {result['error']}")
+
+        if self.pool == 'process':
+            self._run_processes(pending, finished)
+        elif self.pool == 'async':
+            asyncio.run(self._run_async(pending, finished))
+        else:
+            self._run_threads(pending, finished)
+
+        progress.report()
+        return self.summary(tasks, progress)
+
+    def _run_threads(self, pending: List[Dict[str, Any]], finished) -> None:
+        _init_limiters(self.rates)
+        try:
+            with ThreadPoolExecutor(self.workers, thread_name_prefix="bulk-collect") as executor:
+                futures = {executor.submit(self.collect, task): task for task in pending}
+                for future in as_completed(futures):
+                    finished(futures[future], future.result())
+        finally:
+            _close_sessions()
+
+    def _run_processes(self, pending: List[Dict[str, Any]], finished) -> None:
+        # Each process gets an equal share of the provider budgets
+        with ProcessPoolExecutor(
+            self.workers, initializer=_init_process, initargs=(self.rates, self.workers)
+        ) as executor:
+            futures = {executor.submit(self.collect, task): task for task in pending}
+            for future in as_completed(futures):
+                finished(futures[future], future.result())
+
+    async def _run_async(self, pending: List[Dict[str, Any]], finished) -> None:
+        _init_limiters(self.rates)
+        queue: asyncio.Queue = asyncio.Queue()
+        for task in pending:
+            queue.put_nowait(task)
+
+        async def worker() -> None:
+            # The providers are synchronous, so each chunk runs on a thread
+            while not queue.empty():
+                task = queue.get_nowait()
+                finished(task, await asyncio.to_thread(self.collect, task))
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.workers)))
+        finally:
+            _close_sessions()
+
+    def summary(self, tasks: List[Dict[str, Any]], progress: Progress) -> Dict[str, Any]:
+        """Totals for this run plus the chunks still failing"""
+        results = self.state.data['results']
+        by_timeframe: Dict[str, int] = {}
+        for task in tasks:
+            result = results.get(task_key(task))
+            if result:
+                by_timeframe[task['timeframe']] = by_timeframe.get(task['timeframe'], 0) + result['candles']
+
+        return {
+            'pool': self.pool,
+            'workers': self.workers,
+            **progress.snapshot(),
+            'chunks_skipped': progress.skipped,
+            'candles_by_timeframe': by_timeframe,
+            'failures': [
+                {'key': key, 'error': result['error'], 'attempts': result['attempts']}
+                for key, result in results.items() if result['error']
+            ],
+            'state_file': str(self.state.path) if self.state.path else None,
+        }
+
+
+def _parse_time(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill ohlcv_data in parallel")
+    parser.add_argument('--market', choices=['crypto', 'stock'], default='crypto')
+    parser.add_argument('--symbols', help="Comma-separated (defaults to the market's popular symbols)")
+    parser.add_argument('--timeframes', default='1h,4h,1d')
+    parser.add_argument('--days', type=float, default=365, help="History to collect, ending now")
+    parser.add_argument('--start', type=_parse_time, help="ISO time (UTC if naive); overrides --days")
+    parser.add_argument('--end', type=_parse_time, help="ISO time (UTC if naive); defaults to now")
+    parser.add_argument('--pool', choices=POOLS, default='thread')
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--chunk-candles', type=int, default=CHUNK_CANDLES)
+    parser.add_argument('--state-file', default=str(DEFAULT_STATE_FILE))
+    parser.add_argument('--resume', action='store_true', help="Continue the job in --state-file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    collector = BulkCollector(pool=args.pool, workers=args.workers, state_file=Path(args.state_file))
+
+    if args.resume:
+        summary = collector.run(resume=True)
+    else:
+        market = MarketType(args.market)
+        if args.symbols:
+            symbols = [s.strip() for s in args.symbols.split(',') if s.strip()]
+        elif market == MarketType.CRYPTO:
+            symbols = binance_service.POPULAR_SYMBOLS
+        else:
+            symbols = stocks_service.INDIAN_STOCKS + stocks_service.US_STOCKS
+        end = args.end or datetime.now(timezone.utc)
+        start = args.start or end - timedelta(days=args.days)
+        tasks = plan_tasks(symbols, market, args.timeframes.split(','), start, end, args.chunk_candles)
+        summary = collector.run(tasks)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Bulk Export
+Streams ohlcv_data and predictions rows out of the database as CSV, NDJSON
+or Parquet without loading them into memory
+
+Rows are read through a server-side cursor (``stream_results`` with
+``yield_per``) and encoded one chunk at a time, so memory stays bounded by
+the chunk size whatever the size of the export. The same byte stream backs
+the /api/export endpoint and the CLI.
+
+Usage:
+    python -m src.utils.bulk_export candles --symbol BTCUSDT --market crypto --timeframe 1m -o btc.parquet
+    python -m src.utils.bulk_export predictions --start 2026-01-01 --format ndjson -o predictions.ndjson
+"""
+from typing import Any, Iterator, List, Optional, Sequence
+from datetime import datetime, timezone
+import argparse
+import csv
+import enum
+import io
+import json
+import logging
+import os
+
+from sqlalchemy import select, DateTime, Float, Integer
+from sqlalchemy.engine import Engine
+
+from src.models.market import OHLCV
+from src.models.prediction import Prediction
+from src.services.instrument_registry import instrument_registry, to_market_type
+
+logger = logging.getLogger(__name__)
+
+# Fast encoders are optional; fall back to the standard library
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 50_000))
+
+# dataset -> (model, exported columns, time column)
+DATASETS = {
+    'candles': (
+        OHLCV,
+        ['symbol', 'market', 'timeframe', 'timestamp', 'open', 'high', 'low', 'close', 'volume'],
+        'timestamp',
+    ),
+    'predictions': (
+        Prediction,
+        [
+            'id', 'symbol', 'market', 'model', 'model_version', 'timeframe', 'horizon_hours',
+            'current_price', 'predicted_price', 'direction', 'confidence',
+            'target_price', 'stop_loss', 'take_profit', 'actual_price', 'accuracy_score',
+            'features_used', 'created_at', 'prediction_for', 'evaluated_at',
+        ],
+        'created_at',
+    ),
+}
+
+MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def is_available(fmt: str) -> bool:
+    """Whether the encoder for a format is installed"""
+    if fmt == 'parquet':
+        return PYARROW_AVAILABLE
+    return fmt in MEDIA_TYPES
+
+
+def export_query(
+    dataset: str,
+    symbol: Optional[str] = None,
+    market: Optional[str] = None,
+    timeframe: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """
+    SELECT for an export, ordered by the dataset's time column
+
+    Args:
+        dataset: 'candles' or 'predictions'
+        symbol: Only this symbol
+        market: Market name (needed with symbol for candles)
+        timeframe: Only this timeframe
+        start: Inclusive lower bound on the time column
+        end: Exclusive upper bound on the time column
+
+    Returns:
+        Select statement, or None when the filter matches no instrument
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset: {dataset}")
+    model, columns, time_column = DATASETS[dataset]
+    time_col = getattr(model, time_column)
+
+    stmt = select(*(getattr(model, c) for c in columns))
+    if dataset == 'candles' and symbol:
+        if not market:
+            raise ValueError("Candle exports by symbol need a market")
+        # Candles are keyed on instrument_id (idx_ohlcv_instrument_lookup)
+        instrument_id = instrument_registry.get_id(symbol, market, create=False)
+        if instrument_id is None:
+            return None
+        stmt = stmt.where(OHLCV.instrument_id == instrument_id)
+        order = [OHLCV.instrument_id, OHLCV.timeframe, time_col]
+    else:
+        if symbol:
+            stmt = stmt.where(model.symbol == symbol)
+        if market:
+            if dataset == 'candles':
+                stmt = stmt.where(model.market == to_market_type(market))
+            else:
+                stmt = stmt.where(model.market == market.lower())
+        order = [time_col, model.id]
+
+    if timeframe:
+        stmt = stmt.where(model.timeframe == timeframe)
+    if start is not None:
+        stmt = stmt.where(time_col >= start)
+    if end is not None:
+        stmt = stmt.where(time_col < end)
+    return stmt.order_by(*order)
+
+
+def iter_chunks(engine: Engine, stmt, chunk_size: int = CHUNK_SIZE) -> Iterator[Sequence[Any]]:
+    """Row chunks from a server-side cursor; the connection is held until exhausted"""
+    if stmt is None:
+        return
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(stmt)
+        for chunk in result.partitions():
+            yield chunk
+
+
+def _utc(value: datetime) -> datetime:
+    """SQLite returns naive UTC datetimes"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _plain(value: Any) -> Any:
+    """Column value as exported: enums by value, datetimes in UTC"""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return _utc(value)
+    return value
+
+
+def _text(value: Any) -> Any:
+    """Column value for text formats: datetimes in ISO 8601, JSON columns serialized"""
+    value = _plain(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out whatever was written since the last drain"""
+
+    def __init__(self):
+        super().__init__()
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _arrow_schema(dataset: str):
+    model, columns, _ = DATASETS[dataset]
+    fields = []
+    for name in columns:
+        column_type = model.__table__.columns[name].type
+        if isinstance(column_type, DateTime):
+            fields.append(pa.field(name, pa.timestamp('us', tz='UTC')))
+        elif isinstance(column_type, Float):
+            fields.append(pa.field(name, pa.float64()))
+        elif isinstance(column_type, Integer):
+            fields.append(pa.field(name, pa.int64()))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+def _encode_csv(columns: List[str], chunks: Iterator[Sequence[Any]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for chunk in chunks:
+        for row in chunk:
+            writer.writerow([_text(value) for value in row])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _encode_ndjson(columns: List[str], chunks: Iterator[Sequence[Any]]) -> Iterator[bytes]:
+    for chunk in chunks:
+        if ORJSON_AVAILABLE:
+            yield b''.join(
+                orjson.dumps({c: _plain(v) for c, v in zip(columns, row)}, option=orjson.OPT_APPEND_NEWLINE)
+                for row in chunk
+            )
+        else:
+            yield ''.join(
+                json.dumps({c: _text(v) if isinstance(v, datetime) else _plain(v) for c, v in zip(columns, row)}) + '\n'
+                for row in chunk
+            ).encode()
+
+
+def _encode_parquet(dataset: str, columns: List[str], chunks: Iterator[Sequence[Any]]) -> Iterator[bytes]:
+    """One row group per chunk; each is flushed out as soon as it is written"""
+    schema = _arrow_schema(dataset)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        for chunk in chunks:
+            arrays = []
+            for i, field in enumerate(schema):
+                if pa.types.is_string(field.type):
+                    values = [None if row[i] is None else str(_text(row[i])) for row in chunk]
+                else:
+                    values = [_plain(row[i]) for row in chunk]
+                arrays.append(pa.array(values, type=field.type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream_export(
+    engine: Engine,
+    dataset: str,
+    fmt: str,
+    chunk_size: int = CHUNK_SIZE,
+    **filters: Any
+) -> Iterator[bytes]:
+    """
+    Encoded export as a stream of byte chunks
+
+    Args:
+        engine: Sync database engine
+        dataset: 'candles' or 'predictions'
+        fmt: 'csv', 'ndjson' or 'parquet'
+        chunk_size: Rows fetched and encoded at a time
+        **filters: symbol, market, timeframe, start, end (see export_query)
+
+    Returns:
+        Iterator of bytes; an export with no matching rows is still a valid
+        (header-only or empty) file
+    """
+    if not is_available(fmt):
+        raise ValueError(f"Unsupported or unavailable format: {fmt}")
+    stmt = export_query(dataset, **filters)
+    columns = DATASETS[dataset][1]
+    chunks = iter_chunks(engine, stmt, chunk_size)
+
+    if fmt == 'csv':
+        return _encode_csv(columns, chunks)
+    if fmt == 'ndjson':
+        return _encode_ndjson(columns, chunks)
+    return _encode_parquet(dataset, columns, chunks)
+
+
+def export_to_file(path: str, engine: Engine, dataset: str, fmt: str, **kwargs: Any) -> int:
+    """
+    Write an export to a file atomically
+
+    Returns:
+        Bytes written
+    """
+    tmp = f"{path}.tmp"
+    written = 0
+    with open(tmp, 'wb') as f:
+        for data in stream_export(engine, dataset, fmt, **kwargs):
+            f.write(data)
+            written += len(data)
+    os.replace(tmp, path)
+    logger.info(f"Exported {dataset} to {path} ({written} bytes)")
+    return written
+
+
+def _parse_time(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stream candles or predictions to CSV, NDJSON or Parquet")
+    parser.add_argument('dataset', choices=sorted(DATASETS))
+    parser.add_argument('-o', '--output', required=True, help="Output file")
+    parser.add_argument('--format', choices=sorted(MEDIA_TYPES),
+                        help="Defaults to the output file's extension")
+    parser.add_argument('--symbol')
+    parser.add_argument('--market')
+    parser.add_argument('--timeframe')
+    parser.add_argument('--start', type=_parse_time, help="ISO time, inclusive (UTC if naive)")
+    parser.add_argument('--end', type=_parse_time, help="ISO time, exclusive (UTC if naive)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or os.path.splitext(args.output)[1].lstrip('.').lower()
+    if fmt not in MEDIA_TYPES:
+        parser.error("Pass --format or use a .csv, .ndjson or .parquet output file")
+
+    logging.basicConfig(level=logging.INFO)
+    from src.config.database import engine
+
+    written = export_to_file(
+        args.output, engine, args.dataset, fmt,
+        chunk_size=args.chunk_size,
+        symbol=args.symbol, market=args.market, timeframe=args.timeframe,
+        start=args.start, end=args.end,
+    )
+    print(json.dumps({'output': args.output, 'format': fmt, 'bytes': written}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
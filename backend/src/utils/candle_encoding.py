@@ -0,0 +1,164 @@
+"""
+Candle Response Encodings
+Row JSON, columnar JSON, MessagePack and Arrow IPC encoders for OHLCV payloads
+
+Row JSON is encoded from one dictionary per candle; the other formats are
+encoded from columns built straight from (timestamp, open, high, low, close,
+volume) rows, so no per-candle dictionary is ever created for them.
+"""
+from typing import List, Dict, Any, Optional, Sequence, Union
+from bisect import bisect_right
+import json
+import logging
+
+from fastapi import Request
+
+logger = logging.getLogger(__name__)
+
+# Fast encoders are optional; fall back to the standard library
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+CANDLE_FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+# format name -> media type
+MEDIA_TYPES = {
+    'json': 'application/json',
+    'columnar': 'application/vnd.buddy.columnar+json',
+    'msgpack': 'application/msgpack',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+ACCEPT_ALIASES = {
+    'application/json': 'json',
+    'application/vnd.buddy.columnar+json': 'columnar',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.apache.arrow.stream': 'arrow',
+}
+
+
+def negotiate_format(request: Request, requested: Optional[str] = None) -> Optional[str]:
+    """
+    Pick a candle encoding from ?format= or the Accept header
+
+    Args:
+        request: Incoming request
+        requested: Explicit format query parameter
+
+    Returns:
+        Format name, or None if nothing acceptable is available
+    """
+    if requested:
+        fmt = requested.lower()
+        return fmt if fmt in MEDIA_TYPES and is_available(fmt) else None
+
+    accept = request.headers.get('accept', '')
+    for part in accept.split(','):
+        media_type = part.split(';')[0].strip().lower()
+        fmt = ACCEPT_ALIASES.get(media_type)
+        if fmt and is_available(fmt):
+            return fmt
+    return 'json'
+
+
+def is_available(fmt: str) -> bool:
+    """Whether the encoder for a format is installed"""
+    if fmt == 'msgpack':
+        return MSGPACK_AVAILABLE
+    if fmt == 'arrow':
+        return PYARROW_AVAILABLE
+    return True
+
+
+def to_columns(rows: Sequence[Sequence[Any]]) -> Dict[str, list]:
+    """
+    Transpose candle rows into one array per field
+
+    Timestamps become epoch milliseconds so every column is numeric.
+
+    Args:
+        rows: (timestamp, open, high, low, close, volume) rows, e.g. query rows
+
+    Returns:
+        Dictionary of field -> list of values
+    """
+    if not rows:
+        return {'timestamp': [], **{field: [] for field in CANDLE_FIELDS}}
+    timestamps, *values = zip(*rows)
+    columns: Dict[str, list] = {'timestamp': [int(ts.timestamp() * 1000) for ts in timestamps]}
+    columns.update(zip(CANDLE_FIELDS, map(list, values)))
+    return columns
+
+
+def columns_after(columns: Dict[str, list], since_ms: int) -> Dict[str, list]:
+    """Columns trimmed to candles opened after an epoch-ms timestamp"""
+    start = bisect_right(columns['timestamp'], since_ms)
+    return {field: values[start:] for field, values in columns.items()}
+
+
+def _dumps(payload: Any) -> bytes:
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload)
+    return json.dumps(payload, default=lambda v: v.isoformat(), separators=(',', ':')).encode('utf-8')
+
+
+def encode_candles(
+    fmt: str,
+    data: Union[List[Dict[str, Any]], Dict[str, list]],
+    extra: Optional[Dict[str, Any]] = None
+) -> bytes:
+    """
+    Encode a candle response body
+
+    Args:
+        fmt: Format name from negotiate_format
+        data: OHLCV dictionaries for 'json', columns from to_columns for
+            every other format; oldest first
+        extra: Additional top-level fields (ignored by Arrow, which has no envelope)
+
+    Returns:
+        Encoded body
+    """
+    extra = extra or {}
+
+    if fmt == 'json':
+        return _dumps({'success': True, 'data': data, **extra})
+
+    columns = data
+    if not isinstance(columns, dict):
+        raise TypeError(f"{fmt} responses are encoded from columns")
+
+    if fmt == 'columnar':
+        return _dumps({'success': True, 'data': columns, **extra})
+
+    if fmt == 'msgpack':
+        return msgpack.packb({'success': True, 'data': columns, **extra}, use_bin_type=True)
+
+    if fmt == 'arrow':
+        batch = pa.record_batch(
+            [pa.array(columns['timestamp'], type=pa.timestamp('ms', tz='UTC'))]
+            + [pa.array(columns[f], type=pa.float64()) for f in CANDLE_FIELDS],
+            names=['timestamp'] + CANDLE_FIELDS
+        )
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+
+    raise ValueError(f"Unsupported candle format: {fmt}")
@@ -0,0 +1,391 @@
+"""
+Columnar Candle Files
+Memory-mapped, fixed-width OHLCV columns per (market, symbol, timeframe)
+under data/processed/candles for training and backtests
+
+Layout of one series:
+
+    <root>/<timeframe>/<market>/<SYMBOL>/
+        timestamp.i8                 epoch milliseconds (UTC), little-endian int64, ascending
+        open.f8 high.f8 low.f8 close.f8 volume.f8   little-endian float64
+        index.json                   row count, time range and gap-free segments
+
+Column files are only ever appended to (or have their last rows rewritten),
+and index.json is replaced atomically after the data is written, so readers
+that size their views from the index never see a partial append.
+
+Usage:
+    python -m src.utils.candle_files export --market crypto --symbol BTCUSDT --timeframe 1m
+    python -m src.utils.candle_files export --all
+"""
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import fcntl
+import json
+import logging
+import os
+import re
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = Path(__file__).resolve().parents[3] / "data" / "processed" / "candles"
+
+FORMAT_VERSION = 1
+VALUE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+COLUMN_FILES = {'timestamp': ('timestamp.i8', '<i8'), **{c: (f"{c}.f8", '<f8') for c in VALUE_COLUMNS}}
+
+TIMEFRAME_MS = {
+    '1m': 60_000,
+    '5m': 300_000,
+    '15m': 900_000,
+    '30m': 1_800_000,
+    '1h': 3_600_000,
+    '4h': 14_400_000,
+    '1d': 86_400_000,
+    '1w': 604_800_000,
+}
+
+
+def to_epoch_ms(value: Any) -> int:
+    """Epoch milliseconds from a datetime (naive values are UTC, as SQLite returns them) or a number"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp() * 1000)
+    return int(value)
+
+
+class CandleSeries:
+    """One (market, symbol, timeframe) series on disk"""
+
+    def __init__(self, root: Path, market: str, symbol: str, timeframe: str):
+        self.market = market.lower()
+        self.symbol = symbol
+        self.timeframe = timeframe
+        safe_symbol = re.sub(r'[^A-Za-z0-9._-]', '_', symbol)
+        self.path = Path(root) / timeframe / self.market / safe_symbol
+
+    @property
+    def index_path(self) -> Path:
+        return self.path / "index.json"
+
+    def exists(self) -> bool:
+        """Whether the series has been written"""
+        return self.index_path.exists()
+
+    def load_index(self) -> Dict[str, Any]:
+        """Series index, or an empty one for a new series"""
+        if not self.exists():
+            return {
+                'version': FORMAT_VERSION,
+                'market': self.market,
+                'symbol': self.symbol,
+                'timeframe': self.timeframe,
+                'rows': 0,
+                'first': None,
+                'last': None,
+                'segments': [],
+            }
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def _save_index(self, index: Dict[str, Any]) -> None:
+        tmp = self.index_path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp, self.index_path)
+
+
+class CandleReader:
+    """
+    Read-only memory-mapped view of a series
+
+    Slices are views into the mapped files; nothing is copied until the
+    caller does arithmetic on them.
+    """
+
+    def __init__(self, series: CandleSeries):
+        self.series = series
+        self.index = series.load_index()
+        rows = self.index['rows']
+        self.columns: Dict[str, np.ndarray] = {}
+        for name, (filename, dtype) in COLUMN_FILES.items():
+            if rows:
+                self.columns[name] = np.memmap(series.path / filename, dtype=dtype, mode='r', shape=(rows,))
+            else:
+                self.columns[name] = np.empty(0, dtype=dtype)
+
+    def __len__(self) -> int:
+        return self.index['rows']
+
+    def row_range(self, start: Optional[Any] = None, end: Optional[Any] = None) -> Tuple[int, int]:
+        """Row bounds [lo, hi) of candles with start <= timestamp < end"""
+        timestamps = self.columns['timestamp']
+        lo = 0 if start is None else int(np.searchsorted(timestamps, to_epoch_ms(start), side='left'))
+        hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, to_epoch_ms(end), side='left'))
+        return lo, max(lo, hi)
+
+    def slice(self, start: Optional[Any] = None, end: Optional[Any] = None) -> Dict[str, np.ndarray]:
+        """
+        Zero-copy column views for start <= timestamp < end
+
+        Args:
+            start: datetime or epoch ms (None for the beginning)
+            end: datetime or epoch ms, exclusive (None for the end)
+
+        Returns:
+            Column name -> array view
+        """
+        lo, hi = self.row_range(start, end)
+        return {name: column[lo:hi] for name, column in self.columns.items()}
+
+    def gaps(self) -> List[Tuple[int, int]]:
+        """(last timestamp before, first timestamp after) for every gap in the series"""
+        segments = self.index['segments']
+        return [(a['last'], b['first']) for a, b in zip(segments, segments[1:])]
+
+
+class CandleWriter:
+    """
+    Appends candles to a series
+
+    Candles at or before the last stored timestamp are ignored, except that
+    a candle equal to the last one overwrites it (a refreshed forming bar).
+    Writers of the same series serialize on a lock file.
+    """
+
+    def __init__(self, series: CandleSeries):
+        self.series = series
+        self.step_ms = TIMEFRAME_MS.get(series.timeframe)
+
+    def append(self, candles: Iterable[Dict[str, Any]]) -> int:
+        """
+        Append candles (dictionaries with timestamp and OHLCV values)
+
+        Returns:
+            Number of rows written (appended or overwritten)
+        """
+        rows = sorted(
+            ((to_epoch_ms(c['timestamp']),) + tuple(float(c[k]) for k in VALUE_COLUMNS) for c in candles),
+            key=lambda r: r[0]
+        )
+        if not rows:
+            return 0
+        return self.append_arrays(
+            np.array([r[0] for r in rows], dtype='<i8'),
+            {name: np.array([r[i + 1] for r in rows], dtype='<f8') for i, name in enumerate(VALUE_COLUMNS)}
+        )
+
+    def append_arrays(self, timestamps: np.ndarray, values: Dict[str, np.ndarray]) -> int:
+        """
+        Append ascending column arrays
+
+        Args:
+            timestamps: Epoch ms, ascending
+            values: Column name -> float array of the same length
+
+        Returns:
+            Number of rows written
+        """
+        self.series.path.mkdir(parents=True, exist_ok=True)
+        with open(self.series.path / ".lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            index = self.series.load_index()
+            rows = index['rows']
+            last = index['last']
+
+            written = 0
+            if last is not None:
+                # Rewrite the last stored candle in place if it came again
+                same = np.nonzero(timestamps == last)[0]
+                if len(same):
+                    i = same[-1]
+                    for name in VALUE_COLUMNS:
+                        filename, dtype = COLUMN_FILES[name]
+                        column = np.memmap(self.series.path / filename, dtype=dtype, mode='r+', shape=(rows,))
+                        column[rows - 1] = values[name][i]
+                        column.flush()
+                        del column
+                    written += 1
+                newer = timestamps > last
+                timestamps = timestamps[newer]
+                values = {name: values[name][newer] for name in VALUE_COLUMNS}
+
+            # Keep the last occurrence of duplicate timestamps
+            if len(timestamps):
+                keep = np.append(timestamps[1:] != timestamps[:-1], True)
+                timestamps = timestamps[keep]
+                values = {name: values[name][keep] for name in VALUE_COLUMNS}
+
+            if len(timestamps):
+                for name, (filename, dtype) in COLUMN_FILES.items():
+                    data = timestamps if name == 'timestamp' else values[name]
+                    with open(self.series.path / filename, 'r+b' if rows else 'wb') as f:
+                        # Drop bytes from an interrupted append past the indexed rows
+                        f.truncate(rows * np.dtype(dtype).itemsize)
+                        f.seek(0, os.SEEK_END)
+                        f.write(np.ascontiguousarray(data, dtype=dtype).tobytes())
+                self._extend_segments(index, timestamps)
+                index['rows'] = rows + len(timestamps)
+                if index['first'] is None:
+                    index['first'] = int(timestamps[0])
+                index['last'] = int(timestamps[-1])
+                written += len(timestamps)
+
+            if written:
+                index['updatedAt'] = int(time.time() * 1000)
+                self.series._save_index(index)
+            return written
+
+    def _extend_segments(self, index: Dict[str, Any], timestamps: np.ndarray) -> None:
+        """Extend the gap-free segment list with new ascending timestamps"""
+        segments = index['segments']
+        start_row = index['rows']
+        if self.step_ms is None:
+            breaks = np.array([], dtype=int)
+        else:
+            breaks = np.nonzero(np.diff(timestamps) > self.step_ms)[0] + 1
+
+        bounds = [0] + breaks.tolist() + [len(timestamps)]
+        for lo, hi in zip(bounds, bounds[1:]):
+            first, last = int(timestamps[lo]), int(timestamps[hi - 1])
+            if lo == 0 and segments and self.step_ms and first - segments[-1]['last'] <= self.step_ms:
+                segments[-1]['last'] = last
+                segments[-1]['rows'] += hi - lo
+            else:
+                segments.append({'row': start_row + lo, 'rows': hi - lo, 'first': first, 'last': last})
+
+
+class CandleFileStore:
+    """Entry point for the columnar candle files"""
+
+    def __init__(self, root: Optional[str] = None):
+        """
+        Initialize candle file store
+
+        Args:
+            root: Base directory (defaults to data/processed/candles)
+        """
+        self.root = Path(root or os.getenv("CANDLE_FILES_DIR", DEFAULT_ROOT))
+
+    def series(self, market: str, symbol: str, timeframe: str) -> CandleSeries:
+        """Series handle (the files may not exist yet)"""
+        return CandleSeries(self.root, market, symbol, timeframe)
+
+    def reader(self, market: str, symbol: str, timeframe: str) -> CandleReader:
+        """Memory-mapped reader; raises FileNotFoundError for unknown series"""
+        series = self.series(market, symbol, timeframe)
+        if not series.exists():
+            raise FileNotFoundError(f"No candle files for {market}/{symbol}/{timeframe}")
+        return CandleReader(series)
+
+    def writer(self, market: str, symbol: str, timeframe: str) -> CandleWriter:
+        """Appender for a series, created on first write"""
+        return CandleWriter(self.series(market, symbol, timeframe))
+
+    def catalog(self) -> List[Dict[str, Any]]:
+        """Index of every stored series"""
+        entries = []
+        for index_path in sorted(self.root.glob("*/*/*/index.json")):
+            with open(index_path) as f:
+                index = json.load(f)
+            index.pop('segments', None)
+            entries.append(index)
+        return entries
+
+    def export_from_db(
+        self,
+        symbol: str,
+        market: Any,
+        timeframe: str,
+        chunk_size: int = 100_000
+    ) -> int:
+        """
+        Export (or continue exporting) a series from ohlcv_data
+
+        Only candles newer than the last exported one are read, streamed in
+        ``chunk_size`` row chunks through a server-side cursor.
+
+        Returns:
+            Rows appended
+        """
+        from sqlalchemy import select
+        from src.config.database import engine
+        from src.models.market import OHLCV
+        from src.services.instrument_registry import instrument_registry, to_market_type
+
+        market_type = to_market_type(market)
+        instrument_id = instrument_registry.get_id(symbol, market_type, create=False)
+        if instrument_id is None:
+            return 0
+        writer = self.writer(market_type.value, symbol, timeframe)
+        last = writer.series.load_index()['last']
+
+        stmt = (
+            select(OHLCV.timestamp, OHLCV.open, OHLCV.high, OHLCV.low, OHLCV.close, OHLCV.volume)
+            .where(OHLCV.instrument_id == instrument_id, OHLCV.timeframe == timeframe)
+            .order_by(OHLCV.timestamp)
+        )
+        if last is not None:
+            stmt = stmt.where(OHLCV.timestamp > datetime.fromtimestamp(last / 1000, tz=timezone.utc))
+
+        appended = 0
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(stmt)
+            for chunk in result.partitions():
+                timestamps = np.fromiter((to_epoch_ms(r[0]) for r in chunk), dtype='<i8', count=len(chunk))
+                matrix = np.array([r[1:] for r in chunk], dtype='<f8').reshape(len(chunk), len(VALUE_COLUMNS))
+                appended += writer.append_arrays(
+                    timestamps, {name: matrix[:, i] for i, name in enumerate(VALUE_COLUMNS)}
+                )
+        logger.info(f"Exported {appended} {symbol} {timeframe} candles to {writer.series.path}")
+        return appended
+
+    def export_all(self, chunk_size: int = 100_000) -> Dict[str, int]:
+        """Export every (symbol, market, timeframe) present in ohlcv_data"""
+        from sqlalchemy import select
+        from src.config.database import engine
+        from src.models.market import OHLCV
+
+        with engine.connect() as conn:
+            keys = conn.execute(select(OHLCV.symbol, OHLCV.market, OHLCV.timeframe).distinct()).fetchall()
+        return {
+            f"{market.value}/{symbol}/{timeframe}": self.export_from_db(symbol, market, timeframe, chunk_size)
+            for symbol, market, timeframe in keys
+        }
+
+
+# Singleton instance
+candle_file_store = CandleFileStore()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Columnar candle files")
+    sub = parser.add_subparsers(dest='command', required=True)
+    export = sub.add_parser('export', help="Export ohlcv_data into candle files")
+    export.add_argument('--market')
+    export.add_argument('--symbol')
+    export.add_argument('--timeframe', default='1m')
+    export.add_argument('--all', action='store_true', help="Export every series in ohlcv_data")
+    export.add_argument('--chunk-size', type=int, default=100_000)
+    sub.add_parser('catalog', help="List stored series")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'catalog':
+        print(json.dumps(candle_file_store.catalog(), indent=2))
+    elif args.all:
+        print(json.dumps(candle_file_store.export_all(args.chunk_size), indent=2))
+    else:
+        if not (args.market and args.symbol):
+            parser.error("export needs --market and --symbol, or --all")
+        candle_file_store.export_from_db(args.symbol, args.market, args.timeframe, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
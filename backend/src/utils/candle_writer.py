@@ -0,0 +1,178 @@
+"""
+Bulk Candle Writer
+Idempotent bulk writes into ohlcv_data keyed on idx_ohlcv_instrument_lookup
+
+Two paths:
+
+- ``insert``: multi-row INSERT ... ON CONFLICT in batches (PostgreSQL and SQLite)
+- ``copy``: COPY into a temporary staging table, then one INSERT ... SELECT
+  ... ON CONFLICT into ohlcv_data (PostgreSQL only; large backfills)
+
+``auto`` picks COPY on PostgreSQL once a write reaches COPY_MIN_ROWS rows.
+"""
+from typing import Dict, Any, Iterable, List
+import io
+import logging
+import os
+
+from sqlalchemy import insert, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from src.models.market import OHLCV, MarketType
+from src.services.instrument_registry import instrument_registry
+
+logger = logging.getLogger(__name__)
+
+OHLCV_KEY = ('instrument_id', 'timeframe', 'timestamp')
+OHLCV_VALUES = ('open', 'high', 'low', 'close', 'volume')
+OHLCV_COLUMNS = ('symbol', 'market') + OHLCV_KEY + OHLCV_VALUES
+
+BATCH_SIZE = int(os.getenv("CANDLE_WRITE_BATCH_SIZE", 5000))
+COPY_MIN_ROWS = int(os.getenv("CANDLE_COPY_MIN_ROWS", 20000))
+
+STAGING_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS ohlcv_staging (
+    symbol varchar, market markettype, instrument_id integer, timeframe varchar, timestamp timestamptz,
+    open double precision, high double precision, low double precision,
+    close double precision, volume double precision
+) ON COMMIT DELETE ROWS
+"""
+
+
+def upsert_candles_stmt(dialect: str, on_conflict: str = 'update'):
+    """
+    INSERT ... ON CONFLICT on the idx_ohlcv_instrument_lookup columns
+
+    Args:
+        dialect: SQLAlchemy dialect name
+        on_conflict: 'update' to overwrite existing candles, 'nothing' to keep them
+    """
+    if dialect == 'postgresql':
+        stmt = postgresql.insert(OHLCV)
+    elif dialect == 'sqlite':
+        stmt = sqlite.insert(OHLCV)
+    else:
+        return insert(OHLCV)
+
+    if on_conflict == 'nothing':
+        return stmt.on_conflict_do_nothing(index_elements=list(OHLCV_KEY))
+    return stmt.on_conflict_do_update(
+        index_elements=list(OHLCV_KEY),
+        set_={c: stmt.excluded[c] for c in OHLCV_VALUES}
+    )
+
+
+def candle_rows(
+    symbol: str,
+    market: MarketType,
+    timeframe: str,
+    candles: Iterable[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    ohlcv_data rows for candles from a market service, deduplicated on the
+    lookup key (last one wins, as a single ON CONFLICT statement may not touch
+    the same row twice)
+    """
+    instrument_id = instrument_registry.get_id(symbol, market)
+    rows: Dict[Any, Dict[str, Any]] = {}
+    for candle in candles:
+        rows[candle['timestamp']] = {
+            'symbol': symbol,
+            'market': market,
+            'instrument_id': instrument_id,
+            'timeframe': timeframe,
+            'timestamp': candle['timestamp'],
+            'open': candle['open'],
+            'high': candle['high'],
+            'low': candle['low'],
+            'close': candle['close'],
+            'volume': candle['volume'],
+        }
+    return list(rows.values())
+
+
+def _insert_rows(db: Session, rows: List[Dict[str, Any]], on_conflict: str, batch_size: int) -> None:
+    stmt = upsert_candles_stmt(db.get_bind().dialect.name, on_conflict)
+    for start in range(0, len(rows), batch_size):
+        db.execute(stmt, rows[start:start + batch_size])
+
+
+def _copy_rows(db: Session, rows: List[Dict[str, Any]], on_conflict: str) -> None:
+    buffer = io.StringIO()
+    for row in rows:
+        market = row['market']
+        buffer.write('\t'.join((
+            row['symbol'],
+            market.name if isinstance(market, MarketType) else str(market),
+            str(row['instrument_id']),
+            row['timeframe'],
+            row['timestamp'].isoformat(),
+            repr(float(row['open'])),
+            repr(float(row['high'])),
+            repr(float(row['low'])),
+            repr(float(row['close'])),
+            repr(float(row['volume'])),
+        )))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    columns = ', '.join(OHLCV_COLUMNS)
+    db.execute(text(STAGING_DDL))
+    # COPY runs on the session's own connection, inside its transaction
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY ohlcv_staging ({columns}) FROM STDIN", buffer)
+    finally:
+        cursor.close()
+
+    if on_conflict == 'nothing':
+        action = "DO NOTHING"
+    else:
+        action = "DO UPDATE SET " + ', '.join(f"{c} = EXCLUDED.{c}" for c in OHLCV_VALUES)
+    db.execute(text(
+        f"INSERT INTO ohlcv_data ({columns}) SELECT {columns} FROM ohlcv_staging "
+        f"ON CONFLICT ({', '.join(OHLCV_KEY)}) {action}"
+    ))
+    db.execute(text("TRUNCATE ohlcv_staging"))
+
+
+def write_candles(
+    db: Session,
+    rows: List[Dict[str, Any]],
+    on_conflict: str = 'update',
+    method: str = 'auto',
+    batch_size: int = BATCH_SIZE
+) -> int:
+    """
+    Bulk upsert ohlcv_data rows without committing
+
+    Args:
+        db: Database session
+        rows: Rows from candle_rows() (unique on the lookup key); rows
+            without instrument_id get one from the instrument registry
+        on_conflict: 'update' or 'nothing'
+        method: 'insert', 'copy' or 'auto'
+        batch_size: Rows per INSERT statement on the insert path
+
+    Returns:
+        Number of rows written
+    """
+    if not rows:
+        return 0
+    if on_conflict not in ('update', 'nothing'):
+        raise ValueError(f"Unsupported on_conflict: {on_conflict}")
+    instrument_registry.assign(rows)
+
+    is_postgres = db.get_bind().dialect.name == 'postgresql'
+    if method == 'auto':
+        method = 'copy' if is_postgres and len(rows) >= COPY_MIN_ROWS else 'insert'
+    elif method == 'copy' and not is_postgres:
+        logger.debug("COPY needs PostgreSQL, using batched INSERT")
+        method = 'insert'
+
+    if method == 'copy':
+        _copy_rows(db, rows, on_conflict)
+    else:
+        _insert_rows(db, rows, on_conflict, batch_size)
+    return len(rows)
@@ -3,13 +3,17 @@ Data Collection Utilities
 Tools for collecting and storing market data
 """
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
 import logging
 
 from src.services.binance_service import binance_service
 from src.services.stocks_service import stocks_service
-from src.models.market import MarketData, OHLCV, MarketType
+from src.services.instrument_registry import instrument_registry
+from src.models.market import MarketData, MarketType
+from src.utils.candle_writer import candle_rows, write_candles
+from src.utils.bulk_collector import BulkCollector, plan_tasks
+from src.services.candle_store import TIMEFRAME_DELTAS
 
 logger = logging.getLogger(__name__)
 
@@ -55,6 +59,7 @@ class DataCollector:
             for price_data in all_prices:
                 try:
                     db_market_data = MarketData(
+                        instrument_id=instrument_registry.get_id(price_data['symbol'], MarketType.CRYPTO),
                         symbol=price_data['symbol'],
                         market=MarketType.CRYPTO,
                         price=price_data['price'],
@@ -110,6 +115,7 @@ class DataCollector:
             for price_data in all_prices:
                 try:
                     db_market_data = MarketData(
+                        instrument_id=instrument_registry.get_id(price_data['symbol'], MarketType.STOCK),
                         symbol=price_data['symbol'],
                         market=MarketType.STOCK,
                         price=price_data['price'],
@@ -141,7 +147,9 @@ class DataCollector:
         symbol: str,
         market_type: MarketType,
         timeframe: str = '1h',
-        limit: int = 500
+        limit: int = 500,
+        on_conflict: str = 'update',
+        method: str = 'auto'
     ) -> int:
         """
         Collect historical OHLCV data and store in database
@@ -151,6 +159,8 @@ class DataCollector:
             market_type: Market type enum
             timeframe: Candle timeframe
             limit: Number of candles
+            on_conflict: 'update' to refresh stored candles, 'nothing' to keep them
+            method: 'insert', 'copy' (PostgreSQL backfills) or 'auto'
             
         Returns:
             Number of candles stored
@@ -177,26 +187,13 @@ class DataCollector:
             else:
                 raise ValueError(f"Unsupported market type: {market_type}")
             
-            # Store in database
-            count = 0
-            for candle in ohlcv_data:
-                try:
-                    db_ohlcv = OHLCV(
-                        symbol=symbol,
-                        market=market_type,
-                        timeframe=timeframe,
-                        timestamp=candle['timestamp'],
-                        open=candle['open'],
-                        high=candle['high'],
-                        low=candle['low'],
-                        close=candle['close'],
-                        volume=candle['volume']
-                    )
-                    self.db.merge(db_ohlcv)  # Use merge to avoid duplicates
-                    count += 1
-                except Exception as e:
-                    logger.warning(f"Failed to store candle: {e}")
-                    continue
+            # Bulk upsert on idx_ohlcv_instrument_lookup
+            count = write_candles(
+                self.db,
+                candle_rows(symbol, market_type, timeframe, ohlcv_data),
+                on_conflict=on_conflict,
+                method=method
+            )
             
             self.db.commit()
             logger.info(f"Collected {count} OHLCV candles for {symbol}")
@@ -212,7 +209,10 @@ class DataCollector:
         symbols: List[str],
         market_type: MarketType,
         timeframe: str = '1h',
-        limit: int = 500
+        limit: int = 500,
+        on_conflict: str = 'update',
+        method: str = 'auto',
+        workers: int = 1
     ) -> dict:
         """
         Collect historical data for multiple symbols
@@ -222,10 +222,31 @@ class DataCollector:
             market_type: Market type
             timeframe: Candle timeframe
             limit: Number of candles per symbol
+            on_conflict: 'update' or 'nothing'
+            method: 'insert', 'copy' or 'auto'
+            workers: Collect on this many threads, each with its own
+                session (see src/utils/bulk_collector.py); 1 uses this
+                collector's session
             
         Returns:
             Dictionary with collection statistics
         """
+        if workers > 1:
+            end = datetime.now(timezone.utc)
+            tasks = plan_tasks(symbols, market_type, [timeframe],
+                               end - TIMEFRAME_DELTAS[timeframe] * limit, end, chunk_candles=limit)
+            summary = BulkCollector(
+                pool='thread', workers=workers, progress_interval=0,
+                on_conflict=on_conflict, method=method
+            ).run(tasks)
+            failed = {f['key'].split('|')[0] for f in summary['failures']}
+            return {
+                'total_symbols': len(symbols),
+                'successful': len(symbols) - len(failed),
+                'failed': len(failed),
+                'total_candles': summary['candles']
+            }
+
         results = {
             'total_symbols': len(symbols),
             'successful': 0,
@@ -239,7 +260,9 @@ class DataCollector:
                     symbol=symbol,
                     market_type=market_type,
                     timeframe=timeframe,
-                    limit=limit
+                    limit=limit,
+                    on_conflict=on_conflict,
+                    method=method
                 )
                 results['successful'] += 1
                 results['total_candles'] += count
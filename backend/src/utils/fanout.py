@@ -0,0 +1,172 @@
+"""
+Fan-out Executor
+Runs blocking per-symbol fetches concurrently with per-symbol and overall deadlines
+"""
+from typing import Callable, Dict, Any, Iterable, Optional
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FanOutExecutor:
+    """
+    Bounded thread pool for fanning out blocking upstream calls
+
+    Each call gets its own deadline (measured from when it starts running) and
+    the whole batch is bounded by an overall deadline, so one hanging symbol
+    can never hold a request longer than ``overall_timeout``.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        symbol_timeout: float = 5.0,
+        overall_timeout: float = 8.0,
+        name: str = 'fanout'
+    ):
+        """
+        Initialize fan-out executor
+
+        Args:
+            max_workers: Maximum number of concurrent upstream calls
+            symbol_timeout: Default deadline in seconds for a single call
+            overall_timeout: Default deadline in seconds for the whole batch
+            name: Thread name prefix
+        """
+        self.max_workers = max_workers
+        self.symbol_timeout = symbol_timeout
+        self.overall_timeout = overall_timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.latency_stats: Dict[str, Dict[str, Any]] = {}
+
+    def run(
+        self,
+        fn: Callable[[str], Any],
+        keys: Iterable[str],
+        symbol_timeout: Optional[float] = None,
+        overall_timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Call ``fn(key)`` for every key concurrently
+
+        Args:
+            fn: Blocking function taking a single key (e.g. a symbol)
+            keys: Keys to fan out over
+            symbol_timeout: Per-key deadline override
+            overall_timeout: Batch deadline override
+
+        Returns:
+            Dictionary with 'results' (key -> value), 'errors' (key -> message),
+            'timed_out' (keys that missed a deadline), 'latencies' (key -> ms)
+            and 'elapsed_ms' for the whole batch
+        """
+        symbol_timeout = symbol_timeout if symbol_timeout is not None else self.symbol_timeout
+        overall_timeout = overall_timeout if overall_timeout is not None else self.overall_timeout
+
+        started_at = time.monotonic()
+        overall_deadline = started_at + overall_timeout
+        start_times: Dict[str, float] = {}
+
+        def _call(key: str) -> Any:
+            start_times[key] = time.monotonic()
+            return fn(key)
+
+        futures = {self._pool.submit(_call, key): key for key in keys}
+        pending = set(futures)
+
+        results: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        timed_out = []
+        latencies: Dict[str, float] = {}
+
+        while pending:
+            now = time.monotonic()
+            if now >= overall_deadline:
+                break
+
+            # Wake up at the earliest per-symbol deadline among running calls
+            next_deadline = overall_deadline
+            for future in pending:
+                key = futures[future]
+                if key in start_times:
+                    next_deadline = min(next_deadline, start_times[key] + symbol_timeout)
+
+            done, pending = wait(pending, timeout=max(next_deadline - now, 0), return_when=FIRST_COMPLETED)
+
+            now = time.monotonic()
+            for future in done:
+                key = futures[future]
+                latencies[key] = (now - start_times.get(key, started_at)) * 1000
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    errors[key] = str(e)
+
+            expired = {
+                future for future in pending
+                if futures[future] in start_times
+                and now - start_times[futures[future]] >= symbol_timeout
+            }
+            for future in expired:
+                key = futures[future]
+                timed_out.append(key)
+                latencies[key] = (now - start_times[key]) * 1000
+            pending -= expired
+
+        # Whatever is left missed the overall deadline
+        now = time.monotonic()
+        for future in pending:
+            key = futures[future]
+            future.cancel()
+            timed_out.append(key)
+            latencies[key] = (now - start_times.get(key, now)) * 1000
+
+        if timed_out:
+            logger.warning(f"Fan-out deadline missed for: {', '.join(timed_out)}")
+
+        self._record_latencies(latencies, set(timed_out), set(errors))
+
+        return {
+            'results': results,
+            'errors': errors,
+            'timed_out': timed_out,
+            'latencies': latencies,
+            'elapsed_ms': (time.monotonic() - started_at) * 1000
+        }
+
+    def _record_latencies(self, latencies: Dict[str, float], timed_out: set, failed: set) -> None:
+        """Update rolling per-key latency statistics"""
+        with self._lock:
+            for key, latency_ms in latencies.items():
+                stats = self.latency_stats.setdefault(key, {
+                    'count': 0,
+                    'timeouts': 0,
+                    'errors': 0,
+                    'last_ms': 0.0,
+                    'avg_ms': 0.0,
+                    'max_ms': 0.0
+                })
+                stats['count'] += 1
+                stats['last_ms'] = latency_ms
+                stats['max_ms'] = max(stats['max_ms'], latency_ms)
+                # Exponentially weighted average so old samples fade out
+                stats['avg_ms'] = latency_ms if stats['count'] == 1 else 0.8 * stats['avg_ms'] + 0.2 * latency_ms
+                if key in timed_out:
+                    stats['timeouts'] += 1
+                if key in failed:
+                    stats['errors'] += 1
+
+    def get_latency_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get rolling latency statistics per key, slowest first
+
+        Returns:
+            Dictionary of key -> latency statistics
+        """
+        with self._lock:
+            ordered = sorted(self.latency_stats.items(), key=lambda item: item[1]['avg_ms'], reverse=True)
+            return {key: dict(stats) for key, stats in ordered}
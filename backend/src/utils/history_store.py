@@ -0,0 +1,128 @@
+"""
+Local History Store
+Per-(symbol, interval) Parquet files for incremental stock history
+"""
+from typing import Optional
+from pathlib import Path
+import os
+import re
+import threading
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Parquet support is optional; without it the store is disabled
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    logger.warning("pyarrow not available. Local history store is disabled.")
+
+DEFAULT_STORE_DIR = Path(__file__).resolve().parents[3] / "data" / "raw" / "history"
+
+
+class HistoryStore:
+    """On-disk OHLCV store with atomic rewrite-on-append"""
+
+    def __init__(self, root: Optional[str] = None):
+        """
+        Initialize history store
+
+        Args:
+            root: Directory for Parquet files (defaults to data/raw/history)
+        """
+        self.root = Path(root or os.getenv("HISTORY_STORE_DIR", DEFAULT_STORE_DIR))
+        self.enabled = PYARROW_AVAILABLE and os.getenv("HISTORY_STORE_ENABLED", "True").lower() == "true"
+        self._locks: dict = {}
+        self._locks_guard = threading.Lock()
+
+    def _path(self, symbol: str, interval: str) -> Path:
+        """File path for a (symbol, interval) pair"""
+        safe_symbol = re.sub(r'[^A-Za-z0-9._-]', '_', symbol)
+        return self.root / interval / f"{safe_symbol}.parquet"
+
+    def lock(self, symbol: str, interval: str) -> threading.Lock:
+        """Per-file lock so concurrent requests don't race on the same file"""
+        key = f"{interval}:{symbol}"
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def load(self, symbol: str, interval: str) -> Optional[pd.DataFrame]:
+        """
+        Load stored history
+
+        Args:
+            symbol: Stock ticker
+            interval: yfinance interval
+
+        Returns:
+            DataFrame indexed by timestamp, or None when nothing is stored
+        """
+        if not self.enabled:
+            return None
+
+        path = self._path(symbol, interval)
+        if not path.exists():
+            return None
+
+        try:
+            return pd.read_parquet(path)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable history file {path}: {e}")
+            return None
+
+    def save(self, symbol: str, interval: str, df: pd.DataFrame) -> None:
+        """
+        Atomically replace stored history
+
+        The frame is written to a temporary file in the same directory and
+        renamed over the old one, so readers never see a partial file.
+
+        Args:
+            symbol: Stock ticker
+            interval: yfinance interval
+            df: Full history to persist
+        """
+        if not self.enabled:
+            return
+
+        path = self._path(symbol, interval)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+
+        try:
+            df.to_parquet(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to write history file {path}: {e}")
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def append(self, symbol: str, interval: str, stored: pd.DataFrame, tail: pd.DataFrame) -> pd.DataFrame:
+        """
+        Merge newly fetched rows into stored history and persist
+
+        Rows with the same timestamp are replaced by the fresh ones, which
+        also takes care of the still-forming last bar.
+
+        Args:
+            symbol: Stock ticker
+            interval: yfinance interval
+            stored: Currently stored history
+            tail: Newly fetched rows
+
+        Returns:
+            Merged (compacted) history
+        """
+        merged = pd.concat([stored, tail])
+        merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+        self.save(symbol, interval, merged)
+        return merged
+
+
+# Singleton instance
+history_store = HistoryStore()
@@ -0,0 +1,188 @@
+"""
+HTTP Cache Validators
+ETag/Last-Modified helpers and a small body cache for candle-derived responses
+"""
+from typing import Callable, Dict, Any, List, Optional
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime
+import hashlib
+import struct
+import threading
+import os
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.utils.metrics import record_cache
+
+
+class ResponseBodyCache:
+    """Thread-safe LRU of serialized response bodies keyed by ETag"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(etag)
+            if body is not None:
+                self._entries.move_to_end(etag)
+            return body
+
+    def put(self, etag: str, body: bytes) -> None:
+        with self._lock:
+            self._entries[etag] = body
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+response_cache = ResponseBodyCache(max_entries=int(os.getenv("RESPONSE_CACHE_ENTRIES", 512)))
+
+# timestamp, open, high, low, close, volume
+_CANDLE_STRUCT = struct.Struct('<6d')
+_COLUMN_FIELDS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+
+def candle_etag(kind: str, candles: List[Dict[str, Any]], *params: Any) -> str:
+    """
+    Strong ETag for a response derived from a candle series
+
+    Every candle's timestamp and OHLCV values go into the hash, so the tag
+    changes when the forming candle's high, low or volume moves with an
+    unchanged close, and when an earlier candle is revised. (The ETag is
+    also the response body cache key, so it must cover everything the body
+    is rendered from.)
+
+    Args:
+        kind: Response kind (e.g. 'history', 'indicators')
+        candles: OHLCV dictionaries, oldest first
+        params: Request parameters that shape the response
+
+    Returns:
+        Quoted ETag value
+    """
+    digest = _etag_digest(kind, params, len(candles))
+    # Packed doubles hash about 4x faster than a repr of the same values
+    digest.update(b''.join(
+        _CANDLE_STRUCT.pack(
+            c['timestamp'].timestamp(), c['open'], c['high'], c['low'], c['close'], c['volume']
+        )
+        for c in candles
+    ))
+    return '"' + digest.hexdigest() + '"'
+
+
+def columns_etag(kind: str, columns: Dict[str, list], *params: Any) -> str:
+    """
+    candle_etag for a columnar payload (see candle_encoding.to_columns)
+
+    Each column is hashed as one packed array of doubles.
+    """
+    digest = _etag_digest(kind, params, len(columns['timestamp']))
+    for field in _COLUMN_FIELDS:
+        digest.update(array('d', columns[field]).tobytes())
+    return '"' + digest.hexdigest() + '"'
+
+
+def _etag_digest(kind: str, params: tuple, count: int):
+    return hashlib.sha1('|'.join(str(p) for p in (kind, *params, count)).encode('utf-8'))
+
+
+def http_date(value: datetime) -> str:
+    """Format a (naive local or aware) datetime as an HTTP date"""
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match covers the ETag"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in header.split(',')]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def conditional_response(
+    request: Request,
+    etag: str,
+    last_modified: Optional[datetime],
+    render: Callable[[], bytes],
+    media_type: str = 'application/json',
+    max_age: int = 0,
+    vary: Optional[str] = None
+) -> Response:
+    """
+    Serve an encoded response with cache validators
+
+    Returns 304 when the client already holds this ETag, otherwise reuses a
+    previously rendered body for the same ETag and only calls ``render`` on
+    a miss.
+
+    Args:
+        request: Incoming request
+        etag: Quoted strong ETag (must differ per encoding)
+        last_modified: Timestamp of the newest data in the response
+        render: Produces the encoded body on a cache miss
+        media_type: Response content type
+        max_age: Seconds clients may reuse the response without revalidating
+        vary: Optional Vary header value
+
+    Returns:
+        Response with ETag, Cache-Control and Last-Modified headers
+    """
+    headers = {
+        'ETag': etag,
+        'Cache-Control': f"public, max-age={max_age}, must-revalidate" if max_age else "public, no-cache",
+    }
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+    if vary:
+        headers['Vary'] = vary
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    body = response_cache.get(etag)
+    record_cache('response_body', body is not None)
+    if body is None:
+        body = render()
+        response_cache.put(etag, body)
+
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def conditional_json_response(
+    request: Request,
+    etag: str,
+    last_modified: Optional[datetime],
+    build: Callable[[], Any],
+    max_age: int = 0
+) -> Response:
+    """
+    Serve a JSON response with cache validators
+
+    Args:
+        request: Incoming request
+        etag: Quoted strong ETag
+        last_modified: Timestamp of the newest data in the response
+        build: Produces the response payload on a cache miss
+        max_age: Seconds clients may reuse the response without revalidating
+
+    Returns:
+        Response with ETag, Cache-Control and Last-Modified headers
+    """
+    return conditional_response(
+        request,
+        etag,
+        last_modified,
+        lambda: JSONResponse(content=jsonable_encoder(build())).body,
+        max_age=max_age
+    )
@@ -0,0 +1,202 @@
+"""
+Prometheus Metrics
+Route, upstream provider, indicator, cache, database pool and candle
+ingest instrumentation
+
+Label values are drawn from small fixed sets (route templates, provider and
+method names, indicator names). Per-symbol upstream labels are opt-in via
+METRICS_SYMBOL_LABELS and capped at METRICS_MAX_SYMBOLS distinct values.
+"""
+from typing import Dict, Iterator, Optional, Set
+from contextlib import contextmanager
+import threading
+import time
+import os
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+from src.utils.tracing import span
+
+SYMBOL_LABELS = os.getenv("METRICS_SYMBOL_LABELS", "False").lower() == "true"
+MAX_SYMBOLS = int(os.getenv("METRICS_MAX_SYMBOLS", 100))
+
+# Upstream calls are slower and wider than route handlers
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0)
+FAST_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+HTTP_REQUEST_DURATION = Histogram(
+    'buddy_http_request_duration_seconds',
+    'HTTP request latency by route template',
+    ['method', 'route', 'status'],
+    buckets=LATENCY_BUCKETS
+)
+
+UPSTREAM_REQUEST_DURATION = Histogram(
+    'buddy_upstream_request_duration_seconds',
+    'Upstream market data call latency',
+    ['provider', 'method', 'outcome'] + (['symbol'] if SYMBOL_LABELS else []),
+    buckets=UPSTREAM_BUCKETS
+)
+
+INDICATOR_DURATION = Histogram(
+    'buddy_indicator_duration_seconds',
+    'Time spent computing each technical indicator',
+    ['indicator'],
+    buckets=FAST_BUCKETS
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    'buddy_db_pool_checkout_wait_seconds',
+    'Time spent waiting for a pooled database connection',
+    ['engine'],
+    buckets=FAST_BUCKETS + (0.5, 1.0, 5.0, 30.0)
+)
+
+DB_CONNECTION_HOLD = Histogram(
+    'buddy_db_connection_hold_seconds',
+    'Time a lazy request session kept a pooled connection checked out',
+    ['engine'],
+    buckets=FAST_BUCKETS + (0.5, 1.0, 5.0, 30.0)
+)
+
+CACHE_REQUESTS = Counter(
+    'buddy_cache_requests_total',
+    'Cache lookups by cache and result',
+    ['cache', 'result']
+)
+
+INGEST_FETCHES = Counter(
+    'buddy_ingest_fetches_total',
+    'Scheduled candle fetches by provider and outcome',
+    ['provider', 'outcome']
+)
+
+INGEST_CANDLES_WRITTEN = Counter(
+    'buddy_ingest_candles_written_total',
+    'Closed candles written to ohlcv_data by the ingest daemon',
+    ['market', 'timeframe']
+)
+
+INGEST_LAG = Gauge(
+    'buddy_ingest_lag_seconds',
+    'Seconds since the close of the newest stored candle, worst symbol',
+    ['market', 'timeframe']
+)
+
+INGEST_HEARTBEAT = Gauge(
+    'buddy_ingest_heartbeat_timestamp_seconds',
+    'Unix time of the last ingest scheduler pass'
+)
+
+INGEST_QUEUE_DEPTH = Gauge(
+    'buddy_ingest_queue_depth',
+    'Ingest work waiting, by stage',
+    ['stage']
+)
+
+_symbols_seen: Set[str] = set()
+_symbols_lock = threading.Lock()
+
+
+def symbol_label(symbol: Optional[str]) -> str:
+    """Bounded symbol label value: the first MAX_SYMBOLS symbols, then 'other'"""
+    if not symbol:
+        return 'none'
+    with _symbols_lock:
+        if symbol in _symbols_seen:
+            return symbol
+        if len(_symbols_seen) < MAX_SYMBOLS:
+            _symbols_seen.add(symbol)
+            return symbol
+    return 'other'
+
+
+@contextmanager
+def observe_upstream(provider: str, method: str, symbol: Optional[str] = None) -> Iterator[None]:
+    """
+    Time an upstream call (also recorded as a request span)
+
+    Usage:
+        with observe_upstream('binance', 'get_klines', symbol):
+            klines = client.get_klines(...)
+    """
+    outcome = 'ok'
+    started = time.perf_counter()
+    try:
+        with span(f"{provider}_{method}"):
+            yield
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        labels = [provider, method, outcome]
+        if SYMBOL_LABELS:
+            labels.append(symbol_label(symbol))
+        UPSTREAM_REQUEST_DURATION.labels(*labels).observe(time.perf_counter() - started)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a cache hit or miss"""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+class _CheckoutTimingMixin:
+    """Times pool checkout, including waiting for a free connection"""
+
+    metrics_label = 'sync'
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            with span('db_checkout'):
+                return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(self.metrics_label).observe(time.perf_counter() - started)
+
+
+class TimedQueuePool(_CheckoutTimingMixin, QueuePool):
+    """QueuePool for the sync engine with checkout timing"""
+
+    metrics_label = 'sync'
+
+
+class TimedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool for the async engine with checkout timing"""
+
+    metrics_label = 'async'
+
+
+class PoolCollector:
+    """Reports pool size, checked-out connections and overflow at scrape time"""
+
+    def __init__(self):
+        self._engines: Dict[str, object] = {}
+
+    def register(self, name: str, engine) -> None:
+        """Track an Engine (or AsyncEngine) under a label"""
+        self._engines[name] = getattr(engine, 'sync_engine', engine)
+
+    def collect(self):
+        size = GaugeMetricFamily('buddy_db_pool_size', 'Configured pool size', labels=['engine'])
+        checked_out = GaugeMetricFamily('buddy_db_pool_checked_out', 'Connections in use', labels=['engine'])
+        overflow = GaugeMetricFamily('buddy_db_pool_overflow', 'Connections opened beyond pool size', labels=['engine'])
+
+        for name, engine in self._engines.items():
+            # Read the pool each scrape: dispose() replaces it
+            pool = engine.pool
+            if not isinstance(pool, QueuePool):
+                continue
+            size.add_metric([name], pool.size())
+            checked_out.add_metric([name], pool.checkedout())
+            overflow.add_metric([name], max(pool.overflow(), 0))
+
+        yield size
+        yield checked_out
+        yield overflow
+
+
+pool_collector = PoolCollector()
+REGISTRY.register(pool_collector)
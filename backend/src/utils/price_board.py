@@ -0,0 +1,384 @@
+"""
+Shared-Memory Price Board
+Fixed-layout per-symbol slots in multiprocessing.shared_memory, written by a
+single ingest process and read lock-free by every API worker
+
+Each slot is guarded by a seqlock: the writer makes the sequence odd, writes
+the values, then makes it even again. Readers copy the slot and retry if the
+sequence was odd or changed while copying, so a read never blocks the writer
+and never returns a half-written quote. This relies on stores becoming
+visible in program order, which holds on x86-64.
+
+Slots are keyed by (market, symbol). The header carries a generation (the
+creation time); when the ingest process restarts and replaces the board it
+zeroes the old segment's generation, so attached readers know to re-attach.
+"""
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from multiprocessing import shared_memory
+import logging
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = 0x42554444595042  # "BUDDYPB"
+LAYOUT_VERSION = 2
+HEADER_SIZE = 64
+# Header words: magic, layout version, capacity, slot count, generation
+HEADER_WORDS = 5
+SYMBOL_SIZE = 24
+
+MARKETS = {'crypto': 1, 'stock': 2}
+MARKET_NAMES = {v: k for k, v in MARKETS.items()}
+
+# Slot value columns (float64); unset values are NaN
+FIELDS = (
+    # 24h ticker
+    'price', 'open_price', 'high', 'low', 'volume',
+    'change_24h', 'change_percent_24h', 'ticker_ts',
+    # Top of book
+    'bid', 'bid_qty', 'ask', 'ask_qty', 'book_ts',
+    # Forming candle
+    'candle_open_time', 'candle_open', 'candle_high', 'candle_low',
+    'candle_close', 'candle_volume',
+    # Wall clock of the last write, epoch seconds
+    'updated_at',
+)
+FIELD_INDEX = {name: i for i, name in enumerate(FIELDS)}
+
+BOARD_NAME = os.getenv("PRICE_BOARD_NAME", "buddy_price_board")
+BOARD_CAPACITY = int(os.getenv("PRICE_BOARD_CAPACITY", 1024))
+BOARD_ENABLED = os.getenv("PRICE_BOARD_ENABLED", "False").lower() == "true"
+BOARD_MAX_AGE = float(os.getenv("PRICE_BOARD_MAX_AGE", 10))
+
+
+def encode_symbol(symbol: str) -> bytes:
+    """
+    Symbol as stored in a slot
+
+    Raises:
+        ValueError: If the symbol isn't ASCII or is longer than SYMBOL_SIZE bytes
+    """
+    encoded = symbol.encode('ascii')
+    if len(encoded) > SYMBOL_SIZE:
+        # A truncated name could collide with another symbol's slot
+        raise ValueError(f"Symbol {symbol!r} is longer than {SYMBOL_SIZE} characters")
+    return encoded
+
+
+def _layout(capacity: int) -> Tuple[int, int, int, int, int]:
+    """Byte offsets of the seq, market, symbol and value arrays, and the total size"""
+    seq_offset = HEADER_SIZE
+    market_offset = seq_offset + 8 * capacity
+    symbol_offset = market_offset + ((capacity + 7) // 8) * 8
+    values_offset = symbol_offset + ((SYMBOL_SIZE * capacity + 7) // 8) * 8
+    size = values_offset + 8 * capacity * len(FIELDS)
+    return seq_offset, market_offset, symbol_offset, values_offset, size
+
+
+class PriceBoard:
+    """
+    View over a shared-memory price board
+
+    Use PriceBoard.create() in the ingest process (the only writer) and
+    PriceBoard.attach() in API workers.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, capacity: int, owner: bool):
+        self.shm = shm
+        self.capacity = capacity
+        self.owner = owner
+
+        seq_offset, market_offset, symbol_offset, values_offset, _ = _layout(capacity)
+        buf = shm.buf
+        self._header = np.ndarray((HEADER_WORDS,), dtype='<u8', buffer=buf, offset=0)
+        self._seq = np.ndarray((capacity,), dtype='<u8', buffer=buf, offset=seq_offset)
+        self._market = np.ndarray((capacity,), dtype='u1', buffer=buf, offset=market_offset)
+        self._symbols = np.ndarray((capacity,), dtype=f'S{SYMBOL_SIZE}', buffer=buf, offset=symbol_offset)
+        self._values = np.ndarray((capacity, len(FIELDS)), dtype='<f8', buffer=buf, offset=values_offset)
+
+        self._index: Dict[Tuple[str, str], int] = {}
+        self._index_lock = threading.Lock()
+
+    @classmethod
+    def create(cls, name: str = BOARD_NAME, capacity: int = BOARD_CAPACITY) -> "PriceBoard":
+        """Create (or replace) the board; call from the ingest process only"""
+        size = _layout(capacity)[-1]
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            pass
+        else:
+            # Readers still mapping the old segment re-attach once it is retired
+            if stale.size >= HEADER_SIZE:
+                retired = np.ndarray((HEADER_WORDS,), dtype='<u8', buffer=stale.buf, offset=0)
+                retired[4] = 0
+                del retired
+            stale.close()
+            stale.unlink()
+            logger.info(f"Replaced existing price board {name}")
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        board = cls(shm, capacity, owner=True)
+        board._values.fill(np.nan)
+        board._seq.fill(0)
+        board._header[:] = (MAGIC, LAYOUT_VERSION, capacity, 0, time.time_ns())
+        return board
+
+    @classmethod
+    def attach(cls, name: str = BOARD_NAME) -> "PriceBoard":
+        """Attach to a board created by the ingest process"""
+        shm = shared_memory.SharedMemory(name=name)
+        # Before Python 3.13 attaching registers the segment with this process's
+        # resource tracker, which would unlink it when the worker exits
+        _untrack(shm)
+
+        header = np.ndarray((HEADER_WORDS,), dtype='<u8', buffer=shm.buf, offset=0)
+        valid = int(header[0]) == MAGIC and int(header[1]) == LAYOUT_VERSION
+        capacity = int(header[2])
+        del header
+        if not valid:
+            shm.close()
+            raise ValueError(f"{name} is not a version {LAYOUT_VERSION} price board")
+        return cls(shm, capacity, owner=False)
+
+    @property
+    def generation(self) -> int:
+        """Creation time of the board in ns; 0 once a newer board replaced it"""
+        return int(self._header[4])
+
+    def close(self) -> None:
+        """Detach; the owner also removes the segment unless a newer board replaced it"""
+        retired = self.generation == 0
+        # numpy views must go before the buffer can be released
+        self._header = self._seq = self._market = self._symbols = self._values = None
+        self.shm.close()
+        if self.owner:
+            if retired:
+                # The name now belongs to the replacement board
+                _untrack(self.shm)
+            else:
+                self.shm.unlink()
+
+    # Writer side
+
+    def _slot_for_write(self, symbol: str, market: str) -> int:
+        slot = self._index.get((market, symbol))
+        if slot is not None:
+            return slot
+
+        encoded = encode_symbol(symbol)
+        count = int(self._header[3])
+        if count >= self.capacity:
+            raise ValueError(f"Price board is full ({self.capacity} symbols)")
+
+        # Publish the name before bumping the count so readers never see an empty slot
+        self._symbols[count] = encoded
+        self._market[count] = MARKETS[market]
+        self._header[3] = count + 1
+        self._index[(market, symbol)] = count
+        return count
+
+    def write(self, symbol: str, market: str, values: Dict[str, float]) -> None:
+        """
+        Update some fields of a symbol's slot under its seqlock
+
+        Args:
+            symbol: Trading symbol
+            market: 'crypto' or 'stock'
+            values: Field name -> value (names from FIELDS)
+        """
+        slot = self._slot_for_write(symbol, market)
+        columns = [FIELD_INDEX[name] for name in values] + [FIELD_INDEX['updated_at']]
+        row = [float(v) if v is not None else math.nan for v in values.values()] + [time.time()]
+
+        self._seq[slot] += 1  # Odd: write in progress
+        self._values[slot, columns] = row
+        self._seq[slot] += 1  # Even: consistent
+
+    # Reader side
+
+    def _slot_for_read(self, symbol: str, market: str) -> Optional[int]:
+        slot = self._index.get((market, symbol))
+        if slot is not None:
+            return slot
+
+        # The writer only appends, so rescanning the published prefix is enough
+        with self._index_lock:
+            count = int(self._header[3])
+            for i in range(len(self._index), count):
+                name = MARKET_NAMES.get(int(self._market[i]), 'unknown')
+                self._index[(name, self._symbols[i].decode('ascii'))] = i
+        return self._index.get((market, symbol))
+
+    def read(self, symbol: str, market: str, retries: int = 100) -> Optional[Dict[str, Any]]:
+        """
+        Consistent copy of a symbol's slot
+
+        Args:
+            symbol: Trading symbol
+            market: 'crypto' or 'stock'
+            retries: Attempts before giving up on a slot under constant writes
+
+        Returns:
+            Field dictionary (NaN fields omitted) with symbol and market, or None
+        """
+        slot = self._slot_for_read(symbol, market)
+        if slot is None:
+            return None
+
+        for _ in range(retries):
+            before = int(self._seq[slot])
+            if before & 1:
+                time.sleep(0)  # Let the writer finish
+                continue
+            row = self._values[slot].copy()
+            if int(self._seq[slot]) == before:
+                data: Dict[str, Any] = {
+                    name: float(row[i]) for i, name in enumerate(FIELDS) if not math.isnan(row[i])
+                }
+                data['symbol'] = symbol
+                data['market'] = market
+                return data
+        logger.warning(f"Price board read for {symbol} kept racing the writer")
+        return None
+
+    def symbols(self) -> List[Tuple[str, str]]:
+        """(market, symbol) pairs published on the board"""
+        count = int(self._header[3])
+        return [
+            (MARKET_NAMES.get(int(m), 'unknown'), s.decode('ascii'))
+            for m, s in zip(self._market[:count], self._symbols[:count])
+        ]
+
+
+def _untrack(shm: shared_memory.SharedMemory) -> None:
+    """Stop this process's resource tracker from unlinking the segment at exit"""
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+
+def to_quote(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Board entry in the shape returned by get_current_price"""
+    quote = {
+        'symbol': entry['symbol'],
+        'price': entry['price'],
+        'open_price': entry.get('open_price', 0.0),
+        'high': entry.get('high', 0.0),
+        'low': entry.get('low', 0.0),
+        'close': entry['price'],
+        'volume': entry.get('volume', 0.0),
+        'change_24h': entry.get('change_24h', 0.0),
+        'change_percent_24h': entry.get('change_percent_24h', 0.0),
+        'timestamp': int(entry.get('ticker_ts', entry['updated_at'] * 1000)),
+    }
+    if 'bid' in entry and 'ask' in entry:
+        quote['bid'] = entry['bid']
+        quote['ask'] = entry['ask']
+    if 'candle_open_time' in entry:
+        quote['candle'] = {
+            'openTime': int(entry['candle_open_time']),
+            'open': entry.get('candle_open'),
+            'high': entry.get('candle_high'),
+            'low': entry.get('candle_low'),
+            'close': entry.get('candle_close'),
+            'volume': entry.get('candle_volume'),
+        }
+    return quote
+
+
+class BoardReader:
+    """
+    Lazily attaches to the board in API workers and serves fresh quotes
+
+    The attached board is replaced when the ingest process retires it, or,
+    if it never got the chance to (the segment was removed some other way),
+    when no read has been fresh for ``retry_interval`` and a board with a
+    different generation exists under the same name.
+    """
+
+    def __init__(self, enabled: bool = BOARD_ENABLED, name: str = BOARD_NAME,
+                 max_age: float = BOARD_MAX_AGE, retry_interval: float = 5.0):
+        self.enabled = enabled
+        self.name = name
+        self.max_age = max_age
+        self.retry_interval = retry_interval
+        self._board: Optional[PriceBoard] = None
+        self._next_attempt = 0.0
+        self._last_fresh = 0.0
+        self._lock = threading.Lock()
+
+    def board(self) -> Optional[PriceBoard]:
+        """Attached board, or None if disabled or the ingest process isn't up yet"""
+        if not self.enabled:
+            return None
+
+        board = self._board
+        now = time.monotonic()
+        if board is not None and board.generation != 0 and now - self._last_fresh <= self.retry_interval:
+            return board
+        if now < self._next_attempt:
+            return board
+        with self._lock:
+            if self._board is board and now >= self._next_attempt:
+                self._attach(now)
+        return self._board
+
+    def _attach(self, now: float) -> None:
+        """(Re-)attach by name, keeping the current board unless a different one is found"""
+        try:
+            fresh = PriceBoard.attach(self.name)
+        except (FileNotFoundError, ValueError) as e:
+            logger.debug(f"Price board unavailable: {e}")
+            self._next_attempt = now + self.retry_interval
+            return
+
+        if self._board is not None and fresh.generation == self._board.generation:
+            # Same board, just no fresh writes (ingest stalled or symbols not on it)
+            fresh.close()
+            self._next_attempt = now + self.retry_interval
+            return
+
+        # The old mapping is left to the garbage collector: other threads may still be reading it
+        self._board = fresh
+        self._last_fresh = now
+        logger.info(f"Attached to price board {self.name}")
+
+    def get_quote(self, symbol: str, market: str) -> Optional[Dict[str, Any]]:
+        """Fresh quote for a symbol ('crypto' or 'stock'), or None to fall back to upstream"""
+        board = self.board()
+        if board is None:
+            return None
+        entry = board.read(symbol, market)
+        if entry is None or 'price' not in entry or time.time() - entry['updated_at'] > self.max_age:
+            return None
+        self._last_fresh = time.monotonic()
+        return to_quote(entry)
+
+    def get_quotes(self, symbols: Iterable[str], market: str) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """
+        Fresh quotes for many symbols of one market
+
+        Returns:
+            Tuple of (symbol -> quote, symbols to fetch upstream)
+        """
+        found: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        for symbol in symbols:
+            quote = self.get_quote(symbol, market)
+            if quote is None:
+                missing.append(symbol)
+            else:
+                found[symbol] = quote
+        return found, missing
+
+
+# Singleton reader for API workers
+board_reader = BoardReader()
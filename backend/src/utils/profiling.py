@@ -0,0 +1,66 @@
+"""
+Sampling Profiler
+Samples Python stacks on a background thread and emits collapsed stacks
+(the flamegraph.pl / speedscope "folded" format)
+"""
+from typing import Dict, List, Optional
+from collections import Counter
+import os
+import sys
+import threading
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampler over every thread in the process
+
+    Each sample walks the current frame of every thread, so the profile of
+    one request also shows whatever else the process was doing; run it on a
+    quiet instance when attribution matters.
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 128):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _sample(self, names: Dict[int, str]) -> None:
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack: List[str] = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(self._frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f"thread-{thread_id}"))
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            self._sample(names)
+
+    def start(self) -> None:
+        """Start sampling"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def collapsed(self) -> str:
+        """Samples as collapsed stacks, one ``frame;frame;frame count`` line each"""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.samples.most_common()) + '\n'
@@ -0,0 +1,266 @@
+"""
+Tick Retention
+Rolls raw market_data ticks up into 1m OHLCV bars, optionally archives them,
+and deletes them once they are older than the retention horizon
+
+Work proceeds one time window at a time, oldest first, and deletes are
+committed in batches of ``batch_size`` ids so no statement holds row locks
+for long.
+
+Tick rows carry the 24h rolling volume rather than traded volume, so bars
+rolled up from ticks have a volume of 0. They are stored under their own
+timeframe, TICK_TIMEFRAME, which the candle store, gap detection and the 1h/1d
+rollups (all of which read '1m') never see, so exchange candles for the same
+minutes are still fetched and stored.
+
+Usage:
+    python -m src.utils.retention --dry-run
+    python -m src.utils.retention --horizon-hours 48 --archive
+"""
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import argparse
+import csv
+import gzip
+import json
+import logging
+import os
+import time
+
+from sqlalchemy import select, delete, func, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from src.models.market import MarketData
+from src.utils.candle_writer import write_candles
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_DIR = Path(__file__).resolve().parents[3] / "data" / "raw" / "archive" / "market_data"
+
+ARCHIVE_COLUMNS = [c.name for c in MarketData.__table__.columns]
+
+# ohlcv_data timeframe of bars rolled up from ticks
+TICK_TIMEFRAME = '1m_tick'
+
+RETENTION_HORIZON_HOURS = float(os.getenv("TICK_RETENTION_HOURS", 48))
+RETENTION_BATCH_SIZE = int(os.getenv("TICK_RETENTION_BATCH_SIZE", 5000))
+RETENTION_WINDOW_MINUTES = int(os.getenv("TICK_RETENTION_WINDOW_MINUTES", 60))
+RETENTION_PAUSE = float(os.getenv("TICK_RETENTION_PAUSE", 0.05))
+ARCHIVE_ENABLED = os.getenv("TICK_ARCHIVE_ENABLED", "False").lower() == "true"
+
+
+def _utc(value: datetime) -> datetime:
+    """SQLite returns naive UTC datetimes"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _floor_minute(value: datetime) -> datetime:
+    return value.replace(second=0, microsecond=0)
+
+
+def rollup_ticks(ticks: List[Any]) -> List[Dict[str, Any]]:
+    """
+    1m OHLCV rows (timeframe TICK_TIMEFRAME) from ticks ordered by timestamp
+
+    Args:
+        ticks: Rows with symbol, market, timestamp and price
+
+    Returns:
+        ohlcv_data rows
+    """
+    bars: Dict[tuple, Dict[str, Any]] = {}
+    for tick in ticks:
+        minute = _floor_minute(_utc(tick.timestamp))
+        key = (tick.symbol, tick.market, minute)
+        bar = bars.get(key)
+        if bar is None:
+            bars[key] = {
+                'symbol': tick.symbol,
+                'market': tick.market,
+                'timeframe': TICK_TIMEFRAME,
+                'timestamp': minute,
+                'open': tick.price,
+                'high': tick.price,
+                'low': tick.price,
+                'close': tick.price,
+                'volume': 0.0,
+            }
+        else:
+            bar['high'] = max(bar['high'], tick.price)
+            bar['low'] = min(bar['low'], tick.price)
+            bar['close'] = tick.price
+    return list(bars.values())
+
+
+class TickRetention:
+    """Windowed rollup, archive and batched delete of old market_data rows"""
+
+    def __init__(
+        self,
+        engine: Engine,
+        horizon: timedelta = timedelta(hours=RETENTION_HORIZON_HOURS),
+        batch_size: int = RETENTION_BATCH_SIZE,
+        window: timedelta = timedelta(minutes=RETENTION_WINDOW_MINUTES),
+        pause: float = RETENTION_PAUSE,
+        archive_dir: Optional[str] = None
+    ):
+        """
+        Initialize tick retention
+
+        Args:
+            engine: Database engine
+            horizon: Raw ticks older than this are rolled up and removed
+            batch_size: Rows per DELETE transaction
+            window: Time span of ticks loaded and rolled up at once
+            pause: Seconds to sleep between delete batches
+            archive_dir: Write deleted rows here as gzipped CSV (None to skip)
+        """
+        self.engine = engine
+        self.horizon = horizon
+        self.batch_size = batch_size
+        self.window = window
+        self.pause = pause
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+
+    def _archive(self, window_start: datetime, rows: List[Any]) -> None:
+        """
+        Write one window's rows to <archive_dir>/YYYY/MM/DD/HHMM-<first id>-<last id>.csv.gz
+
+        The id range keeps a later run over the same window (ticks that
+        arrived late) from replacing the earlier archive; only a rerun over
+        the very same rows rewrites a file. Files are written to a temporary
+        name and renamed.
+        """
+        ids = [row.id for row in rows]
+        path = self.archive_dir / f"{window_start:%Y/%m/%d/%H%M}-{min(ids)}-{max(ids)}.csv.gz"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        with gzip.open(tmp, 'wt', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(ARCHIVE_COLUMNS)
+            for row in rows:
+                writer.writerow([
+                    row.market.name if column == 'market' else getattr(row, column)
+                    for column in ARCHIVE_COLUMNS
+                ])
+        os.replace(tmp, path)
+
+    def _delete(self, ids: List[int], stats: Dict[str, Any]) -> None:
+        for start in range(0, len(ids), self.batch_size):
+            chunk = ids[start:start + self.batch_size]
+            with self.engine.begin() as conn:
+                conn.execute(delete(MarketData).where(MarketData.id.in_(chunk)))
+            stats['rowsDeleted'] += len(chunk)
+            stats['deleteBatches'] += 1
+            if self.pause:
+                time.sleep(self.pause)
+
+    def _vacuum(self) -> None:
+        """Let PostgreSQL reuse the freed space and refresh planner statistics"""
+        if self.engine.dialect.name != 'postgresql':
+            return
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM (ANALYZE) market_data"))
+
+    def _next_tick_minute(self, after: Optional[datetime], cutoff: datetime) -> datetime:
+        """Minute of the oldest tick at or after ``after``, or ``cutoff`` if there is none"""
+        stmt = select(func.min(MarketData.timestamp))
+        if after is not None:
+            stmt = stmt.where(MarketData.timestamp >= after)
+        with self.engine.connect() as conn:
+            oldest = conn.execute(stmt).scalar()
+        return min(_floor_minute(_utc(oldest)), cutoff) if oldest is not None else cutoff
+
+    def run(self, dry_run: bool = False, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Process every window older than the horizon
+
+        Args:
+            dry_run: Only count what would be rolled up and deleted
+            now: Reference time (defaults to the current time)
+
+        Returns:
+            Statistics dictionary
+        """
+        started = time.monotonic()
+        cutoff = _floor_minute((now or datetime.now(timezone.utc)) - self.horizon)
+        stats: Dict[str, Any] = {
+            'dryRun': dry_run,
+            'cutoff': cutoff.isoformat(),
+            'windows': 0,
+            'ticksScanned': 0,
+            'barsWritten': 0,
+            'rowsArchived': 0,
+            'rowsDeleted': 0,
+            'deleteBatches': 0,
+        }
+
+        # Windows are aligned to whole minutes so no bar straddles two of them
+        window_start = self._next_tick_minute(None, cutoff)
+        columns = MarketData.__table__.columns if self.archive_dir else [
+            MarketData.id, MarketData.symbol, MarketData.market, MarketData.timestamp, MarketData.price
+        ]
+
+        while window_start < cutoff:
+            window_end = min(window_start + self.window, cutoff)
+            with self.engine.connect() as conn:
+                ticks = conn.execute(
+                    select(*columns)
+                    .where(MarketData.timestamp >= window_start, MarketData.timestamp < window_end)
+                    .order_by(MarketData.timestamp, MarketData.id)
+                ).fetchall()
+
+            bars = rollup_ticks(ticks)
+            stats['windows'] += 1
+            stats['ticksScanned'] += len(ticks)
+            stats['barsWritten'] += len(bars)
+
+            if ticks and not dry_run:
+                with Session(self.engine) as db, db.begin():
+                    write_candles(db, bars, on_conflict='nothing')
+                if self.archive_dir:
+                    self._archive(window_start, ticks)
+                    stats['rowsArchived'] += len(ticks)
+                self._delete([t.id for t in ticks], stats)
+            elif dry_run:
+                stats['rowsDeleted'] += len(ticks)
+
+            # Skip over stretches without ticks
+            window_start = window_end if ticks else self._next_tick_minute(window_end, cutoff)
+
+        if stats['rowsDeleted'] and not dry_run:
+            vacuum_started = time.monotonic()
+            self._vacuum()
+            stats['vacuumMs'] = round((time.monotonic() - vacuum_started) * 1000, 1)
+
+        stats['elapsedMs'] = round((time.monotonic() - started) * 1000, 1)
+        logger.info(f"Tick retention {'dry run ' if dry_run else ''}complete: {stats}")
+        return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Roll up, archive and delete old market_data ticks")
+    parser.add_argument('--dry-run', action='store_true', help="Report without writing or deleting")
+    parser.add_argument('--horizon-hours', type=float, default=RETENTION_HORIZON_HOURS)
+    parser.add_argument('--batch-size', type=int, default=RETENTION_BATCH_SIZE)
+    parser.add_argument('--archive', action='store_true', default=ARCHIVE_ENABLED,
+                        help="Keep deleted rows as gzipped CSV")
+    parser.add_argument('--archive-dir', default=os.getenv("TICK_ARCHIVE_DIR", str(DEFAULT_ARCHIVE_DIR)))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from src.config.database import engine
+
+    stats = TickRetention(
+        engine,
+        horizon=timedelta(hours=args.horizon_hours),
+        batch_size=args.batch_size,
+        archive_dir=args.archive_dir if args.archive else None,
+    ).run(dry_run=args.dry_run)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Time-Series Storage Maintenance
+Partition upkeep and rollup refresh for ohlcv_data / market_data
+
+With TimescaleDB the hypertable, compression and continuous aggregate
+policies do this work inside the database. With native partitioning run this
+module periodically (e.g. hourly from cron):
+
+    python -m src.utils.timeseries
+"""
+from typing import Dict, Any
+from datetime import datetime, timedelta, timezone
+import logging
+import os
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ('ohlcv_data', 'market_data')
+
+# Rollup table per timeframe, built from 1m candles
+ROLLUP_TABLES = {'1h': 'ohlcv_1h', '1d': 'ohlcv_1d'}
+
+ROLLUP_1H_SQL = """
+INSERT INTO ohlcv_1h (symbol, market, bucket, open, high, low, close, volume)
+SELECT symbol, market, date_trunc('hour', timestamp, 'UTC') AS bucket,
+       (array_agg(open ORDER BY timestamp))[1],
+       max(high), min(low),
+       (array_agg(close ORDER BY timestamp DESC))[1],
+       sum(volume)
+FROM ohlcv_data
+WHERE timeframe = '1m' AND timestamp >= :since
+GROUP BY symbol, market, date_trunc('hour', timestamp, 'UTC')
+ON CONFLICT (symbol, market, bucket) DO UPDATE SET
+    open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low,
+    close = EXCLUDED.close, volume = EXCLUDED.volume
+"""
+
+ROLLUP_1D_SQL = """
+INSERT INTO ohlcv_1d (symbol, market, bucket, open, high, low, close, volume)
+SELECT symbol, market, date_trunc('day', bucket, 'UTC') AS day,
+       (array_agg(open ORDER BY bucket))[1],
+       max(high), min(low),
+       (array_agg(close ORDER BY bucket DESC))[1],
+       sum(volume)
+FROM ohlcv_1h
+WHERE bucket >= :since
+GROUP BY symbol, market, date_trunc('day', bucket, 'UTC')
+ON CONFLICT (symbol, market, bucket) DO UPDATE SET
+    open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low,
+    close = EXCLUDED.close, volume = EXCLUDED.volume
+"""
+
+
+def detect_layout(conn: Connection) -> str:
+    """
+    Storage layout of ohlcv_data
+
+    Returns:
+        'timescaledb', 'native' (declarative partitioning) or 'heap'
+    """
+    if conn.dialect.name != 'postgresql':
+        return 'heap'
+
+    if conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'")).scalar():
+        is_hypertable = conn.execute(text(
+            "SELECT 1 FROM timescaledb_information.hypertables WHERE hypertable_name = 'ohlcv_data'"
+        )).scalar()
+        if is_hypertable:
+            return 'timescaledb'
+
+    is_partitioned = conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('ohlcv_data')"
+    )).scalar()
+    return 'native' if is_partitioned else 'heap'
+
+
+def ensure_partitions(conn: Connection, months_ahead: int = 3) -> int:
+    """
+    Create monthly partitions up to ``months_ahead`` months from now
+
+    Rows outside every monthly partition land in the DEFAULT partition, so
+    a missed run degrades pruning rather than failing inserts.
+
+    Returns:
+        Number of partitions created
+    """
+    created = 0
+    for table in PARTITIONED_TABLES:
+        created += conn.execute(
+            text("SELECT buddy_ensure_partitions(:parent, now(), now() + make_interval(months => :months))"),
+            {'parent': table, 'months': months_ahead}
+        ).scalar() or 0
+    return created
+
+
+def refresh_rollups(conn: Connection, lookback: timedelta = timedelta(hours=48)) -> Dict[str, int]:
+    """
+    Recompute 1h and 1d rollup rows touched in the lookback window
+
+    Args:
+        conn: Connection (native layout)
+        lookback: How far back 1m candles may have changed
+
+    Returns:
+        Rows upserted per rollup table
+    """
+    since = datetime.now(timezone.utc) - lookback
+    hour_start = since.replace(minute=0, second=0, microsecond=0)
+    day_start = since.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    return {
+        'ohlcv_1h': conn.execute(text(ROLLUP_1H_SQL), {'since': hour_start}).rowcount,
+        'ohlcv_1d': conn.execute(text(ROLLUP_1D_SQL), {'since': day_start}).rowcount,
+    }
+
+
+def run_maintenance(months_ahead: int = 3, lookback_hours: int = 48) -> Dict[str, Any]:
+    """Partition upkeep and rollup refresh for the configured database"""
+    from src.config.database import engine
+
+    with engine.begin() as conn:
+        layout = detect_layout(conn)
+        if layout != 'native':
+            # TimescaleDB runs its own policies; plain heap tables have nothing to do
+            return {'layout': layout}
+
+        stats: Dict[str, Any] = {
+            'layout': layout,
+            'partitionsCreated': ensure_partitions(conn, months_ahead),
+        }
+        stats['rollups'] = refresh_rollups(conn, timedelta(hours=lookback_hours))
+
+    logger.info(f"Time-series maintenance complete: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_maintenance(
+        months_ahead=int(os.getenv("PARTITION_MONTHS_AHEAD", 3)),
+        lookback_hours=int(os.getenv("ROLLUP_LOOKBACK_HOURS", 48)),
+    )
@@ -0,0 +1,169 @@
+"""
+Request Phase Tracing
+Lightweight per-request spans reported in a Server-Timing header, and an
+admin-gated sampling profile of a single request
+
+Spans live in a context variable that is only set while tracing a request,
+so span() outside a traced request is a dictionary lookup and a no-op.
+"""
+from typing import List, Optional, Tuple
+from contextvars import ContextVar
+import hmac
+import os
+import re
+import time
+
+from src.utils.profiling import SamplingProfiler
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "False").lower() == "true"
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", 5))
+
+PROFILE_HEADER = b'x-profile-token'
+
+_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('request_spans', default=None)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Span:
+    __slots__ = ('name', 'spans', 'started')
+
+    def __init__(self, name: str, spans: List[Tuple[str, float]]):
+        self.name = name
+        self.spans = spans
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.spans.append((self.name, (time.perf_counter() - self.started) * 1000))
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str):
+    """
+    Time a phase of the current request
+
+    Usage:
+        with span('fetch'):
+            candles = binance_service.get_historical_klines(...)
+    """
+    spans = _spans.get()
+    if spans is None:
+        return _NULL_SPAN
+    return _Span(name, spans)
+
+
+def server_timing(spans: List[Tuple[str, float]]) -> str:
+    """
+    Format spans as a Server-Timing header value
+
+    Repeated names (e.g. one span per upstream call) are summed.
+    """
+    totals = {}
+    for name, duration in spans:
+        key = re.sub(r'[^A-Za-z0-9_\-]', '_', name)
+        totals[key] = totals.get(key, 0.0) + duration
+    return ', '.join(f"{name};dur={duration:.2f}" for name, duration in totals.items())
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware adding a Server-Timing header and on-demand profiles
+
+    A request carrying ``X-Profile-Token: <PROFILING_TOKEN>`` is run under
+    the sampling profiler and answered with the collapsed-stack profile
+    instead of its normal body (load it in speedscope or flamegraph.pl).
+    Profiling is off unless PROFILING_TOKEN is set.
+    """
+
+    def __init__(self, app, enabled: bool = SERVER_TIMING_ENABLED, profiling_token: str = PROFILING_TOKEN):
+        self.app = app
+        self.enabled = enabled
+        self.profiling_token = profiling_token
+
+    def _wants_profile(self, scope) -> bool:
+        if not self.profiling_token:
+            return False
+        for key, value in scope.get('headers', []):
+            if key == PROFILE_HEADER:
+                return hmac.compare_digest(value, self.profiling_token.encode('latin-1'))
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        if self._wants_profile(scope):
+            await self._profile(scope, receive, send)
+            return
+
+        if not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        spans: List[Tuple[str, float]] = []
+        token = _spans.set(spans)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                timing = server_timing(spans + [('total', (time.perf_counter() - started) * 1000)])
+                message = {**message, 'headers': list(message.get('headers', [])) + [
+                    (b'server-timing', timing.encode('latin-1'))
+                ]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _spans.reset(token)
+
+    async def _profile(self, scope, receive, send):
+        spans: List[Tuple[str, float]] = []
+        token = _spans.set(spans)
+        status = {'code': 500}
+
+        async def discard_body(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+
+        profiler = SamplingProfiler(interval=PROFILING_INTERVAL_MS / 1000)
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, discard_body)
+        finally:
+            profiler.stop()
+            _spans.reset(token)
+
+        spans.append(('total', (time.perf_counter() - started) * 1000))
+        body = profiler.collapsed().encode('utf-8')
+        filename = re.sub(r'[^A-Za-z0-9_\-]+', '_', scope['path']).strip('_') or 'root'
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/plain; charset=utf-8'),
+                (b'content-length', str(len(body)).encode('latin-1')),
+                (b'content-disposition', f'attachment; filename="{filename}.folded"'.encode('latin-1')),
+                (b'x-profiled-status', str(status['code']).encode('latin-1')),
+                (b'server-timing', server_timing(spans).encode('latin-1')),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
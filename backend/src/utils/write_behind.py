@@ -0,0 +1,247 @@
+"""
+Write-behind Persistence
+Buffers market observations from request handlers and bulk-inserts them in the background
+"""
+from typing import List, Optional, Dict, Any
+from datetime import datetime, timezone
+import queue
+import threading
+import time
+import os
+import logging
+
+from sqlalchemy import insert
+
+from src.config.database import SessionLocal
+from src.models.market import MarketData, MarketType
+from src.services.instrument_registry import instrument_registry
+from src.utils.candle_writer import OHLCV_KEY, upsert_candles_stmt
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """
+    Bounded queue of pending DB writes with a background flusher
+
+    Request handlers call enqueue_* and return immediately. A single flusher
+    thread drains the queue whenever ``batch_size`` rows are waiting or
+    ``flush_interval`` seconds have passed. When the queue is full the
+    ``overflow_policy`` decides what happens:
+
+    - ``drop_oldest``: evict the oldest pending row (default)
+    - ``drop_newest``: discard the row being enqueued
+    - ``block``: wait up to ``block_timeout`` seconds, then drop it
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        overflow_policy: str = 'drop_oldest',
+        block_timeout: float = 0.05
+    ):
+        """
+        Initialize write-behind queue
+
+        Args:
+            max_size: Maximum number of pending rows
+            batch_size: Rows per bulk insert
+            flush_interval: Maximum seconds a row waits before being flushed
+            overflow_policy: drop_oldest, drop_newest or block
+            block_timeout: Seconds to wait for space under the block policy
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self._queue: queue.Queue = queue.Queue(maxsize=max_size)
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, Any] = {
+            'enqueued': 0,
+            'dropped': 0,
+            'flushed_rows': 0,
+            'flushes': 0,
+            'failed_flushes': 0,
+            'last_flush_ms': 0.0,
+            'last_flush_rows': 0,
+        }
+
+    def _count(self, key: str, value: float = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def _put(self, item: tuple) -> None:
+        try:
+            if self.overflow_policy == 'block':
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            if self.overflow_policy != 'drop_oldest':
+                self._count('dropped')
+                return
+            try:
+                self._queue.get_nowait()
+                self._count('dropped')
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self._count('dropped')
+                return
+
+        self._count('enqueued')
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def enqueue_tick(self, symbol: str, market: MarketType, price_data: Dict[str, Any]) -> None:
+        """
+        Queue a price observation for the market_data table
+
+        Args:
+            symbol: Trading symbol
+            market: Market type enum
+            price_data: Price dictionary from a market service
+        """
+        self._put(('tick', {
+            'symbol': symbol,
+            'market': market,
+            'price': price_data['price'],
+            'open_price': price_data.get('open_price'),
+            'high': price_data.get('high'),
+            'low': price_data.get('low'),
+            'close': price_data.get('close'),
+            'volume': price_data.get('volume'),
+            'change_24h': price_data.get('change_24h'),
+            'change_percent_24h': price_data.get('change_percent_24h'),
+            'timestamp': datetime.now(timezone.utc),
+        }))
+
+    def enqueue_candles(self, symbol: str, market: MarketType, timeframe: str, candles: List[Dict[str, Any]]) -> None:
+        """
+        Queue OHLCV candles for the ohlcv_data table
+
+        Args:
+            symbol: Trading symbol
+            market: Market type enum
+            timeframe: Candle timeframe
+            candles: OHLCV dictionaries from a market service
+        """
+        for candle in candles:
+            self._put(('candle', {
+                'symbol': symbol,
+                'market': market,
+                'timeframe': timeframe,
+                'timestamp': candle['timestamp'],
+                'open': candle['open'],
+                'high': candle['high'],
+                'low': candle['low'],
+                'close': candle['close'],
+                'volume': candle['volume'],
+            }))
+
+    def _drain(self) -> List[tuple]:
+        items = []
+        while len(items) < self.batch_size:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def flush(self) -> int:
+        """
+        Write one batch of pending rows
+
+        Returns:
+            Number of rows written
+        """
+        items = self._drain()
+        if not items:
+            return 0
+
+        started = time.monotonic()
+        db = SessionLocal()
+        try:
+            # Instrument ids are resolved (and registered) before this session writes
+            instrument_registry.assign([row for _, row in items])
+            ticks = [row for kind, row in items if kind == 'tick']
+
+            # Deduplicate candles on the idx_ohlcv_instrument_lookup key, newest wins
+            candles: Dict[tuple, Dict[str, Any]] = {}
+            for kind, row in items:
+                if kind == 'candle':
+                    candles[tuple(row[k] for k in OHLCV_KEY)] = row
+
+            if ticks:
+                db.execute(insert(MarketData), ticks)
+            if candles:
+                db.execute(upsert_candles_stmt(db.get_bind().dialect.name), list(candles.values()))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self._count('failed_flushes')
+            self._count('dropped', len(items))
+            logger.warning(f"Write-behind flush of {len(items)} rows failed: {e}")
+            return 0
+        finally:
+            db.close()
+
+        written = len(ticks) + len(candles)
+        with self._stats_lock:
+            self.stats['flushes'] += 1
+            self.stats['flushed_rows'] += written
+            self.stats['last_flush_rows'] = written
+            self.stats['last_flush_ms'] = (time.monotonic() - started) * 1000
+        return written
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            while self.flush() >= self.batch_size:
+                pass
+
+    def start(self) -> None:
+        """Start the background flusher"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flusher and write whatever is still queued"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        while self.flush():
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get queue and flush statistics
+
+        Returns:
+            Statistics dictionary including current queue depth
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['queue_depth'] = self._queue.qsize()
+        return stats
+
+
+# Singleton instance
+write_behind = WriteBehindQueue(
+    max_size=int(os.getenv("WRITE_BEHIND_MAX_SIZE", 10000)),
+    batch_size=int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 500)),
+    flush_interval=float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", 1.0)),
+    overflow_policy=os.getenv("WRITE_BEHIND_OVERFLOW_POLICY", "drop_oldest")
+)
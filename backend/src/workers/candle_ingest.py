@@ -0,0 +1,460 @@
+"""
+Candle Ingest Daemon
+Keeps ohlcv_data warm by fetching each (symbol, timeframe) just after its
+candle closes, so history and indicator reads find closed candles stored
+instead of going upstream
+
+Usage:
+    python -m src.workers.candle_ingest
+
+Each schedule fires at its next candle close plus CANDLE_INGEST_SETTLE
+seconds and a random jitter (so a minute boundary doesn't send every symbol
+upstream at once). Due schedules are worked in priority order (shorter
+timeframes first, then symbol list order) by CANDLE_INGEST_CONCURRENCY
+asyncio workers, each waiting on its provider's request budget. Failed
+fetches back off exponentially. Fetched candles go through one writer task,
+which is the only thing holding a database connection.
+
+Prometheus metrics (lag, fetch outcomes, heartbeat, queue depth) are served
+on CANDLE_INGEST_METRICS_PORT.
+"""
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime, timedelta, timezone
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import signal
+import time
+
+from prometheus_client import start_http_server
+from sqlalchemy import select
+
+from src.config.database import SessionLocal
+from src.models.market import OHLCV, MarketType
+from src.services.binance_service import binance_service
+from src.services.stocks_service import stocks_service
+from src.services.candle_store import candle_store_service, split_forming, TIMEFRAME_DELTAS
+from src.services.instrument_registry import instrument_registry
+from src.utils.candle_writer import candle_rows, write_candles
+from src.utils.metrics import (
+    INGEST_FETCHES, INGEST_CANDLES_WRITTEN, INGEST_LAG, INGEST_HEARTBEAT, INGEST_QUEUE_DEPTH
+)
+from src.workers.price_ingest import _symbols_from_env
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = int(os.getenv("CANDLE_INGEST_CONCURRENCY", 8))
+SETTLE_SECONDS = float(os.getenv("CANDLE_INGEST_SETTLE", 2.0))
+JITTER_SECONDS = float(os.getenv("CANDLE_INGEST_JITTER", 5.0))
+BACKFILL_CANDLES = int(os.getenv("CANDLE_INGEST_BACKFILL", 1000))
+BACKOFF_BASE = float(os.getenv("CANDLE_INGEST_BACKOFF_BASE", 5.0))
+BACKOFF_MAX = float(os.getenv("CANDLE_INGEST_BACKOFF_MAX", 600.0))
+WRITE_BATCH = int(os.getenv("CANDLE_INGEST_WRITE_BATCH", 5000))
+STATS_INTERVAL = float(os.getenv("CANDLE_INGEST_STATS_INTERVAL", 60.0))
+
+# Requests per second and burst per provider. Binance allows 6000 request
+# weight a minute per IP (klines cost 2-10); yfinance has no published limit.
+PROVIDER_BUDGETS = {
+    'binance': (float(os.getenv("CANDLE_INGEST_BINANCE_RPS", 10.0)), int(os.getenv("CANDLE_INGEST_BINANCE_BURST", 20))),
+    'yfinance': (float(os.getenv("CANDLE_INGEST_YFINANCE_RPS", 1.0)), int(os.getenv("CANDLE_INGEST_YFINANCE_BURST", 2))),
+}
+
+# Largest klines page; a full page means the schedule is still catching up
+BINANCE_PAGE = 1000
+
+# Binance weekly candles open on Monday; the Unix epoch was a Thursday
+GRID_OFFSETS = {'1w': timedelta(days=4)}
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def next_close(timeframe: str, now: datetime) -> datetime:
+    """Close time of the candle forming at ``now`` on the UTC-aligned grid"""
+    step = TIMEFRAME_DELTAS[timeframe]
+    offset = GRID_OFFSETS.get(timeframe, timedelta(0))
+    elapsed = (now - EPOCH - offset) // step
+    return EPOCH + offset + (elapsed + 1) * step
+
+
+class RateBudget:
+    """Token bucket shared by all fetches to one provider"""
+
+    def __init__(self, rate: float, burst: int):
+        """
+        Args:
+            rate: Requests per second
+            burst: Requests allowed back to back after an idle period
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Schedule:
+    """Fetch state of one (symbol, market, timeframe)"""
+
+    __slots__ = ('symbol', 'market', 'timeframe', 'priority', 'last_open', 'queued_open',
+                 'failures', 'catching_up', 'last_success', 'last_error')
+
+    def __init__(self, symbol: str, market: MarketType, timeframe: str, priority: Tuple[int, int]):
+        self.symbol = symbol
+        self.market = market
+        self.timeframe = timeframe
+        self.priority = priority
+        # Open time of the newest candle in ohlcv_data (advanced by the writer)
+        self.last_open: Optional[datetime] = None
+        # Open time of the newest candle handed to the writer, so catch-up
+        # fetches don't wait for the write to land
+        self.queued_open: Optional[datetime] = None
+        self.failures = 0
+        self.catching_up = True
+        self.last_success: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def provider(self) -> str:
+        return 'binance' if self.market == MarketType.CRYPTO else 'yfinance'
+
+    def lag(self, now: datetime) -> Optional[float]:
+        """Seconds since the newest stored candle closed"""
+        if self.last_open is None:
+            return None
+        return max((now - self.last_open - TIMEFRAME_DELTAS[self.timeframe]).total_seconds(), 0.0)
+
+
+class CandleIngestor:
+    """Schedules, fetches and stores closed candles until stopped"""
+
+    def __init__(
+        self,
+        crypto_symbols: Optional[List[str]] = None,
+        stock_symbols: Optional[List[str]] = None,
+        crypto_timeframes: Optional[List[str]] = None,
+        stock_timeframes: Optional[List[str]] = None,
+        concurrency: int = CONCURRENCY
+    ):
+        crypto_symbols = crypto_symbols or binance_service.POPULAR_SYMBOLS
+        stock_symbols = stock_symbols or (stocks_service.INDIAN_STOCKS + stocks_service.US_STOCKS)
+        crypto_timeframes = crypto_timeframes or ['1m', '5m', '15m', '1h', '4h', '1d']
+        stock_timeframes = stock_timeframes or ['1h', '1d']
+        ranks = {tf: i for i, tf in enumerate(TIMEFRAME_DELTAS)}
+
+        self.schedules: List[Schedule] = []
+        for market, symbols, timeframes in (
+            (MarketType.CRYPTO, crypto_symbols, crypto_timeframes),
+            (MarketType.STOCK, stock_symbols, stock_timeframes),
+        ):
+            for timeframe in timeframes:
+                if timeframe not in TIMEFRAME_DELTAS:
+                    raise ValueError(f"Unsupported timeframe: {timeframe}")
+                for index, symbol in enumerate(symbols):
+                    self.schedules.append(Schedule(symbol, market, timeframe, (ranks[timeframe], index)))
+
+        self.concurrency = concurrency
+        self.budgets = {name: RateBudget(rate, burst) for name, (rate, burst) in PROVIDER_BUDGETS.items()}
+        self._seq = itertools.count()
+        self._timers: List[Tuple[float, int, Schedule]] = []
+        self._ready: Optional[asyncio.PriorityQueue] = None
+        self._writes: Optional[asyncio.Queue] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._heartbeat = 0.0
+        self.stats: Dict[str, Any] = {
+            'fetches': 0,
+            'fetch_errors': 0,
+            'candles_fetched': 0,
+            'candles_written': 0,
+            'writes': 0,
+            'write_errors': 0,
+        }
+
+    # Scheduling
+
+    def _due_at(self, schedule: Schedule, now: datetime) -> float:
+        """Unix time to fetch next: right away while catching up, else after the next close"""
+        if schedule.failures:
+            delay = min(BACKOFF_BASE * 2 ** (schedule.failures - 1), BACKOFF_MAX)
+            return now.timestamp() + delay * random.uniform(0.5, 1.0)
+        if schedule.catching_up:
+            return now.timestamp() + random.uniform(0, 1)
+
+        step = TIMEFRAME_DELTAS[schedule.timeframe]
+        close = next_close(schedule.timeframe, now)
+        if schedule.last_open is not None and now < schedule.last_open + 2 * step < close:
+            # The provider's grid isn't UTC-aligned (stock sessions): follow the stored candles
+            close = schedule.last_open + 2 * step
+        jitter = random.uniform(0, min(JITTER_SECONDS, step.total_seconds() / 10))
+        return close.timestamp() + SETTLE_SECONDS + jitter
+
+    def _schedule(self, schedule: Schedule) -> None:
+        due = self._due_at(schedule, datetime.now(timezone.utc))
+        heapq.heappush(self._timers, (due, next(self._seq), schedule))
+        self._wakeup.set()
+
+    async def _dispatch(self) -> None:
+        """Move due schedules onto the ready queue, in priority order"""
+        while not self._stop.is_set():
+            now = time.time()
+            while self._timers and self._timers[0][0] <= now:
+                due, seq, schedule = heapq.heappop(self._timers)
+                self._ready.put_nowait((schedule.priority, due, seq, schedule))
+
+            self._heartbeat = now
+            INGEST_HEARTBEAT.set(now)
+            INGEST_QUEUE_DEPTH.labels('ready').set(self._ready.qsize())
+            INGEST_QUEUE_DEPTH.labels('write').set(self._writes.qsize())
+
+            timeout = min(self._timers[0][0] - now, 1.0) if self._timers else 1.0
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    # Fetching
+
+    async def _work(self) -> None:
+        while True:
+            _, _, _, schedule = await self._ready.get()
+            try:
+                await self.fetch(schedule)
+            finally:
+                self._ready.task_done()
+
+    async def fetch(self, schedule: Schedule) -> None:
+        """Fetch closed candles after the newest stored one and queue them for the writer"""
+        now = datetime.now(timezone.utc)
+        step = TIMEFRAME_DELTAS[schedule.timeframe]
+        start = schedule.queued_open or schedule.last_open or now - step * BACKFILL_CANDLES
+
+        await self.budgets[schedule.provider].acquire()
+        self.stats['fetches'] += 1
+        try:
+            fetched = await asyncio.to_thread(
+                candle_store_service.fetch_upstream,
+                schedule.symbol, schedule.market, schedule.timeframe, start, now + step
+            )
+        except Exception as e:
+            schedule.failures += 1
+            schedule.last_error = str(e)
+            self.stats['fetch_errors'] += 1
+            INGEST_FETCHES.labels(schedule.provider, 'error').inc()
+            logger.warning(
+                f"Ingest fetch failed for {schedule.symbol} {schedule.timeframe} "
+                f"(attempt {schedule.failures}): {e}"
+            )
+            self._schedule(schedule)
+            return
+
+        INGEST_FETCHES.labels(schedule.provider, 'ok').inc()
+        schedule.failures = 0
+        schedule.last_success = now
+        schedule.catching_up = schedule.market == MarketType.CRYPTO and len(fetched) >= BINANCE_PAGE - 1
+
+        closed, _ = split_forming(fetched, schedule.timeframe, now)
+        self.stats['candles_fetched'] += len(closed)
+        if closed:
+            schedule.queued_open = closed[-1]['timestamp']
+            await self._writes.put((schedule, closed))
+        self._schedule(schedule)
+
+    # Writing
+
+    async def _write_loop(self) -> None:
+        """The single database writer: drains queued candles in batches"""
+        while True:
+            batch = [await self._writes.get()]
+            size = len(batch[0][1])
+            while size < WRITE_BATCH and not self._writes.empty():
+                item = self._writes.get_nowait()
+                batch.append(item)
+                size += len(item[1])
+            try:
+                await asyncio.to_thread(self._write, batch)
+            finally:
+                for _ in batch:
+                    self._writes.task_done()
+
+    def _write(self, batch: List[Tuple[Schedule, List[Dict[str, Any]]]]) -> None:
+        # Instrument ids are resolved (and registered) before this session writes
+        rows = []
+        for schedule, candles in batch:
+            rows.extend(candle_rows(schedule.symbol, schedule.market, schedule.timeframe, candles))
+
+        db = SessionLocal()
+        try:
+            write_candles(db, rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.stats['write_errors'] += 1
+            # Rewind so the next fetch covers these candles again
+            for schedule, _ in batch:
+                schedule.queued_open = schedule.last_open
+            logger.error(f"Ingest write of {len(rows)} candles failed: {e}")
+            return
+        finally:
+            db.close()
+
+        self.stats['writes'] += 1
+        self.stats['candles_written'] += len(rows)
+        for schedule, candles in batch:
+            newest = candles[-1]['timestamp']
+            if schedule.last_open is None or newest > schedule.last_open:
+                schedule.last_open = newest
+            INGEST_CANDLES_WRITTEN.labels(schedule.market.value, schedule.timeframe).inc(len(candles))
+
+    # Health
+
+    def _load_positions(self) -> None:
+        """Newest stored candle per schedule (one probe of idx_ohlcv_instrument_lookup each)"""
+        ids = {
+            key: instrument_registry.get_id(*key)
+            for key in {(s.symbol, s.market) for s in self.schedules}
+        }
+        db = SessionLocal()
+        try:
+            for schedule in self.schedules:
+                newest = db.execute(
+                    select(OHLCV.timestamp)
+                    .where(OHLCV.instrument_id == ids[(schedule.symbol, schedule.market)],
+                           OHLCV.timeframe == schedule.timeframe)
+                    .order_by(OHLCV.timestamp.desc())
+                    .limit(1)
+                ).scalar()
+                if newest is not None:
+                    schedule.last_open = newest if newest.tzinfo else newest.replace(tzinfo=timezone.utc)
+        finally:
+            db.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Health and lag summary
+
+        Returns:
+            Counters, queue depths, worst lag per (market, timeframe) and
+            the schedules currently failing
+        """
+        now = datetime.now(timezone.utc)
+        lag: Dict[str, float] = {}
+        for schedule in self.schedules:
+            value = schedule.lag(now)
+            if value is not None:
+                key = f"{schedule.market.value}:{schedule.timeframe}"
+                lag[key] = max(lag.get(key, 0.0), value)
+
+        return {
+            **self.stats,
+            'healthy': self._heartbeat > 0 and time.time() - self._heartbeat < 30,
+            'schedules': len(self.schedules),
+            'ready': self._ready.qsize() if self._ready else 0,
+            'pending_writes': self._writes.qsize() if self._writes else 0,
+            'catching_up': sum(s.catching_up for s in self.schedules),
+            'lag_seconds': lag,
+            'failing': {
+                f"{s.symbol}:{s.timeframe}": {'failures': s.failures, 'error': s.last_error}
+                for s in self.schedules if s.failures
+            },
+        }
+
+    async def _report(self) -> None:
+        """Refresh the lag gauges every few seconds and log a summary every STATS_INTERVAL"""
+        logged = time.monotonic()
+        while True:
+            stats = self.get_stats()
+            for key, value in stats['lag_seconds'].items():
+                INGEST_LAG.labels(*key.split(':')).set(value)
+            if STATS_INTERVAL > 0 and time.monotonic() - logged >= STATS_INTERVAL:
+                logged = time.monotonic()
+                logger.info(
+                    f"Ingest: {stats['fetches']} fetches ({stats['fetch_errors']} failed), "
+                    f"{stats['candles_written']} candles written, {stats['catching_up']} catching up, "
+                    f"{len(stats['failing'])} failing, "
+                    f"worst lag {max(stats['lag_seconds'].values(), default=0):.0f}s"
+                )
+            await asyncio.sleep(5)
+
+    # Lifecycle
+
+    async def run(self) -> None:
+        """Run until stop() is called, then flush fetched candles"""
+        self._ready = asyncio.PriorityQueue()
+        self._writes = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._stop = asyncio.Event()
+
+        await asyncio.to_thread(self._load_positions)
+        for schedule in self.schedules:
+            self._schedule(schedule)
+
+        writer = asyncio.create_task(self._write_loop(), name="ingest-writer")
+        tasks = [
+            asyncio.create_task(self._work(), name=f"ingest-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        tasks.append(asyncio.create_task(self._report(), name="ingest-report"))
+        logger.info(
+            f"Candle ingest running: {len(self.schedules)} schedules, "
+            f"{self.concurrency} workers"
+        )
+
+        await self._dispatch()
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._writes.join()
+        writer.cancel()
+        await asyncio.gather(writer, return_exceptions=True)
+
+    def stop(self) -> None:
+        """Stop scheduling; run() returns once queued writes are stored"""
+        if self._stop is not None:
+            self._stop.set()
+            self._wakeup.set()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    ingestor = CandleIngestor(
+        crypto_symbols=_symbols_from_env("CANDLE_INGEST_CRYPTO_SYMBOLS", binance_service.POPULAR_SYMBOLS),
+        stock_symbols=_symbols_from_env(
+            "CANDLE_INGEST_STOCK_SYMBOLS", stocks_service.INDIAN_STOCKS + stocks_service.US_STOCKS
+        ),
+        crypto_timeframes=_symbols_from_env("CANDLE_INGEST_CRYPTO_TIMEFRAMES", ['1m', '5m', '15m', '1h', '4h', '1d']),
+        stock_timeframes=_symbols_from_env("CANDLE_INGEST_STOCK_TIMEFRAMES", ['1h', '1d']),
+    )
+
+    port = int(os.getenv("CANDLE_INGEST_METRICS_PORT", 9108))
+    if port:
+        start_http_server(port)
+
+    async def serve():
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, ingestor.stop)
+        loop.add_signal_handler(signal.SIGINT, ingestor.stop)
+        await ingestor.run()
+
+    asyncio.run(serve())
+    logger.info("Candle ingest stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Price Board Ingest Process
+The single upstream poller for multi-worker deployments: writes the latest
+ticker, top of book and forming candle per symbol into the shared-memory
+price board that every API worker reads
+
+Usage:
+    python -m src.workers.price_ingest
+
+Run one instance per host alongside the API workers, which need
+PRICE_BOARD_ENABLED=True to read from the board.
+"""
+from typing import List, Optional
+from datetime import timezone
+import logging
+import os
+import signal
+import threading
+import time
+
+from src.services.binance_service import binance_service
+from src.services.stocks_service import stocks_service
+from src.utils.price_board import PriceBoard, BOARD_NAME, BOARD_CAPACITY, encode_symbol
+from src.utils.candle_files import CandleFileStore
+
+logger = logging.getLogger(__name__)
+
+
+def _symbols_from_env(name: str, default: List[str]) -> List[str]:
+    value = os.getenv(name, "")
+    return [s.strip() for s in value.split(",") if s.strip()] or list(default)
+
+
+def _board_symbols(symbols: List[str]) -> List[str]:
+    """Symbols that fit a price board slot; the rest are logged and skipped"""
+    accepted = []
+    for symbol in symbols:
+        try:
+            encode_symbol(symbol)
+        except ValueError as e:
+            logger.warning(f"Not publishing {symbol}: {e}")
+            continue
+        accepted.append(symbol)
+    return accepted
+
+
+class PriceIngestor:
+    """Polls upstream providers in bulk and publishes to the price board"""
+
+    def __init__(
+        self,
+        board: PriceBoard,
+        crypto_symbols: Optional[List[str]] = None,
+        stock_symbols: Optional[List[str]] = None,
+        crypto_interval: float = 1.0,
+        candle_interval: float = 5.0,
+        stock_interval: float = 15.0,
+        candle_timeframe: str = '1m',
+        candle_files: Optional[CandleFileStore] = None
+    ):
+        self.board = board
+        # Closed candles are appended here when set (this process is the single writer)
+        self.candle_files = candle_files
+        self.crypto_symbols = _board_symbols(crypto_symbols or binance_service.POPULAR_SYMBOLS)
+        self.stock_symbols = _board_symbols(stock_symbols or (stocks_service.INDIAN_STOCKS + stocks_service.US_STOCKS))
+        self.intervals = {
+            'crypto': crypto_interval,
+            'candles': candle_interval,
+            'stocks': stock_interval,
+        }
+        self.candle_timeframe = candle_timeframe
+        self._stop = threading.Event()
+
+    def poll_crypto(self) -> None:
+        """One bulk ticker call and one bulk book ticker call for all crypto symbols"""
+        tickers = binance_service.get_prices(self.crypto_symbols)
+        try:
+            books = binance_service.get_book_tickers(self.crypto_symbols)
+        except Exception as e:
+            logger.warning(f"Book ticker poll failed: {e}")
+            books = {}
+
+        for symbol, ticker in tickers.items():
+            values = {
+                'price': ticker['price'],
+                'open_price': ticker['open_price'],
+                'high': ticker['high'],
+                'low': ticker['low'],
+                'volume': ticker['volume'],
+                'change_24h': ticker['change_24h'],
+                'change_percent_24h': ticker['change_percent_24h'],
+                'ticker_ts': ticker['timestamp'],
+            }
+            if symbol in books:
+                values.update(books[symbol])
+                values['book_ts'] = time.time() * 1000
+            self.board.write(symbol, 'crypto', values)
+
+    def poll_candles(self) -> None:
+        """Latest (forming) candle per crypto symbol, plus the last closed one for candle files"""
+        limit = 2 if self.candle_files else 1
+        for symbol in self.crypto_symbols:
+            try:
+                candles = binance_service.get_historical_klines(symbol, interval=self.candle_timeframe, limit=limit)
+            except Exception as e:
+                logger.warning(f"Candle poll failed for {symbol}: {e}")
+                continue
+            if not candles:
+                continue
+            if self.candle_files and len(candles) > 1:
+                try:
+                    # Klines carry naive local times; candle files treat naive values as UTC
+                    closed = [{**c, 'timestamp': c['timestamp'].astimezone(timezone.utc)} for c in candles[:-1]]
+                    self.candle_files.writer('crypto', symbol, self.candle_timeframe).append(closed)
+                except Exception as e:
+                    logger.warning(f"Candle file append failed for {symbol}: {e}")
+            candle = candles[-1]
+            self.board.write(symbol, 'crypto', {
+                'candle_open_time': candle['timestamp'].timestamp() * 1000,
+                'candle_open': candle['open'],
+                'candle_high': candle['high'],
+                'candle_low': candle['low'],
+                'candle_close': candle['close'],
+                'candle_volume': candle['volume'],
+            })
+
+    def poll_stocks(self) -> None:
+        """Batched stock quotes through the provider router"""
+        batch = stocks_service.get_prices(self.stock_symbols)
+        for symbol, quote in batch['results'].items():
+            self.board.write(symbol, 'stock', {
+                'price': quote['price'],
+                'open_price': quote.get('open_price'),
+                'high': quote.get('high'),
+                'low': quote.get('low'),
+                'volume': quote.get('volume'),
+                'change_24h': quote.get('change_24h'),
+                'change_percent_24h': quote.get('change_percent_24h'),
+                'ticker_ts': quote.get('timestamp'),
+            })
+        for symbol, error in batch['errors'].items():
+            logger.warning(f"Stock poll failed for {symbol}: {error}")
+
+    def _loop(self, name: str, poll) -> None:
+        interval = self.intervals[name]
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                poll()
+            except Exception as e:
+                logger.error(f"Price ingest {name} poll failed: {e}")
+            self._stop.wait(max(interval - (time.monotonic() - started), 0))
+
+    def run(self) -> None:
+        """Run all pollers until stop() is called"""
+        threads = [
+            threading.Thread(target=self._loop, args=(name, poll), name=f"ingest-{name}", daemon=True)
+            for name, poll in (
+                ('crypto', self.poll_crypto),
+                ('candles', self.poll_candles),
+                ('stocks', self.poll_stocks),
+            )
+            if self.intervals[name] > 0
+        ]
+        for thread in threads:
+            thread.start()
+        logger.info(
+            f"Price ingest running: {len(self.crypto_symbols)} crypto, "
+            f"{len(self.stock_symbols)} stock symbols"
+        )
+        self._stop.wait()
+        for thread in threads:
+            thread.join(timeout=5)
+
+    def stop(self) -> None:
+        """Stop the pollers"""
+        self._stop.set()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    board = PriceBoard.create(BOARD_NAME, BOARD_CAPACITY)
+    ingestor = PriceIngestor(
+        board,
+        crypto_symbols=_symbols_from_env("PRICE_INGEST_CRYPTO_SYMBOLS", binance_service.POPULAR_SYMBOLS),
+        stock_symbols=_symbols_from_env(
+            "PRICE_INGEST_STOCK_SYMBOLS", stocks_service.INDIAN_STOCKS + stocks_service.US_STOCKS
+        ),
+        crypto_interval=float(os.getenv("PRICE_INGEST_CRYPTO_POLL", 1.0)),
+        candle_interval=float(os.getenv("PRICE_INGEST_CANDLE_POLL", 5.0)),
+        stock_interval=float(os.getenv("PRICE_INGEST_STOCK_POLL", 15.0)),
+        candle_files=CandleFileStore() if os.getenv("CANDLE_FILES_LIVE", "False").lower() == "true" else None,
+    )
+
+    signal.signal(signal.SIGTERM, lambda *_: ingestor.stop())
+    signal.signal(signal.SIGINT, lambda *_: ingestor.stop())
+    try:
+        ingestor.run()
+    finally:
+        board.close()
+        logger.info("Price board removed")
+
+
+if __name__ == "__main__":
+    main()
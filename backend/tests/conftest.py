@@ -0,0 +1,21 @@
+"""
+Shared test setup: every test runs offline against a scratch SQLite database
+
+DATABASE_URL is read when src.config.database is imported, so it is set
+here, before any test module imports the application.
+"""
+import os
+import sys
+import tempfile
+
+from binance.client import Client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_dir = tempfile.mkdtemp(prefix="buddy-ai-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.setdefault("REALTIME_ENABLED", "False")
+
+# The Binance client pings the API when binance_service is imported
+Client.ping = lambda self: {}
@@ -0,0 +1,195 @@
+"""
+PriceBoard: a reader process never sees a half-written slot, readers retry
+while the seqlock is held, and BoardReader follows a restarted ingest
+process to its new board
+"""
+import multiprocessing
+import time
+import uuid
+
+import pytest
+
+from src.utils.price_board import PriceBoard, BoardReader, FIELDS, SYMBOL_SIZE
+
+pytestmark = pytest.mark.skipif(
+    'fork' not in multiprocessing.get_all_start_methods(),
+    reason="writer processes are forked",
+)
+
+# Written together, so a consistent read has them all equal
+LOCKSTEP_FIELDS = tuple(f for f in FIELDS if f != 'updated_at')
+WRITE_SECONDS = 0.5
+
+
+@pytest.fixture
+def board_name():
+    return f"buddy_test_{uuid.uuid4().hex[:12]}"
+
+
+def _write_lockstep(name: str, ready, go) -> None:
+    board = PriceBoard.attach(name)
+    board.write('BTCUSDT', 'crypto', {field: 0 for field in LOCKSTEP_FIELDS})
+    ready.set()
+    go.wait()
+    i = 0
+    deadline = time.monotonic() + WRITE_SECONDS
+    while time.monotonic() < deadline:
+        i += 1
+        board.write('BTCUSDT', 'crypto', {field: i for field in LOCKSTEP_FIELDS})
+    board.write('BTCUSDT', 'crypto', {field: -1 for field in LOCKSTEP_FIELDS})
+    board.close()
+
+
+def _hold_seqlock(name: str, held, release, done) -> None:
+    board = PriceBoard.attach(name)
+    slot = board._slot_for_read('BTCUSDT', 'crypto')
+    board._seq[slot] += 1
+    board._values[slot, 0] = 2.0  # Half of a price/high update
+    held.set()
+    release.wait()
+    board._values[slot, FIELDS.index('high')] = 2.0
+    board._seq[slot] += 1
+    done.set()
+    board.close()
+
+
+def _run_ingest(name: str, price: float, ready, done) -> None:
+    board = PriceBoard.create(name, capacity=8)
+    board.write('BTCUSDT', 'crypto', {'price': price})
+    ready.set()
+    done.wait()
+    board.close()
+
+
+def test_reader_process_never_sees_torn_slot(board_name):
+    ctx = multiprocessing.get_context('fork')
+    board = PriceBoard.create(board_name, capacity=8)
+    ready, go = ctx.Event(), ctx.Event()
+    writer = ctx.Process(target=_write_lockstep, args=(board_name, ready, go))
+    writer.start()
+    try:
+        assert ready.wait(10)
+        go.set()
+        reads = 0
+        while writer.is_alive() or reads == 0:
+            entry = board.read('BTCUSDT', 'crypto', retries=1000)
+            if entry is None:
+                continue
+            assert len({entry[field] for field in LOCKSTEP_FIELDS}) == 1, entry
+            reads += 1
+        writer.join(10)
+        assert writer.exitcode == 0
+        assert board.read('BTCUSDT', 'crypto')['price'] == -1
+    finally:
+        if writer.is_alive():
+            writer.terminate()
+        board.close()
+
+
+def test_reader_process_waits_out_a_held_seqlock(board_name):
+    ctx = multiprocessing.get_context('fork')
+    board = PriceBoard.create(board_name, capacity=8)
+    board.write('BTCUSDT', 'crypto', {'price': 1.0, 'high': 1.0})
+    held, release, done = ctx.Event(), ctx.Event(), ctx.Event()
+    writer = ctx.Process(target=_hold_seqlock, args=(board_name, held, release, done))
+    writer.start()
+    try:
+        assert held.wait(10)
+        # The half-written slot (price 2, high 1) is never returned
+        assert board.read('BTCUSDT', 'crypto', retries=5) is None
+        release.set()
+        assert done.wait(10)
+        entry = board.read('BTCUSDT', 'crypto')
+        assert (entry['price'], entry['high']) == (2.0, 2.0)
+    finally:
+        release.set()
+        writer.join(10)
+        board.close()
+
+
+class _RacingValues:
+    """Values array whose row copy overlaps a completed write `races` times"""
+
+    def __init__(self, board: PriceBoard, races: int):
+        self.board = board
+        self.values = board._values
+        self.races = races
+        self.copies = 0
+
+    def __getitem__(self, slot):
+        self.copies += 1
+        if self.races:
+            self.races -= 1
+            self.board._seq[slot] += 2
+        return self.values[slot]
+
+
+def test_read_retries_while_slot_is_written(board_name):
+    board = PriceBoard.create(board_name, capacity=8)
+    try:
+        board.write('ETHUSDT', 'crypto', {'price': 10.0})
+        slot = board._slot_for_read('ETHUSDT', 'crypto')
+
+        board._seq[slot] += 1  # Writer holds the slot
+        assert board.read('ETHUSDT', 'crypto', retries=3) is None
+        board._seq[slot] += 1
+        assert board.read('ETHUSDT', 'crypto', retries=3)['price'] == 10.0
+
+        values = board._values
+        racing = _RacingValues(board, races=2)
+        board._values = racing
+        try:
+            assert board.read('ETHUSDT', 'crypto')['price'] == 10.0
+        finally:
+            board._values = values
+        assert racing.copies == 3
+    finally:
+        board.close()
+
+
+def test_symbol_longer_than_slot_is_rejected(board_name):
+    board = PriceBoard.create(board_name, capacity=8)
+    try:
+        with pytest.raises(ValueError):
+            board.write('X' * (SYMBOL_SIZE + 1), 'crypto', {'price': 1.0})
+        board.write('X' * SYMBOL_SIZE, 'crypto', {'price': 1.0})
+        assert board.symbols() == [('crypto', 'X' * SYMBOL_SIZE)]
+    finally:
+        board.close()
+
+
+def test_reader_reattaches_after_ingest_restart(board_name):
+    ctx = multiprocessing.get_context('fork')
+    first_ready, first_done = ctx.Event(), ctx.Event()
+    second_ready, second_done = ctx.Event(), ctx.Event()
+    first = ctx.Process(target=_run_ingest, args=(board_name, 1.0, first_ready, first_done))
+    second = ctx.Process(target=_run_ingest, args=(board_name, 2.0, second_ready, second_done))
+    reader = BoardReader(enabled=True, name=board_name, max_age=60)
+
+    first.start()
+    try:
+        assert first_ready.wait(10)
+        old_board = reader.board()
+        assert reader.get_quote('BTCUSDT', 'crypto')['price'] == 1.0
+        assert old_board.generation != 0
+
+        # The new ingest process retires the old segment before the old one exits
+        second.start()
+        assert second_ready.wait(10)
+        assert old_board.generation == 0
+        assert reader.get_quote('BTCUSDT', 'crypto')['price'] == 2.0
+        assert reader.board() is not old_board
+
+        # The retired writer shutting down leaves the new board in place
+        first_done.set()
+        first.join(10)
+        assert first.exitcode == 0
+        attached = PriceBoard.attach(board_name)
+        assert attached.read('BTCUSDT', 'crypto')['price'] == 2.0
+        attached.close()
+    finally:
+        first_done.set()
+        second_done.set()
+        for process in (first, second):
+            if process.pid is not None:
+                process.join(10)
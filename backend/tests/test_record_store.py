@@ -0,0 +1,176 @@
+"""
+RecordStoreService: each query's plan uses its index, and rows saved
+through the ORM are found by the instrument_id lookups
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event, insert, text
+from sqlalchemy.orm import Session
+
+from src.config.database import Base, engine
+from src.config.async_database import LazyAsyncSession, async_engine
+from src.models.market import Instrument, MarketType
+from src.models.prediction import Prediction, ModelType, PredictionDirection
+from src.models.user import User
+from src.models.watchlist import Alert, AlertType, AlertCondition, Position
+from src.services.instrument_registry import instrument_registry
+from src.services.record_store import record_store_service
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+SYMBOLS = 10
+ROWS = 4000
+
+
+def symbol_name(i: int) -> str:
+    return f"REC{i}USDT"
+
+
+def run(coro):
+    return asyncio.run(_run_and_dispose(coro))
+
+
+async def _run_and_dispose(coro):
+    # Each asyncio.run gets a new loop, so pooled aiosqlite connections can't be reused
+    try:
+        return await coro
+    finally:
+        await async_engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    """ROWS predictions and ROWS / 2 alerts and positions over SYMBOLS instruments"""
+    Base.metadata.create_all(engine, tables=[
+        User.__table__, Instrument.__table__, Prediction.__table__, Alert.__table__, Position.__table__
+    ])
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{'email': 'records@example.com', 'username': 'records', 'hashed_password': 'x'}])
+        user_id = conn.execute(text("SELECT id FROM users WHERE username = 'records'")).scalar()
+    instrument_ids = [instrument_registry.get_id(symbol_name(s), MarketType.CRYPTO) for s in range(SYMBOLS)]
+    models = list(ModelType)
+
+    predictions, alerts, positions = [], [], []
+    for i in range(ROWS):
+        s = i % SYMBOLS
+        created = START + timedelta(minutes=i)
+        predictions.append({
+            'instrument_id': instrument_ids[s], 'symbol': symbol_name(s), 'market': 'crypto',
+            'model': models[i % len(models)], 'current_price': 100.0, 'predicted_price': 101.0,
+            'direction': PredictionDirection.BUY, 'confidence': 0.6, 'timeframe': '1h', 'horizon_hours': 4,
+            'created_at': created, 'prediction_for': created + timedelta(hours=4),
+            'evaluated_at': created + timedelta(hours=5) if i < ROWS * 0.98 else None,
+        })
+        if i % 2 == 0:
+            alerts.append({
+                'user_id': user_id, 'instrument_id': instrument_ids[s], 'symbol': symbol_name(s),
+                'alert_type': AlertType.PRICE, 'condition': AlertCondition.ABOVE, 'target_value': 100.0,
+                'is_active': True, 'is_triggered': i % 20 != 0, 'created_at': created,
+            })
+            positions.append({
+                'user_id': user_id, 'instrument_id': instrument_ids[s], 'symbol': symbol_name(s),
+                'market': 'crypto', 'side': 'long', 'entry_price': 100.0, 'quantity': 1.0,
+                'is_open': i % 10 == 0, 'opened_at': created,
+            })
+    with engine.begin() as conn:
+        conn.execute(insert(Prediction), predictions)
+        conn.execute(insert(Alert), alerts)
+        conn.execute(insert(Position), positions)
+        conn.execute(text("ANALYZE"))
+    return {'user_id': user_id, 'now': START + timedelta(minutes=ROWS)}
+
+
+def captured(query):
+    """Run a record_store query and return the last statement it sent"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        run(query(LazyAsyncSession()))
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    return statements[-1]
+
+
+def query_plan(statement, parameters) -> str:
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+    return '\n'.join(str(row[-1]) for row in rows)
+
+
+@pytest.mark.parametrize('index, query', [
+    ('idx_predictions_instrument_model_created',
+     lambda ctx: lambda db: record_store_service.latest_prediction(db, symbol_name(3), 'crypto', ModelType.LSTM)),
+    ('idx_predictions_instrument_created',
+     lambda ctx: lambda db: record_store_service.prediction_history(db, symbol_name(3), 'crypto', limit=50)),
+    ('idx_predictions_pending',
+     lambda ctx: lambda db: record_store_service.predictions_due(db, now=ctx['now'], limit=50)),
+    ('idx_alerts_armed',
+     lambda ctx: lambda db: record_store_service.armed_alerts(db, symbol_name(3), 'crypto')),
+    ('idx_positions_user_open',
+     lambda ctx: lambda db: record_store_service.open_positions(db, ctx['user_id'])),
+])
+def test_query_uses_index(seeded, index, query):
+    plan = query_plan(*captured(query(seeded)))
+    assert index in plan, plan
+
+
+def test_armed_alerts_plan_covers_unresolved_alerts(seeded):
+    plan = query_plan(*captured(lambda db: record_store_service.armed_alerts(db, symbol_name(3), 'crypto')))
+    assert 'idx_alerts_armed' in plan and 'idx_alerts_unresolved' in plan, plan
+
+
+def test_orm_alert_gets_instrument_id(seeded):
+    with Session(engine, expire_on_commit=False) as db, db.begin():
+        alert = Alert(
+            user_id=seeded['user_id'], symbol=symbol_name(4), alert_type=AlertType.PRICE,
+            condition=AlertCondition.BELOW, target_value=50.0, message='orm alert'
+        )
+        db.add(alert)
+    assert alert.instrument_id == instrument_registry.get_id(symbol_name(4), 'crypto', create=False)
+
+    page = run(record_store_service.armed_alerts(LazyAsyncSession(), symbol_name(4), 'crypto'))
+    assert 'orm alert' in [a.message for a in page['items']]
+
+
+def test_orm_prediction_registers_new_instrument(seeded):
+    with Session(engine, expire_on_commit=False) as db, db.begin():
+        prediction = Prediction(
+            symbol='NEWCOIN', market='crypto', model=ModelType.TFT, current_price=1.0,
+            predicted_price=1.1, direction=PredictionDirection.BUY, confidence=0.7,
+            timeframe='1h', horizon_hours=4, prediction_for=seeded['now'],
+        )
+        db.add(prediction)
+    assert prediction.instrument_id is not None
+
+    latest = run(record_store_service.latest_prediction(LazyAsyncSession(), 'NEWCOIN', 'crypto', ModelType.TFT))
+    assert latest is not None and latest.id == prediction.id
+
+
+def test_armed_alerts_falls_back_to_symbol(seeded):
+    with Session(engine, expire_on_commit=False) as db, db.begin():
+        db.add(Alert(
+            user_id=seeded['user_id'], symbol='UNLISTED', alert_type=AlertType.PRICE,
+            condition=AlertCondition.ABOVE, target_value=10.0, message='no instrument'
+        ))
+
+    page = run(record_store_service.armed_alerts(LazyAsyncSession(), 'UNLISTED', 'stock'))
+    assert [a.message for a in page['items']] == ['no instrument']
+
+
+def test_alert_saved_before_its_instrument_is_still_found(seeded):
+    with Session(engine, expire_on_commit=False) as db, db.begin():
+        alert = Alert(
+            user_id=seeded['user_id'], symbol='LATECOIN', alert_type=AlertType.PRICE,
+            condition=AlertCondition.ABOVE, target_value=10.0, message='saved early'
+        )
+        db.add(alert)
+    assert alert.instrument_id is None
+
+    instrument_registry.get_id('LATECOIN', 'crypto')
+    page = run(record_store_service.armed_alerts(LazyAsyncSession(), 'LATECOIN', 'crypto'))
+    assert [a.message for a in page['items']] == ['saved early']